@@ -0,0 +1,329 @@
+"""
+Archives mensuelles des évaluations
+Les évaluations plus anciennes que la durée de rétention quittent la table EvaluationGrossesse
+pour un fichier par mois (evaluations-AAAA-MM.archive) : en-tête JSON, blocs de lignes triées
+par (date, id) où chaque colonne est compressée zlib (textes encodés en dictionnaire), puis un
+pied JSON qui décrit les blocs. Une analyse ne décompresse que les colonnes qu'elle lit, bloc
+par bloc. parcourir() fusionne archives et table pour les exports et agrégats sans jamais
+charger un mois entier.
+"""
+
+import heapq
+import json
+import os
+import struct
+import zlib
+from itertools import chain, islice
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .export import COLONNES
+from .export import parcourir as parcourir_table
+from .models import EvaluationGrossesse
+
+MAGIC_ARCHIVE = b'GBARCHIV'
+FORMAT_ARCHIVE = 2
+PIED = struct.Struct('<I')
+
+# Type de stockage de chaque colonne ; None : texte encodé en dictionnaire
+TYPES = {
+    'id': '<i8',
+    'date': '<i8',
+    'age': '<i8',
+    'mois_grossesse': '<i8',
+    'poids_kg': '<f8',
+    'taille_cm': '<f8',
+    'activité': None,
+    'régime': None,
+    'antécédents': None,
+    'symptôme': None,
+    'profil_risque': None,
+}
+
+EPOQUE = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def dossier_archives() -> Path:
+    return Path(settings.EVALUATION_ARCHIVE_DIR)
+
+
+def chemin_archive(mois: str, dossier: Optional[Path] = None) -> Path:
+    return (dossier or dossier_archives()) / f'evaluations-{mois}.archive'
+
+
+def mois_de(date: datetime) -> str:
+    return timezone.localtime(date).strftime('%Y-%m')
+
+
+def debut_mois(mois: str) -> datetime:
+    annee, numero = map(int, mois.split('-'))
+    return timezone.make_aware(datetime(annee, numero, 1))
+
+
+def mois_suivant(mois: str) -> str:
+    annee, numero = map(int, mois.split('-'))
+    return f'{annee + numero // 12}-{numero % 12 + 1:02d}'
+
+
+def vers_microsecondes(dates: Iterable[datetime]) -> np.ndarray:
+    return np.asarray([(date - EPOQUE) // timedelta(microseconds=1) for date in dates], dtype=np.int64)
+
+
+def depuis_microsecondes(valeur: int) -> datetime:
+    return EPOQUE + timedelta(microseconds=int(valeur))
+
+
+def colonnes_depuis_lignes(lignes: Sequence[Tuple]) -> Dict[str, np.ndarray]:
+    """Tuples dans l'ordre de export.COLONNES -> un tableau par colonne"""
+    valeurs = list(zip(*lignes)) if lignes else [()] * len(COLONNES)
+    colonnes = {}
+    for nom, colonne in zip(COLONNES, valeurs):
+        if nom == 'date':
+            colonnes[nom] = vers_microsecondes(colonne)
+        elif TYPES[nom] is None:
+            colonnes[nom] = np.asarray(colonne, dtype=object)
+        else:
+            colonnes[nom] = np.asarray(colonne, dtype=TYPES[nom])
+    return colonnes
+
+
+def ecrire_bloc(fichier, colonnes: Dict[str, np.ndarray]) -> dict:
+    """Écrit un bloc de lignes à la position courante, chaque colonne compressée séparément ; retourne sa description"""
+    position = fichier.tell()
+    descriptions = []
+    for nom, type_ in TYPES.items():
+        valeurs = colonnes[nom]
+        categories = None
+        if type_ is None:
+            categories, codes = np.unique(valeurs.astype(str), return_inverse=True)
+            categories = categories.tolist()
+            # Codes sur 16 bits, sur 32 au-delà de 65536 modalités distinctes dans le bloc
+            type_ = '<u2' if len(categories) <= 0x10000 else '<u4'
+            valeurs = codes.astype(type_)
+        bloc = zlib.compress(np.ascontiguousarray(valeurs, dtype=type_).tobytes(), 6)
+        descriptions.append({'name': nom, 'dtype': type_, 'offset': fichier.tell() - position, 'size': len(bloc),
+                             'categories': categories})
+        fichier.write(bloc)
+    return {
+        'offset': position,
+        'n_rows': int(len(colonnes['id'])),
+        'date_min': int(colonnes['date'][0]),
+        'date_max': int(colonnes['date'][-1]),
+        'columns': descriptions,
+    }
+
+
+def ecrire_archive(chemin: Path, blocs: Iterable[Dict[str, np.ndarray]]):
+    """Écrit les blocs de colonnes, déjà triés par (date, id), un par un
+
+    Seul le bloc courant est en mémoire ; comme training.publier, le fichier est écrit à côté
+    puis renommé : l'archive existante reste lisible jusqu'au renommage.
+    """
+    chemin.parent.mkdir(parents=True, exist_ok=True)
+    temporaire = chemin.with_name(chemin.name + '.tmp')
+    with open(temporaire, 'wb') as fichier:
+        entete = json.dumps({'format': FORMAT_ARCHIVE}).encode('utf-8')
+        fichier.write(MAGIC_ARCHIVE + struct.pack('<I', len(entete)) + entete)
+        groupes = [ecrire_bloc(fichier, colonnes) for colonnes in blocs if len(colonnes['id'])]
+        pied = json.dumps({
+            'n_rows': sum(groupe['n_rows'] for groupe in groupes),
+            'groups': groupes,
+        }, ensure_ascii=False).encode('utf-8')
+        fichier.write(pied + PIED.pack(len(pied)))
+    temporaire.replace(chemin)
+
+
+def sommaire(fichier) -> List[dict]:
+    """Description des blocs d'une archive ouverte"""
+    fichier.seek(0)
+    if fichier.read(len(MAGIC_ARCHIVE)) != MAGIC_ARCHIVE:
+        raise ValueError(f"{fichier.name} n'est pas une archive d'évaluations")
+    (taille_entete,) = struct.unpack('<I', fichier.read(4))
+    entete = json.loads(fichier.read(taille_entete).decode('utf-8'))
+    if entete['format'] == 1:
+        # Format 1 : le mois entier en un seul bloc, décrit par l'en-tête
+        return [{'offset': len(MAGIC_ARCHIVE) + 4 + taille_entete, 'n_rows': entete['n_rows'],
+                 'columns': entete['columns']}]
+    if entete['format'] != FORMAT_ARCHIVE:
+        raise ValueError(f"Format d'archive non pris en charge : {entete['format']}")
+    fichier.seek(-PIED.size, os.SEEK_END)
+    (taille_pied,) = PIED.unpack(fichier.read(PIED.size))
+    fichier.seek(-PIED.size - taille_pied, os.SEEK_END)
+    return json.loads(fichier.read(taille_pied).decode('utf-8'))['groups']
+
+
+def blocs_archive(chemin: Path, colonnes: Optional[Iterable[str]] = None, debut: Optional[datetime] = None,
+                  fin: Optional[datetime] = None) -> Iterator[Dict[str, np.ndarray]]:
+    """Colonnes demandées (toutes par défaut), un bloc à la fois ; les blocs hors de [debut, fin) ne sont pas lus"""
+    voulues = set(colonnes) if colonnes is not None else set(TYPES)
+    debut_us = int(vers_microsecondes([debut])[0]) if debut is not None else None
+    fin_us = int(vers_microsecondes([fin])[0]) if fin is not None else None
+    with open(chemin, 'rb') as fichier:
+        for groupe in sommaire(fichier):
+            if debut_us is not None and groupe.get('date_max', debut_us) < debut_us:
+                continue
+            if fin_us is not None and groupe.get('date_min', fin_us - 1) >= fin_us:
+                continue
+            resultat = {}
+            for description in groupe['columns']:
+                if description['name'] not in voulues:
+                    continue
+                fichier.seek(groupe['offset'] + description['offset'])
+                donnees = zlib.decompress(fichier.read(description['size']))
+                valeurs = np.frombuffer(donnees, dtype=description['dtype'])
+                if description['categories'] is not None:
+                    valeurs = np.asarray(description['categories'], dtype=object)[valeurs]
+                resultat[description['name']] = valeurs
+            yield resultat
+
+
+def lire_archive(chemin: Path, colonnes: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+    """Colonnes demandées (toutes par défaut) de tous les blocs ; les textes sont redécodés depuis leur dictionnaire"""
+    noms = [nom for nom in TYPES if colonnes is None or nom in set(colonnes)]
+    blocs = list(blocs_archive(chemin, noms))
+    return {
+        nom: np.concatenate([bloc[nom] for bloc in blocs]) if blocs else np.empty(0, dtype=TYPES[nom] or object)
+        for nom in noms
+    }
+
+
+def lignes_archive(colonnes: Dict[str, np.ndarray]) -> Iterator[Tuple]:
+    """Tuples dans l'ordre de export.COLONNES, dates redevenues des datetime"""
+    valeurs = {nom: colonnes[nom].tolist() for nom in COLONNES}
+    valeurs['date'] = [depuis_microsecondes(valeur) for valeur in valeurs['date']]
+    return zip(*(valeurs[nom] for nom in COLONNES))
+
+
+def lignes_de(chemin: Path, debut: Optional[datetime] = None, fin: Optional[datetime] = None) -> Iterator[Tuple]:
+    """Lignes d'une archive comprises dans [debut, fin), bloc par bloc"""
+    for colonnes in blocs_archive(chemin, debut=debut, fin=fin):
+        for ligne in lignes_archive(colonnes):
+            if (debut is None or ligne[1] >= debut) and (fin is None or ligne[1] < fin):
+                yield ligne
+
+
+def fusionner(*flux: Iterable[Tuple]) -> Iterator[Tuple]:
+    """Fusion paresseuse de flux triés par (date, id)
+
+    Une ligne à la fois archivée et dans la table (suppression interrompue) n'est gardée qu'une fois.
+    """
+    precedente = None
+    for ligne in heapq.merge(*flux, key=lambda ligne: (ligne[1], ligne[0])):
+        if (ligne[1], ligne[0]) != precedente:
+            precedente = (ligne[1], ligne[0])
+            yield ligne
+
+
+def par_blocs(lignes: Iterable[Tuple], taille_bloc: int) -> Iterator[List[Tuple]]:
+    lignes = iter(lignes)
+    while True:
+        bloc = list(islice(lignes, taille_bloc))
+        if not bloc:
+            return
+        yield bloc
+
+
+def archiver(avant: datetime, taille_lot: int = 5000, dossier: Optional[Path] = None,
+             taille_bloc: int = 5000) -> Dict[str, int]:
+    """Archive puis supprime les évaluations antérieures à `avant`, mois par mois ; retourne les lignes par mois
+
+    Les lignes de la table sont fusionnées avec l'archive existante du mois et écrites par blocs
+    de taille_bloc : la mémoire ne dépend pas de la taille du mois.
+    """
+    dossier = dossier or dossier_archives()
+    plus_ancienne = EvaluationGrossesse.objects.filter(date__lt=avant).order_by('date').values_list('date', flat=True).first()
+    bilan = {}
+    if plus_ancienne is None:
+        return bilan
+
+    mois = mois_de(plus_ancienne)
+    while debut_mois(mois) < avant:
+        fin = min(debut_mois(mois_suivant(mois)), avant)
+        pages = parcourir_table(debut_mois(mois), fin, taille_bloc)
+        premiere = next(pages, None)
+
+        if premiere is not None:
+            lues = {'nombre': 0, 'derniere': None}
+
+            def table():
+                for page in chain([premiere], pages):
+                    lues['nombre'] += len(page)
+                    lues['derniere'] = (page[-1][1], page[-1][0])
+                    yield from page
+
+            chemin = chemin_archive(mois, dossier)
+            lignes = fusionner(lignes_de(chemin), table()) if chemin.exists() else table()
+            # L'archive est écrite (renommage atomique) avant toute suppression
+            ecrire_archive(chemin, (colonnes_depuis_lignes(bloc) for bloc in par_blocs(lignes, taille_bloc)))
+            supprimer_par_lots(debut_mois(mois), fin, lues['derniere'], taille_lot)
+            bilan[mois] = lues['nombre']
+
+        mois = mois_suivant(mois)
+    return bilan
+
+
+def supprimer_par_lots(debut: datetime, fin: datetime, derniere: Tuple[datetime, int], taille_lot: int):
+    """DELETE par lots des lignes de [debut, fin) jusqu'à la dernière archivée (date, id) incluse
+
+    Une courte transaction par lot : pas de long verrou sur la table. Les évaluations sont
+    horodatées à l'insertion, aucune ne peut donc arriver dans un mois passé entre la lecture
+    et la suppression.
+    """
+    date, id_ = derniere
+    archivees = EvaluationGrossesse.objects.filter(date__gte=debut, date__lt=fin).filter(
+        Q(date__lt=date) | Q(date=date, id__lte=id_))
+    while True:
+        with transaction.atomic():
+            ids = list(archivees.order_by('date', 'id').values_list('id', flat=True)[:taille_lot])
+            if not ids:
+                return
+            EvaluationGrossesse.objects.filter(id__in=ids).delete()
+
+
+def fichiers_archives(debut: Optional[datetime] = None, fin: Optional[datetime] = None,
+                      dossier: Optional[Path] = None) -> List[Tuple[str, Path]]:
+    """Archives (mois, chemin) chevauchant [debut, fin), par mois croissant"""
+    fichiers = []
+    for chemin in sorted((dossier or dossier_archives()).glob('evaluations-*.archive')):
+        mois = chemin.stem[len('evaluations-'):]
+        if fin is not None and debut_mois(mois) >= fin:
+            continue
+        if debut is not None and debut_mois(mois_suivant(mois)) <= debut:
+            continue
+        fichiers.append((mois, chemin))
+    return fichiers
+
+
+def parcourir(debut: Optional[datetime] = None, fin: Optional[datetime] = None, taille_bloc: int = 2000,
+              dossier: Optional[Path] = None) -> Iterator[List[Tuple]]:
+    """Comme export.parcourir, archives comprises : blocs de tuples triés par (date, id)
+
+    Un mois archivé est lu bloc par bloc et fusionné au fil de l'eau avec ses lignes encore dans
+    la table (archivage en cours ou rétention modifiée) ; entre deux archives, seule la table est
+    parcourue. La mémoire reste bornée par taille_bloc et la taille des blocs d'archive.
+    """
+    curseur = debut
+    for mois, chemin in fichiers_archives(debut, fin, dossier):
+        debut_segment = debut_mois(mois)
+        if curseur is not None:
+            debut_segment = max(debut_segment, curseur)
+        fin_segment = debut_mois(mois_suivant(mois))
+        if fin is not None:
+            fin_segment = min(fin_segment, fin)
+
+        # Période sans archive avant ce mois
+        if curseur is None or curseur < debut_mois(mois):
+            yield from parcourir_table(curseur, debut_mois(mois), taille_bloc)
+
+        table = (ligne for page in parcourir_table(debut_segment, fin_segment, taille_bloc) for ligne in page)
+        yield from par_blocs(fusionner(lignes_de(chemin, debut_segment, fin_segment), table), taille_bloc)
+        curseur = fin_segment
+
+    yield from parcourir_table(curseur, fin, taille_bloc)
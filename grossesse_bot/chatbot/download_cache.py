@@ -0,0 +1,175 @@
+"""
+Cache disque des modèles téléchargés
+Les handlers Vercel légers téléchargent leur modèle depuis FOREST_URL à chaque conteneur froid.
+Ce cache le conserve sous /tmp, indexé par URL puis par empreinte du contenu : les conteneurs
+chauds et les invocations voisines sur la même machine ne repassent pas par le réseau, et
+au-delà de max_age le fichier est revalidé par requête conditionnelle (ETag / Last-Modified).
+Module sans dépendance Django.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_CACHE_DIR = Path(tempfile.gettempdir()) / 'grossesse_model_cache'
+
+
+class DownloadCache:
+    """Téléchargement en flux vers un fichier temporaire, somme de contrôle incrémentale, renommage atomique"""
+
+    def __init__(self, directory: Optional[Path] = None, max_age: Optional[float] = None,
+                 chunk_size: int = 1 << 16):
+        self.directory = Path(directory or os.getenv('MODEL_CACHE_DIR', DEFAULT_CACHE_DIR))
+        # Secondes pendant lesquelles une entrée est servie sans aucune requête réseau
+        self.max_age = max_age if max_age is not None else float(os.getenv('MODEL_CACHE_MAX_AGE', 300))
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+
+        # Métriques exposées par stats()
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.stale = 0
+        self.last_status = None
+        self.last_download_ms = None
+        self.last_size = None
+
+    def _cle(self, url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+
+    def _chemin_index(self, cle: str) -> Path:
+        return self.directory / f'{cle}.json'
+
+    def _chemin_contenu(self, cle: str, empreinte: str) -> Path:
+        return self.directory / f'{cle}-{empreinte[:16]}.bin'
+
+    def _lire_index(self, cle: str) -> Optional[Dict[str, Any]]:
+        try:
+            index = json.loads(self._chemin_index(cle).read_text(encoding='utf-8'))
+            chemin = self._chemin_contenu(cle, index['sha256'])
+            if chemin.stat().st_size != index['size']:
+                return None
+            return index
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _ecrire_index(self, cle: str, index: Dict[str, Any]):
+        fd, temporaire = tempfile.mkstemp(dir=self.directory, suffix='.json.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as fichier:
+            json.dump(index, fichier)
+        os.replace(temporaire, self._chemin_index(cle))
+
+    def fetch(self, url: str, timeout: float = 30) -> Tuple[Path, str]:
+        """Retourne (fichier local, sha256 du contenu), en ne téléchargeant que si nécessaire"""
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            cle = self._cle(url)
+            index = self._lire_index(cle)
+
+            if index is not None and time.time() - index['validated_at'] < self.max_age:
+                self._noter('hit')
+                return self._chemin_contenu(cle, index['sha256']), index['sha256']
+
+            requete = urllib.request.Request(url)
+            if index is not None:
+                if index.get('etag'):
+                    requete.add_header('If-None-Match', index['etag'])
+                if index.get('last_modified'):
+                    requete.add_header('If-Modified-Since', index['last_modified'])
+
+            debut = time.perf_counter()
+            try:
+                with urllib.request.urlopen(requete, timeout=timeout) as response:
+                    empreinte, taille = self._telecharger(cle, response)
+                    entetes = response.headers
+            except urllib.error.HTTPError as e:
+                if e.code == 304 and index is not None:
+                    index['validated_at'] = time.time()
+                    self._ecrire_index(cle, index)
+                    self._noter('revalidated')
+                    return self._chemin_contenu(cle, index['sha256']), index['sha256']
+                return self._servir_perime(cle, index, e)
+            except OSError as e:
+                return self._servir_perime(cle, index, e)
+
+            self._ecrire_index(cle, {
+                'url': url,
+                'sha256': empreinte,
+                'size': taille,
+                'etag': entetes.get('ETag'),
+                'last_modified': entetes.get('Last-Modified'),
+                'validated_at': time.time(),
+            })
+            self._nettoyer(cle, empreinte)
+
+            self.last_download_ms = round((time.perf_counter() - debut) * 1000, 2)
+            self.last_size = taille
+            self._noter('miss')
+            return self._chemin_contenu(cle, empreinte), empreinte
+
+    def _telecharger(self, cle: str, response) -> Tuple[str, int]:
+        """Écrit la réponse morceau par morceau à côté, puis la renomme sous son empreinte"""
+        sha = hashlib.sha256()
+        taille = 0
+        fd, temporaire = tempfile.mkstemp(dir=self.directory, suffix='.bin.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fichier:
+                for morceau in iter(lambda: response.read(self.chunk_size), b''):
+                    sha.update(morceau)
+                    fichier.write(morceau)
+                    taille += len(morceau)
+            empreinte = sha.hexdigest()
+            os.replace(temporaire, self._chemin_contenu(cle, empreinte))
+        except BaseException:
+            if os.path.exists(temporaire):
+                os.unlink(temporaire)
+            raise
+        return empreinte, taille
+
+    def _servir_perime(self, cle: str, index: Optional[Dict[str, Any]], erreur: Exception) -> Tuple[Path, str]:
+        # Source injoignable : mieux vaut le dernier modèle connu que pas de modèle
+        if index is None:
+            raise erreur
+        print(f"⚠️ Revalidation impossible ({erreur}) : modèle en cache conservé")
+        self._noter('stale')
+        return self._chemin_contenu(cle, index['sha256']), index['sha256']
+
+    def _nettoyer(self, cle: str, empreinte: str):
+        garde = self._chemin_contenu(cle, empreinte).name
+        for ancien in self.directory.glob(f'{cle}-*.bin'):
+            if ancien.name != garde:
+                try:
+                    ancien.unlink()
+                except OSError:
+                    pass
+
+    def _noter(self, statut: str):
+        self.last_status = statut
+        if statut == 'hit':
+            self.hits += 1
+        elif statut == 'revalidated':
+            self.revalidations += 1
+        elif statut == 'miss':
+            self.misses += 1
+        else:
+            self.stale += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'directory': str(self.directory),
+            'max_age_seconds': self.max_age,
+            'last_status': self.last_status,
+            'hits': self.hits,
+            'revalidations': self.revalidations,
+            'misses': self.misses,
+            'stale': self.stale,
+            'last_download_ms': self.last_download_ms,
+            'last_download_bytes': self.last_size,
+        }
@@ -0,0 +1,182 @@
+"""
+Journalisation différée des évaluations de risque (write-behind)
+Les vues déposent chaque évaluation dans une file bornée et répondent aussitôt ; un thread
+de fond les insère avec bulk_create par lots de batch_size lignes, ou toutes les flush_interval
+secondes si le trafic est faible. La latence des requêtes ne dépend donc pas de celle de la base.
+File pleine : on abandonne la ligne ('drop', par défaut) ou on attend au plus block_timeout ('block').
+La file est vidée une dernière fois à l'arrêt du processus. Chaque lot met à jour les compteurs
+de StatistiqueRisque dans la même transaction que son insertion.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List
+
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .validation import CANONIQUES, valeur_canonique
+
+POLITIQUES = ('drop', 'block')
+
+_ARRET = object()
+
+
+class EvaluationWriter:
+    """Tampon d'écriture des EvaluationGrossesse, vidé par lots depuis un thread de fond"""
+
+    def __init__(self, batch_size: int = 200, flush_interval: float = 1.0, max_queue: int = 10000,
+                 overflow: str = 'drop', block_timeout: float = 0.05):
+        if overflow not in POLITIQUES:
+            raise ValueError(f"Politique de débordement inconnue : {overflow} (attendu : {', '.join(POLITIQUES)})")
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._atexit = False
+
+        # Métriques exposées par stats()
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_ms = None
+        self.last_error = None
+
+    def enregistrer(self, donnees: Dict[str, Any], profil_risque: str) -> bool:
+        """Dépose une évaluation validée ; retourne False si elle a été abandonnée (file pleine)"""
+        ligne = dict(donnees, profil_risque=profil_risque, date=timezone.now())
+        try:
+            if self.overflow == 'block':
+                self._file().put(ligne, timeout=self.block_timeout)
+            else:
+                self._file().put_nowait(ligne)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def _file(self) -> queue.Queue:
+        # Démarrage paresseux, et redémarrage après un fork (workers gunicorn avec --preload)
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(maxsize=self.max_queue)
+                    self._thread = threading.Thread(target=self._boucle, name='evaluation-writer', daemon=True)
+                    self._thread.start()
+                    self._pid = os.getpid()
+                    if not self._atexit:
+                        atexit.register(self.close)
+                        self._atexit = True
+        return self._queue
+
+    def _boucle(self):
+        file = self._queue
+        try:
+            while True:
+                lot = [file.get()]
+                if lot[0] is _ARRET:
+                    return
+                limite = time.monotonic() + self.flush_interval
+
+                arret = False
+                while len(lot) < self.batch_size:
+                    restant = limite - time.monotonic()
+                    if restant <= 0:
+                        break
+                    try:
+                        ligne = file.get(timeout=restant)
+                    except queue.Empty:
+                        break
+                    if ligne is _ARRET:
+                        arret = True
+                        break
+                    lot.append(ligne)
+
+                # Connexion coupée (redémarrage de la base, délai d'inactivité) ou trop ancienne :
+                # hors requête, rien d'autre ne la recycle ; elle est rouverte pour ce lot
+                close_old_connections()
+                self._ecrire(lot)
+                if arret:
+                    return
+        finally:
+            # Connexion propre à ce thread : ne pas la laisser ouverte
+            connection.close()
+
+    def _ecrire(self, lot: List[Dict[str, Any]]):
+        from . import statistiques
+        from .models import EvaluationGrossesse
+
+        # Une seule orthographe par modalité en base : 'Moderee', 'MODÉRÉE' -> 'modérée'
+        for ligne in lot:
+            for colonne in CANONIQUES:
+                if isinstance(ligne.get(colonne), str):
+                    ligne[colonne] = valeur_canonique(colonne, ligne[colonne])
+
+        depart = time.perf_counter()
+        try:
+            with transaction.atomic():
+                EvaluationGrossesse.objects.bulk_create(
+                    [EvaluationGrossesse(**ligne) for ligne in lot], batch_size=self.batch_size,
+                )
+                statistiques.cumuler(statistiques.compter(lot))
+        except Exception as e:
+            # Base indisponible : le lot est perdu, la requête n'en a jamais dépendu
+            print(f"⚠️ Écriture de {len(lot)} évaluations impossible : {e}")
+            with self._lock:
+                self.failed += len(lot)
+                self.last_error = str(e)
+            return
+
+        with self._lock:
+            self.flushes += 1
+            self.written += len(lot)
+            self.last_flush_ms = round((time.perf_counter() - depart) * 1000, 2)
+
+    def close(self, timeout: float = 5.0):
+        """Vide la file et arrête le thread de fond (appelé automatiquement à l'arrêt du processus)"""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            file, thread = self._queue, self._thread
+            self._pid = None
+
+        # Le marqueur d'arrêt passe même si la file est pleine : il attend qu'une place se libère
+        try:
+            file.put(_ARRET, timeout=timeout)
+        except queue.Full:
+            print("⚠️ File des évaluations toujours pleine à l'arrêt")
+            return
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        file = self._queue if self._pid == os.getpid() else None
+        return {
+            'batch_size': self.batch_size,
+            'flush_interval_ms': self.flush_interval * 1000,
+            'overflow': self.overflow,
+            'queued': file.qsize() if file is not None else 0,
+            'max_queue': self.max_queue,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'flushes': self.flushes,
+            'last_flush_ms': self.last_flush_ms,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,82 @@
+"""
+Export en flux de l'historique des évaluations (CSV ou NDJSON)
+Les lignes sont lues par blocs en pagination par clé sur (date, id) : chaque bloc reprend
+après la dernière ligne vue, sans OFFSET, par une lecture d'index de coût constant.
+Seul le bloc courant est en mémoire, et l'en-tête part avant la première requête.
+"""
+
+import csv
+import json
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import EvaluationGrossesse
+
+COLONNES = ('id', 'date', 'age', 'mois_grossesse', 'poids_kg', 'taille_cm',
+            'activité', 'régime', 'antécédents', 'symptôme', 'profil_risque')
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def parcourir(debut: Optional[datetime] = None, fin: Optional[datetime] = None,
+              taille_bloc: int = 2000) -> Iterator[List[Tuple]]:
+    """Blocs de lignes (tuples dans l'ordre de COLONNES) triés par (date, id)"""
+    evaluations = EvaluationGrossesse.objects.order_by('date', 'id')
+    if debut is not None:
+        evaluations = evaluations.filter(date__gte=debut)
+    if fin is not None:
+        evaluations = evaluations.filter(date__lt=fin)
+
+    curseur = None
+    while True:
+        page = evaluations
+        if curseur is not None:
+            date, id_ = curseur
+            # La borne date >= redondante rend le filtre utilisable par l'index (date, id) : sans elle,
+            # le OR seul fait relire l'index depuis le début à chaque bloc
+            page = page.filter(date__gte=date).filter(Q(date__gt=date) | Q(date=date, id__gt=id_))
+        bloc = list(page.values_list(*COLONNES)[:taille_bloc])
+        if not bloc:
+            return
+        yield bloc
+        if len(bloc) < taille_bloc:
+            return
+        curseur = (bloc[-1][1], bloc[-1][0])
+
+
+def _valeurs(ligne: Tuple) -> list:
+    valeurs = list(ligne)
+    valeurs[1] = timezone.localtime(valeurs[1]).isoformat()
+    return valeurs
+
+
+class _Tampon:
+    """Pseudo-fichier pour csv.writer : writerow retourne directement la ligne formatée"""
+
+    def write(self, valeur):
+        return valeur
+
+
+def generer(format_: str, blocs: Iterator[List[Tuple]]) -> Iterator[str]:
+    """Texte exporté, un morceau par bloc (en-tête CSV d'abord)"""
+    if format_ == 'csv':
+        writer = csv.writer(_Tampon())
+        yield writer.writerow(COLONNES)
+        for bloc in blocs:
+            yield ''.join(writer.writerow(_valeurs(ligne)) for ligne in bloc)
+
+    elif format_ == 'ndjson':
+        for bloc in blocs:
+            yield ''.join(
+                json.dumps(dict(zip(COLONNES, _valeurs(ligne))), ensure_ascii=False) + '\n'
+                for ligne in bloc
+            )
+
+    else:
+        raise ValueError(f"Format d'export inconnu : {format_} (attendu : {', '.join(FORMATS)})")
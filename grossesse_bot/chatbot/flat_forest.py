@@ -0,0 +1,336 @@
+"""
+Forêt aléatoire compilée en tableaux plats
+Exporte un RandomForestClassifier entraîné en tableaux parallèles compacts
+(caractéristique, seuil, fils gauche, fils droit par nœud + valeurs des feuilles)
+et les évalue en Python pur, sans scikit-learn, numpy ni joblib.
+Les prédictions sont identiques bit à bit à celles de scikit-learn.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import struct
+import sys
+from array import array
+from io import BytesIO
+from pathlib import Path
+from typing import Any, List, Optional, Sequence
+
+from .download_cache import DownloadCache
+from .model_registry import PROJECT_ROOT, ModelRegistry
+
+MAGIC = b'GBFOREST'
+FORMAT_VERSION = 1
+
+# Emplacement par défaut de la forêt compilée (embarquée dans le déploiement)
+DEFAULT_FOREST_PATH = PROJECT_ROOT / 'model_risque_grossesse.forest'
+# Artefact compressé et versionné, prioritaire s'il est présent (export_forest --compress)
+EMBEDDED_FOREST_PATH = PROJECT_ROOT / 'model_risque_grossesse.forest.gz'
+
+# Nom et type des tableaux sérialisés, dans l'ordre du fichier
+ARRAYS = (
+    ('roots', 'i'),       # indice du nœud racine de chaque arbre
+    ('feature', 'h'),     # caractéristique testée par chaque nœud interne
+    ('threshold', 'd'),   # seuil : x[feature] <= threshold -> fils gauche ('f' une fois compacté)
+    ('left', 'i'),        # fils gauche, -1 pour une feuille
+    ('right', 'i'),       # fils droit, ou indice de la ligne de `value` pour une feuille
+    ('value', 'd'),       # valeurs de classe des feuilles (n_leaves * n_classes)
+)
+
+
+class FlatForest:
+    """Évaluateur d'une forêt stockée en tableaux parallèles (module `array`)"""
+
+    def __init__(self, classes: Sequence[str], n_features: int, roots: array, feature: array,
+                 threshold: array, left: array, right: array, value: array, normalize: bool = False):
+        self.classes = list(classes)
+        self.n_features = n_features
+        self.normalize = normalize
+        self.n_classes = len(self.classes)
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+
+        # Probabilités par feuille, calculées comme DecisionTreeClassifier.predict_proba :
+        # scikit-learn < 1.4 stocke des effectifs à normaliser, les versions suivantes des fractions
+        n = self.n_classes
+        self._proba = []
+        for debut in range(0, len(value), n):
+            valeurs = value[debut:debut + n].tolist()
+            if normalize:
+                total = sum(valeurs)
+                if total == 0.0:
+                    total = 1.0
+                valeurs = [v / total for v in valeurs]
+            self._proba.append(tuple(valeurs))
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.left)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(tableau) * tableau.itemsize for tableau in self._tableaux())
+
+    def _tableaux(self) -> List[array]:
+        return [getattr(self, nom) for nom, _ in ARRAYS]
+
+    def predict_proba_row(self, row: Sequence[float]) -> List[float]:
+        """Probabilités moyennes des arbres pour une ligne de caractéristiques encodées"""
+        # Les arbres scikit-learn comparent les entrées converties en float32
+        x = array('f', row).tolist()
+        feature = self.feature
+        threshold = self.threshold
+        left = self.left
+        right = self.right
+        probas = self._proba
+
+        totaux = [0.0] * self.n_classes
+        for noeud in self.roots:
+            gauche = left[noeud]
+            while gauche != -1:
+                if x[feature[noeud]] <= threshold[noeud]:
+                    noeud = gauche
+                else:
+                    noeud = right[noeud]
+                gauche = left[noeud]
+
+            for k, p in enumerate(probas[right[noeud]]):
+                totaux[k] += p
+
+        n_arbres = len(self.roots)
+        return [total / n_arbres for total in totaux]
+
+    def predict_proba(self, X: Sequence[Sequence[float]]) -> List[List[float]]:
+        return [self.predict_proba_row(row) for row in X]
+
+    def predict_row(self, row: Sequence[float]) -> str:
+        probas = self.predict_proba_row(row)
+        # Premier maximum, comme numpy.argmax
+        meilleur = 0
+        for k in range(1, len(probas)):
+            if probas[k] > probas[meilleur]:
+                meilleur = k
+        return self.classes[meilleur]
+
+    def predict(self, X: Sequence[Sequence[float]]) -> List[str]:
+        """Même interface que model.predict : une classe par ligne"""
+        return [self.predict_row(row) for row in X]
+
+    def to_bytes(self) -> bytes:
+        """Sérialise la forêt : en-tête JSON puis tableaux bruts"""
+        entete = json.dumps({
+            'format': FORMAT_VERSION,
+            'classes': self.classes,
+            'n_features': self.n_features,
+            'normalize': self.normalize,
+            'byteorder': sys.byteorder,
+            'arrays': [[nom, tableau.typecode, len(tableau)] for (nom, _), tableau in zip(ARRAYS, self._tableaux())],
+        }, ensure_ascii=False).encode('utf-8')
+
+        morceaux = [MAGIC, struct.pack('<I', len(entete)), entete]
+        morceaux.extend(tableau.tobytes() for tableau in self._tableaux())
+        return b''.join(morceaux)
+
+    @classmethod
+    def from_bytes(cls, contenu: bytes) -> 'FlatForest':
+        if contenu[:len(MAGIC)] != MAGIC:
+            raise ValueError("Fichier de forêt compilée invalide")
+
+        position = len(MAGIC)
+        (taille_entete,) = struct.unpack_from('<I', contenu, position)
+        position += 4
+        entete = json.loads(contenu[position:position + taille_entete].decode('utf-8'))
+        position += taille_entete
+
+        if entete['format'] != FORMAT_VERSION:
+            raise ValueError(f"Format de forêt non supporté : {entete['format']}")
+
+        tableaux = {}
+        for nom, code, longueur in entete['arrays']:
+            tableau = array(code)
+            fin = position + longueur * tableau.itemsize
+            tableau.frombytes(contenu[position:fin])
+            if entete['byteorder'] != sys.byteorder:
+                tableau.byteswap()
+            tableaux[nom] = tableau
+            position = fin
+
+        return cls(entete['classes'], entete['n_features'], normalize=entete['normalize'], **tableaux)
+
+    def save(self, path) -> int:
+        contenu = self.to_bytes()
+        Path(path).write_bytes(contenu)
+        return len(contenu)
+
+
+def exporter_foret(model: Any, max_depth: Optional[int] = None) -> FlatForest:
+    """Aplatit un RandomForestClassifier entraîné (à exécuter là où scikit-learn est installé).
+
+    Avec max_depth, chaque arbre est tronqué : un nœud à cette profondeur devient une feuille
+    portant la distribution des classes de son sous-arbre.
+    """
+    import sklearn
+
+    if getattr(model, 'n_outputs_', 1) != 1:
+        raise ValueError("Seules les forêts à une sortie sont supportées")
+
+    # Depuis scikit-learn 1.4, tree_.value contient déjà les fractions par classe
+    version = tuple(int(partie) for partie in sklearn.__version__.split('.')[:2])
+    normalize = version < (1, 4)
+
+    n_classes = len(model.classes_)
+    roots = array('i')
+    feature = array('h')
+    threshold = array('d')
+    left = array('i')
+    right = array('i')
+    value = array('d')
+
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        enfants_gauche = tree.children_left.tolist()
+        enfants_droit = tree.children_right.tolist()
+        caracteristiques = tree.feature.tolist()
+        seuils = tree.threshold.tolist()
+
+        # Parcours en profondeur : les nœuds conservés sont renumérotés dans l'ordre de visite
+        roots.append(len(left))
+        a_traiter = [(0, 0, None)]
+        while a_traiter:
+            noeud, profondeur, parent = a_traiter.pop()
+            indice = len(left)
+            if parent is not None:
+                # Le fils gauche est empilé en dernier : il est visité juste après son parent
+                if left[parent] == -2:
+                    left[parent] = indice
+                else:
+                    right[parent] = indice
+
+            if enfants_gauche[noeud] == -1 or (max_depth is not None and profondeur >= max_depth):
+                # Feuille : `right` pointe vers sa ligne dans `value`
+                feature.append(-1)
+                threshold.append(0.0)
+                left.append(-1)
+                right.append(len(value) // n_classes)
+                value.extend(tree.value[noeud, 0, :n_classes].tolist())
+            else:
+                feature.append(caracteristiques[noeud])
+                threshold.append(seuils[noeud])
+                left.append(-2)
+                right.append(-2)
+                a_traiter.append((enfants_droit[noeud], profondeur + 1, indice))
+                a_traiter.append((enfants_gauche[noeud], profondeur + 1, indice))
+
+    classes = [str(classe) for classe in model.classes_]
+    return FlatForest(classes, int(model.n_features_in_), roots, feature, threshold, left, right, value,
+                      normalize=normalize)
+
+
+def seuil_float32(seuil: float) -> float:
+    """Plus grand float32 <= seuil : pour une entrée float32, x <= seuil32 équivaut à x <= seuil"""
+    arrondi = array('f', [seuil])[0]
+    if arrondi > seuil:
+        # Float32 immédiatement inférieur, en décrémentant sa représentation binaire
+        bits = struct.unpack('<i', struct.pack('<f', arrondi))[0]
+        if arrondi > 0:
+            bits -= 1
+        elif arrondi == 0:
+            bits = -0x7fffffff  # plus petit float32 négatif (sous-normal)
+        else:
+            bits += 1
+        arrondi = struct.unpack('<f', struct.pack('<i', bits))[0]
+    return arrondi
+
+
+def compacter_foret(foret: FlatForest, n_estimators: Optional[int] = None, float32: bool = False,
+                    dedup_leaves: bool = False) -> FlatForest:
+    """Variante compacte d'une forêt : premiers arbres seulement, seuils float32, feuilles partagées"""
+    n = foret.n_classes
+    roots = array('i')
+    feature = array('h')
+    threshold = array('f' if float32 else 'd')
+    left = array('i')
+    right = array('i')
+    value = array('d')
+    lignes = {}
+
+    for racine in foret.roots[:n_estimators]:
+        roots.append(len(left))
+        a_traiter = [(racine, None)]
+        while a_traiter:
+            noeud, parent = a_traiter.pop()
+            indice = len(left)
+            if parent is not None:
+                if left[parent] == -2:
+                    left[parent] = indice
+                else:
+                    right[parent] = indice
+
+            if foret.left[noeud] == -1:
+                ligne = foret.right[noeud]
+                valeurs = tuple(foret.value[ligne * n:(ligne + 1) * n])
+                if dedup_leaves and valeurs in lignes:
+                    ligne_compacte = lignes[valeurs]
+                else:
+                    ligne_compacte = len(value) // n
+                    lignes[valeurs] = ligne_compacte
+                    value.extend(valeurs)
+
+                feature.append(-1)
+                threshold.append(0.0)
+                left.append(-1)
+                right.append(ligne_compacte)
+            else:
+                seuil = foret.threshold[noeud]
+                feature.append(foret.feature[noeud])
+                threshold.append(seuil_float32(seuil) if float32 else seuil)
+                left.append(-2)
+                right.append(-2)
+                a_traiter.append((foret.right[noeud], indice))
+                a_traiter.append((foret.left[noeud], indice))
+
+    return FlatForest(foret.classes, foret.n_features, roots, feature, threshold, left, right, value,
+                      normalize=foret.normalize)
+
+
+def compresser_foret(foret: FlatForest) -> bytes:
+    """Artefact gzip reproductible ; le nom embarqué porte l'empreinte de la forêt"""
+    contenu = foret.to_bytes()
+    nom = f'model_risque_grossesse-{hashlib.sha256(contenu).hexdigest()[:12]}.forest'
+    sortie = BytesIO()
+    with gzip.GzipFile(filename=nom, mode='wb', fileobj=sortie, mtime=0) as fichier:
+        fichier.write(contenu)
+    return sortie.getvalue()
+
+
+def charger_foret(fichier) -> FlatForest:
+    """Loader compatible avec ModelRegistry : forêt brute ou artefact compressé (.forest.gz)"""
+    contenu = fichier.read()
+    if contenu[:2] == b'\x1f\x8b':
+        contenu = gzip.decompress(contenu)
+    return FlatForest.from_bytes(contenu)
+
+
+def registre_foret() -> ModelRegistry:
+    """Registre de la forêt compilée : FOREST_URL (avec cache disque) si défini, sinon le fichier embarqué.
+
+    Le fichier embarqué est l'artefact compressé s'il existe, sinon la forêt brute ; dans les deux
+    cas il n'est lu et décompressé qu'à la première prédiction, puis gardé par le registre.
+    """
+    if os.getenv('FOREST_URL'):
+        # Téléchargement conservé sous /tmp entre conteneurs chauds et invocations voisines
+        return ModelRegistry(url=os.getenv('FOREST_URL'), loader=charger_foret, cache=DownloadCache())
+    if os.getenv('FOREST_PATH'):
+        return ModelRegistry(path=os.getenv('FOREST_PATH'), loader=charger_foret)
+    if EMBEDDED_FOREST_PATH.exists():
+        return ModelRegistry(path=EMBEDDED_FOREST_PATH, loader=charger_foret)
+    return ModelRegistry(path=DEFAULT_FOREST_PATH, loader=charger_foret)
@@ -0,0 +1,118 @@
+"""
+Forêt aléatoire générée en code Python
+Transforme une forêt compilée (FlatForest) en module Python autonome : une fonction
+par arbre faite de `if` imbriqués qui retourne les probabilités de sa feuille, puis
+un cumul des votes. Une prédiction se réduit à une dizaine de comparaisons par arbre,
+sans validation d'entrée scikit-learn ni allocation de tableaux numpy.
+Les probabilités sont cumulées dans l'ordre des arbres : résultats identiques bit à bit.
+"""
+
+import importlib.util
+import marshal
+import types
+from typing import List
+
+from .flat_forest import FlatForest
+
+# Python refuse plus d'une centaine de blocs imbriqués
+PROFONDEUR_MAX = 90
+
+ENTETE = '''"""
+Module généré par `python manage.py generate_forest_code` : ne pas modifier
+{n_estimators} arbres, {n_nodes} nœuds
+"""
+
+from array import array
+
+CLASSES = {classes!r}
+N_FEATURES = {n_features}
+'''
+
+
+def _generer_arbre(foret: FlatForest, indice: int, racine: int) -> List[str]:
+    lignes = [f'def _arbre_{indice}(x):']
+
+    def noeud(n: int, profondeur: int):
+        retrait = '    ' * profondeur
+        if foret.left[n] == -1:
+            lignes.append(f'{retrait}return {tuple(foret._proba[foret.right[n]])!r}')
+            return
+        if profondeur > PROFONDEUR_MAX:
+            raise ValueError(f"Arbre {indice} trop profond pour être généré (> {PROFONDEUR_MAX})")
+
+        lignes.append(f'{retrait}if x[{foret.feature[n]}] <= {foret.threshold[n]!r}:')
+        noeud(foret.left[n], profondeur + 1)
+        lignes.append(f'{retrait}else:')
+        noeud(foret.right[n], profondeur + 1)
+
+    noeud(racine, 1)
+    return lignes
+
+
+def generer_source(foret: FlatForest) -> str:
+    """Retourne le code source du module de prédiction pour cette forêt"""
+    morceaux = [ENTETE.format(
+        n_estimators=foret.n_estimators,
+        n_nodes=foret.n_nodes,
+        classes=tuple(foret.classes),
+        n_features=foret.n_features,
+    )]
+
+    for indice, racine in enumerate(foret.roots):
+        morceaux.append('\n'.join(_generer_arbre(foret, indice, racine)) + '\n')
+
+    noms = ', '.join(f'_arbre_{indice}' for indice in range(foret.n_estimators))
+    morceaux.append(f'ARBRES = ({noms},)\n')
+
+    # Cumul des votes déroulé sur les classes : une variable locale par classe
+    n = foret.n_classes
+    totaux = ', '.join(f't{k}' for k in range(n))
+    probas = ', '.join(f'p{k}' for k in range(n))
+    cumul = '\n'.join(f'        t{k} += p{k}' for k in range(n))
+    moyennes = ', '.join(f't{k} / {foret.n_estimators}' for k in range(n))
+
+    morceaux.append(f'''
+def predict_proba_row(row):
+    # Les arbres scikit-learn comparent les entrées converties en float32
+    x = array('f', row).tolist()
+    {totaux} = {', '.join(['0.0'] * n)}{',' if n == 1 else ''}
+    for arbre in ARBRES:
+        {probas}{',' if n == 1 else ''} = arbre(x)
+{cumul}
+    return [{moyennes}]
+
+
+def predict_row(row):
+    probas = predict_proba_row(row)
+    # Premier maximum, comme numpy.argmax
+    meilleur = 0
+    for k in range(1, len(probas)):
+        if probas[k] > probas[meilleur]:
+            meilleur = k
+    return CLASSES[meilleur]
+
+
+def predict_proba(X):
+    return [predict_proba_row(row) for row in X]
+
+
+def predict(X):
+    return [predict_row(row) for row in X]
+''')
+    return '\n\n'.join(morceaux)
+
+
+def charger_code(fichier) -> types.ModuleType:
+    """Loader compatible avec ModelRegistry : module généré (.py) ou déjà byte-compilé (.pyc)"""
+    contenu = fichier.read()
+    if contenu[:4] == importlib.util.MAGIC_NUMBER:
+        # En-tête .pyc de 16 octets puis code marshalé : pas de recompilation au chargement
+        code = marshal.loads(contenu[16:])
+    else:
+        code = compile(contenu, 'foret_generee.py', 'exec')
+
+    module = types.ModuleType('foret_generee')
+    exec(code, module.__dict__)
+    # Empreinte approchée : taille du fichier, proportionnelle au nombre de nœuds
+    module.nbytes = len(contenu)
+    return module
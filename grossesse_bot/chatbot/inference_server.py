@@ -0,0 +1,224 @@
+"""
+Serveur d'inférence partagé (sidecar)
+Un seul processus possède le modèle et répond aux prédictions des workers web
+via une socket Unix, avec un protocole binaire compact :
+
+    trame    : longueur (uint32) + contenu
+    requête  : opération (uint8), nombre de lignes (uint16), nombre de
+               caractéristiques (uint8), puis les lignes en float64
+    réponse  : statut (uint8) ; si OK, version (uint8 + ascii), étiquettes
+               (uint8 + [uint8 + utf-8]...), puis un indice d'étiquette par ligne ;
+               sinon le message d'erreur en utf-8
+
+Les workers utilisent InferenceClient (pool de connexions, timeout) et se rabattent
+sur le modèle en mémoire si le serveur ne répond pas.
+"""
+
+import os
+import queue
+import socket
+import socketserver
+import struct
+from typing import Any, Dict, List, Sequence, Tuple
+
+OP_PREDICT = 1
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+_LONGUEUR = struct.Struct('<I')
+_ENTETE_REQUETE = struct.Struct('<BHB')
+# Nombre de lignes codé sur un uint16
+MAX_LIGNES = 0xFFFF
+
+
+class InferenceError(Exception):
+    """Le serveur d'inférence est injoignable ou a renvoyé une erreur"""
+
+
+def lire_exactement(sock: socket.socket, n: int) -> bytes:
+    morceaux = []
+    while n:
+        morceau = sock.recv(n)
+        if not morceau:
+            raise EOFError("Connexion fermée")
+        morceaux.append(morceau)
+        n -= len(morceau)
+    return b''.join(morceaux)
+
+
+def lire_trame(sock: socket.socket) -> bytes:
+    (longueur,) = _LONGUEUR.unpack(lire_exactement(sock, _LONGUEUR.size))
+    return lire_exactement(sock, longueur)
+
+
+def trame(contenu: bytes) -> bytes:
+    return _LONGUEUR.pack(len(contenu)) + contenu
+
+
+def encoder_requete(lignes: Sequence[Sequence[float]]) -> bytes:
+    """Lève InferenceError si le lot dépasse les champs de l'en-tête (le worker prédit alors en local)"""
+    if len(lignes) > MAX_LIGNES:
+        raise InferenceError(f"Lot trop volumineux pour le serveur d'inférence : {len(lignes)} lignes, {MAX_LIGNES} maximum")
+    n_features = len(lignes[0])
+    valeurs = [float(valeur) for ligne in lignes for valeur in ligne]
+    entete = _ENTETE_REQUETE.pack(OP_PREDICT, len(lignes), n_features)
+    return trame(entete + struct.pack(f'<{len(valeurs)}d', *valeurs))
+
+
+def encoder_reponse(predictions: Sequence[Any], version: str) -> bytes:
+    etiquettes = sorted({str(prediction) for prediction in predictions})
+    indices = {etiquette: i for i, etiquette in enumerate(etiquettes)}
+
+    morceaux = [bytes([STATUS_OK]), _court(version or '')]
+    morceaux.append(bytes([len(etiquettes)]))
+    morceaux.extend(_court(etiquette) for etiquette in etiquettes)
+    morceaux.append(bytes(indices[str(prediction)] for prediction in predictions))
+    return trame(b''.join(morceaux))
+
+
+def encoder_erreur(message: str) -> bytes:
+    return trame(bytes([STATUS_ERROR]) + message.encode('utf-8'))
+
+
+def decoder_reponse(contenu: bytes) -> Tuple[List[str], str]:
+    if contenu[0] != STATUS_OK:
+        raise InferenceError(contenu[1:].decode('utf-8'))
+
+    position = 1
+    version, position = _lire_court(contenu, position)
+    n_etiquettes = contenu[position]
+    position += 1
+
+    etiquettes = []
+    for _ in range(n_etiquettes):
+        etiquette, position = _lire_court(contenu, position)
+        etiquettes.append(etiquette)
+
+    return [etiquettes[indice] for indice in contenu[position:]], version
+
+
+def _court(texte: str) -> bytes:
+    donnees = texte.encode('utf-8')
+    return bytes([len(donnees)]) + donnees
+
+
+def _lire_court(contenu: bytes, position: int) -> Tuple[str, int]:
+    longueur = contenu[position]
+    debut = position + 1
+    return contenu[debut:debut + longueur].decode('utf-8'), debut + longueur
+
+
+class _InferenceHandler(socketserver.BaseRequestHandler):
+    """Une connexion persistante par worker web ; plusieurs requêtes par connexion"""
+
+    def handle(self):
+        while True:
+            try:
+                requete = lire_trame(self.request)
+            except (EOFError, ConnectionError):
+                return
+            self.request.sendall(self.server.traiter(requete))
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Sert les prédictions du registre de modèle sur une socket Unix"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, registry):
+        self.socket_path = socket_path
+        self.registry = registry
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, _InferenceHandler)
+
+    def traiter(self, requete: bytes) -> bytes:
+        import numpy as np
+
+        try:
+            operation, n_lignes, n_features = _ENTETE_REQUETE.unpack_from(requete)
+            if operation != OP_PREDICT:
+                return encoder_erreur(f"Opération inconnue : {operation}")
+
+            X = np.frombuffer(requete, dtype='<f8', offset=_ENTETE_REQUETE.size).reshape(n_lignes, n_features)
+            model, version = self.registry.snapshot()
+            return encoder_reponse(model.predict(X), version)
+
+        except Exception as e:
+            return encoder_erreur(str(e))
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class InferenceClient:
+    """Client du serveur d'inférence avec un pool de connexions persistantes"""
+
+    def __init__(self, socket_path: str, pool_size: int = 4, timeout: float = 0.5):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+        # Dernière version de modèle annoncée par le serveur
+        self.version = None
+        self.requests = 0
+        self.failures = 0
+
+    def _ouvrir(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def _rendre(self, sock: socket.socket):
+        try:
+            self._pool.put_nowait(sock)
+        except queue.Full:
+            sock.close()
+
+    def _echanger(self, sock: socket.socket, requete: bytes) -> bytes:
+        sock.sendall(requete)
+        return lire_trame(sock)
+
+    def predict(self, lignes: Sequence[Sequence[float]]) -> Tuple[List[str], str]:
+        """Prédit les lignes encodées ; lève InferenceError si le serveur est indisponible"""
+        requete = encoder_requete(lignes)
+        self.requests += 1
+
+        # Une connexion du pool peut être périmée (serveur redémarré) : une seconde tentative
+        try:
+            sock = self._pool.get_nowait()
+            tentatives = 2
+        except queue.Empty:
+            sock = None
+            tentatives = 1
+
+        for tentative in range(tentatives):
+            try:
+                if sock is None:
+                    sock = self._ouvrir()
+                reponse = self._echanger(sock, requete)
+                break
+            except (OSError, EOFError) as e:
+                if sock is not None:
+                    sock.close()
+                    sock = None
+                if tentative == tentatives - 1:
+                    self.failures += 1
+                    raise InferenceError(f"Serveur d'inférence indisponible : {e}") from e
+
+        self._rendre(sock)
+        predictions, version = decoder_reponse(reponse)
+        self.version = version
+        return predictions, version
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'socket': self.socket_path,
+            'version': self.version,
+            'requests': self.requests,
+            'failures': self.failures,
+            'pooled_connections': self._pool.qsize(),
+        }
@@ -5,9 +5,10 @@ Utilise la base de connaissances et le processeur NLP pour répondre à toutes l
 
 import random
 import json
+import threading
 from typing import Dict, List, Optional, Tuple
 from .knowledge_base import GrossesseKnowledgeBase
-from .nlp_processor import NLPProcessor
+from .nlp_processor import MessageAnalysis, NLPProcessor
 
 class IntelligentGrossesseChatbot:
     """Chatbot intelligent spécialisé dans la grossesse"""
@@ -20,6 +21,10 @@ class IntelligentGrossesseChatbot:
         self.conversation_history = []
         self.user_profile = {}
         
+        # Coût de l'analyse par intention : {intention: {'messages', 'seconds', 'fields': {champ: n}}}
+        self.intent_costs = {}
+        self._costs_lock = threading.Lock()
+        
         # Réponses par défaut selon l'intention
         self.default_responses = {
             'salutation': [
@@ -124,13 +129,19 @@ class IntelligentGrossesseChatbot:
     
     def handle_general_question(self, message_analysis: Dict) -> str:
         """Traite les questions générales"""
-        message = message_analysis['cleaned_message'].lower()
+        normalized = message_analysis.get('normalized_message')
+        message = normalized.lower if normalized is not None else message_analysis['cleaned_message'].lower()
         
         # Vérifier la FAQ d'abord
         faq_response = message_analysis.get('faq_match')
         if faq_response:
             return faq_response
         
+        # Passages les plus pertinents de la base de connaissances (BM25)
+        passages = self.knowledge_base.search_passages(message)
+        if passages:
+            return "Voici ce que je sais à ce sujet :\n\n" + "\n".join(f"• {passage.texte}" for passage, _ in passages)
+        
         # Rechercher dans la base de connaissances
         topic = self.knowledge_base.find_best_match(message)
         if topic:
@@ -221,7 +232,7 @@ class IntelligentGrossesseChatbot:
     
     def process_message(self, user_message: str) -> Dict[str, any]:
         """Traite un message utilisateur et génère une réponse complète"""
-        # Analyser le message avec NLP
+        # Analyser le message avec NLP : seuls les champs lus par le traitement de l'intention sont calculés
         message_analysis = self.nlp_processor.process_message(user_message)
         
         # Mettre à jour le profil utilisateur
@@ -262,10 +273,12 @@ class IntelligentGrossesseChatbot:
         # Ajouter empathie et soutien
         response = self.add_empathy_and_support(response, message_analysis['sentiment'])
         
-        # Ajouter des questions de suivi si pertinentes
-        if message_analysis['follow_up_questions'] and not message_analysis['is_emergency']:
+        # Ajouter des questions de suivi si pertinentes (jamais calculées pour une urgence)
+        if not message_analysis['is_emergency'] and message_analysis['follow_up_questions']:
             response += "\n\n" + "\n".join([f"❓ {q}" for q in message_analysis['follow_up_questions'][:2]])
         
+        self.record_intent_cost(intention, message_analysis)
+        
         return {
             'response': response,
             'intention': intention,
@@ -275,6 +288,29 @@ class IntelligentGrossesseChatbot:
             **response_data
         }
     
+    def record_intent_cost(self, intention: str, message_analysis: MessageAnalysis):
+        """Cumule les champs d'analyse réellement calculés pour un message de cette intention"""
+        computed = message_analysis.computed()
+        with self._costs_lock:
+            cost = self.intent_costs.setdefault(intention, {'messages': 0, 'seconds': 0.0, 'fields': {}})
+            cost['messages'] += 1
+            cost['seconds'] += sum(computed.values())
+            for field in computed:
+                cost['fields'][field] = cost['fields'].get(field, 0) + 1
+    
+    def stats(self) -> Dict[str, any]:
+        """Temps d'analyse par champ et coût moyen d'un message par intention"""
+        with self._costs_lock:
+            intentions = {
+                intention: {
+                    'messages': cost['messages'],
+                    'mean_us': round(cost['seconds'] / cost['messages'] * 1e6, 1),
+                    'fields': dict(cost['fields']),
+                }
+                for intention, cost in self.intent_costs.items()
+            }
+        return {'fields': self.nlp_processor.timing_stats(), 'intentions': intentions}
+    
     def get_conversation_summary(self) -> str:
         """Génère un résumé de la conversation"""
         if not self.conversation_history:
@@ -0,0 +1,116 @@
+"""
+Automate de recherche de mots-clés (Aho-Corasick)
+Toutes les tables de mots-clés sont compilées une fois en un seul automate ; un message est
+ensuite parcouru en une passe linéaire qui rapporte chaque occurrence avec sa catégorie,
+son étiquette et sa position. Le coût par message ne dépend plus du nombre de mots-clés.
+La recherche est une recherche de sous-chaînes, comme `mot in texte`.
+"""
+
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Set
+
+
+class Correspondance(NamedTuple):
+    categorie: str
+    etiquette: str
+    motif: str
+    position: int
+
+
+class AutomateMotsCles:
+    """Trie des motifs avec liens d'échec ; construire() une fois les motifs ajoutés, sinon au premier rechercher()"""
+
+    def __init__(self):
+        self._transitions: List[Dict[str, int]] = [{}]
+        # Motifs se terminant à chaque nœud ; _sorties y ajoute ceux des suffixes à la construction
+        self._propres: List[List[tuple]] = [[]]
+        self._sorties: List[List[tuple]] = [[]]
+        self._echecs: List[int] = [0]
+        self._delta: List[Dict[str, int]] = [{}]
+        self._suivants = []
+        self._construit = False
+        self._verrou = threading.Lock()
+        self.n_motifs = 0
+
+    def ajouter(self, motif: str, categorie: str, etiquette: str):
+        """Enregistre un motif (déjà en minuscules) sous une catégorie et une étiquette"""
+        if not motif:
+            raise ValueError("Motif vide")
+        noeud = 0
+        for caractere in motif:
+            suivant = self._transitions[noeud].get(caractere)
+            if suivant is None:
+                suivant = len(self._transitions)
+                self._transitions[noeud][caractere] = suivant
+                self._transitions.append({})
+                self._propres.append([])
+                self._echecs.append(0)
+            noeud = suivant
+        self._propres[noeud].append((categorie, etiquette, motif))
+        self._construit = False
+        self.n_motifs += 1
+
+    def ajouter_table(self, categorie: str, table: Dict[str, Iterable[str]]):
+        """Table {étiquette: [motifs]} : chaque motif est rapporté sous son étiquette"""
+        for etiquette, motifs in table.items():
+            for motif in motifs:
+                self.ajouter(motif, categorie, etiquette)
+
+    def ajouter_liste(self, categorie: str, motifs: Iterable[str]):
+        """Liste de motifs : chaque motif est sa propre étiquette"""
+        for motif in motifs:
+            self.ajouter(motif, categorie, motif)
+
+    def construire(self):
+        """Complète l'automate ; sûr entre threads, un seul le construit"""
+        with self._verrou:
+            if not self._construit:
+                self._construire()
+
+    def _construire(self):
+        # Parcours en largeur : le lien d'échec d'un nœud pointe vers le plus long suffixe présent dans
+        # le trie. Les transitions sont complétées au passage (automate déterministe) : la recherche
+        # ne suit jamais de lien d'échec, un seul accès dictionnaire par caractère
+        self._sorties = [list(propres) for propres in self._propres]
+        self._delta = [dict(transitions) for transitions in self._transitions]
+        file = deque()
+        for suivant in self._transitions[0].values():
+            self._echecs[suivant] = 0
+            file.append(suivant)
+
+        while file:
+            noeud = file.popleft()
+            echec = self._echecs[noeud]
+            # Transitions manquantes : celles du nœud d'échec, déjà complété (plus proche de la racine)
+            for caractere, cible in self._delta[echec].items():
+                self._delta[noeud].setdefault(caractere, cible)
+            for caractere, suivant in self._transitions[noeud].items():
+                self._echecs[suivant] = self._delta[echec].get(caractere, 0) if noeud else 0
+                # Les motifs suffixes sont aussi trouvés en ce nœud
+                self._sorties[suivant] += self._sorties[self._echecs[suivant]]
+                file.append(suivant)
+
+        # Méthodes get liées d'avance : la boucle de recherche évite une résolution d'attribut par caractère
+        self._suivants = [transitions.get for transitions in self._delta]
+        self._construit = True
+
+    def rechercher(self, texte: str) -> List[Correspondance]:
+        """Toutes les occurrences (chevauchantes comprises), par position de fin croissante"""
+        if not self._construit:
+            self.construire()
+
+        transitions, sorties = self._suivants, self._sorties
+        correspondances = []
+        noeud = 0
+        for fin, caractere in enumerate(texte):
+            noeud = transitions[noeud](caractere, 0)
+            if sorties[noeud]:
+                for categorie, etiquette, motif in sorties[noeud]:
+                    correspondances.append(Correspondance(categorie, etiquette, motif, fin - len(motif) + 1))
+        return correspondances
+
+
+def etiquettes(correspondances: Iterable[Correspondance], categorie: str) -> Set[str]:
+    """Étiquettes trouvées pour une catégorie"""
+    return {c.etiquette for c in correspondances if c.categorie == categorie}
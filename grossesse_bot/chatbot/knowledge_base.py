@@ -4,13 +4,17 @@ Contient toutes les informations sur la grossesse, les symptômes, les conseils,
 """
 
 import re
+from pathlib import Path
 from typing import Dict, List, Tuple, Optional
-from difflib import get_close_matches
+from .keyword_automaton import AutomateMotsCles, etiquettes
+from .nlp_processor import fold_accents
+from .passage_index import Passage, index_passages, passages_de
+from .trigram_index import IndexTrigrammes
 
 class GrossesseKnowledgeBase:
     """Base de connaissances complète sur la grossesse"""
     
-    def __init__(self):
+    def __init__(self, index_path: Optional[Path] = None):
         self.knowledge = {
             # Informations générales sur la grossesse
             "grossesse_generale": {
@@ -148,22 +152,50 @@ class GrossesseKnowledgeBase:
             "accouchement": ["accouchement", "naissance", "travail", "contractions", "maternité"],
             "symptômes": ["symptôme", "signe", "problème", "inquiétude", "normal"]
         }
+        
+        # Mots-clés compilés en automate : une passe par message
+        self.automate = AutomateMotsCles()
+        self.automate.ajouter_table('sujet', self.keywords)
+        # Construit ici plutôt qu'à la première requête : l'instance est partagée entre threads
+        self.automate.construire()
+        
+        # Recherche approximative : noms de sujets et mots-clés, sans accents
+        self.index = IndexTrigrammes()
+        self.index.ajouter_table({
+            topic: [fold_accents(mot) for mot in (topic, *keywords)]
+            for topic, keywords in self.keywords.items()
+        })
+        self.index.construire()
+        
+        # Titres affichés devant les listes de la base de connaissances
+        self.titles = {
+            "aliments_conseilles": "Aliments conseillés",
+            "aliments_eviter": "Aliments à éviter",
+            "activites_conseillees": "Activités conseillées",
+            "activites_eviter": "Activités à éviter",
+            "urgences": "Signes d'urgence (appelez le 15)",
+            "consultation_rapide": "À signaler rapidement à votre médecin",
+            "signes_travail": "Signes du début du travail",
+            "valise_maternite": "Valise de maternité",
+        }
+        
+        # Index BM25 de toutes les feuilles : construit d'avance (build_knowledge_index) ou au démarrage
+        self.passages = index_passages(passages_de(self.knowledge, self.titles), index_path)
     
     def find_best_match(self, user_input: str) -> Optional[str]:
         """Trouve la meilleure correspondance dans la base de connaissances"""
         user_input = user_input.lower()
         
-        # Recherche par mots-clés
-        for topic, keywords in self.keywords.items():
-            for keyword in keywords:
-                if keyword in user_input:
-                    return topic
+        # Recherche par mots-clés : premier sujet de la table présent dans le message
+        found = etiquettes(self.automate.rechercher(user_input), 'sujet')
+        for topic in self.keywords:
+            if topic in found:
+                return topic
         
-        # Recherche approximative
-        all_topics = list(self.keywords.keys())
-        matches = get_close_matches(user_input, all_topics, n=1, cutoff=0.6)
-        if matches:
-            return matches[0]
+        # Recherche approximative : mot mal orthographié n'importe où dans le message
+        match = self.index.meilleure(fold_accents(user_input))
+        if match:
+            return match.etiquette
         
         return None
     
@@ -250,6 +282,10 @@ class GrossesseKnowledgeBase:
         
         return results
     
+    def search_passages(self, question: str, n: int = 3) -> List[Tuple[Passage, float]]:
+        """Passages de la base de connaissances les plus pertinents (score BM25)"""
+        return self.passages.rechercher(question, n)
+    
     def get_emergency_info(self) -> str:
         """Retourne les informations sur les signes d'urgence"""
         urgences = self.knowledge["signes_alerte"]["urgences"]
@@ -0,0 +1,48 @@
+"""
+Archive les évaluations anciennes et les retire de la table EvaluationGrossesse
+Usage : python manage.py archiver_evaluations [--jours 365] [--batch-size 5000] [--dossier archives/]
+À lancer régulièrement (cron quotidien) : la table ne garde que la période de rétention,
+ses index et la latence des requêtes récentes restent stables. Relancer après une
+interruption est sans risque : une ligne déjà archivée n'est pas dupliquée.
+"""
+
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from chatbot import archive
+
+
+class Command(BaseCommand):
+    help = "Déplace les évaluations plus anciennes que la rétention vers des archives mensuelles compressées"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=settings.EVALUATION_RETENTION_DAYS,
+                            help="Âge (jours) au-delà duquel une évaluation est archivée")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Lignes supprimées par transaction")
+        parser.add_argument('--dossier', default=settings.EVALUATION_ARCHIVE_DIR, help="Dossier des archives")
+
+    def handle(self, *args, **options):
+        if options['jours'] < 0:
+            raise CommandError("--jours doit être positif")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size doit être positif")
+
+        avant = timezone.now() - timedelta(days=options['jours'])
+        dossier = Path(options['dossier'])
+
+        debut = time.perf_counter()
+        bilan = archive.archiver(avant, taille_lot=options['batch_size'], dossier=dossier)
+        duree = time.perf_counter() - debut
+
+        for mois, lignes in bilan.items():
+            taille = archive.chemin_archive(mois, dossier).stat().st_size
+            self.stdout.write(f"   {mois} : {lignes} évaluations archivées ({taille / 1024:.1f} Ko)")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {sum(bilan.values())} évaluations antérieures au {timezone.localtime(avant):%Y-%m-%d} "
+            f"archivées en {duree:.1f} s"
+        ))
@@ -0,0 +1,99 @@
+"""
+Reconstruit les compteurs StatistiqueRisque à partir des évaluations existantes
+Usage : python manage.py backfill_statistiques [--chunk-size 5000]
+Les évaluations sont lues par blocs en pagination par clé (id > dernier id vu) plutôt que
+par OFFSET : chaque bloc est une lecture d'index de coût constant, quelle que soit la table.
+Les évaluations déjà archivées (archiver_evaluations) sont comptées depuis leurs archives ;
+ne pas lancer les deux commandes en même temps.
+Sous PostgreSQL et SQLite, les workers peuvent continuer d'enregistrer des évaluations pendant
+le recalcul ; avec une autre base, arrêter EvaluationWriter (EVALUATION_LOGGING=False) avant.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+
+from chatbot import archive, statistiques
+from chatbot.models import EvaluationGrossesse, StatistiqueRisque
+
+CHAMPS = ('id', 'date', 'profil_risque', 'age', 'mois_grossesse')
+
+
+def parcourir(dernier_id, chunk_size):
+    """Itère sur les évaluations d'id <= dernier_id par blocs de chunk_size, dans l'ordre des id"""
+    curseur = 0
+    while True:
+        bloc = list(
+            EvaluationGrossesse.objects
+            .filter(id__gt=curseur, id__lte=dernier_id)
+            .order_by('id')
+            .values(*CHAMPS)[:chunk_size]
+        )
+        if not bloc:
+            return
+        yield bloc
+        curseur = bloc[-1]['id']
+
+
+def verrouiller_evaluations():
+    """Dans une transaction, attend la fin des écritures d'évaluations en cours et bloque les suivantes
+
+    EvaluationWriter insère un lot et cumule ses compteurs dans la même transaction. Sous
+    PostgreSQL, un lot encore ouvert pendant la remise à zéro pourrait valider des id inférieurs
+    au Max('id') lu, puis cumuler ses compteurs après la remise à zéro : le parcours les
+    compterait une seconde fois. LOCK TABLE ... IN SHARE MODE attend ces lots et retient les
+    suivants jusqu'au commit. SQLite sérialise déjà toutes les écritures.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {connection.ops.quote_name(EvaluationGrossesse._meta.db_table)} IN SHARE MODE')
+
+
+class Command(BaseCommand):
+    help = "Recalcule les compteurs horaires et journaliers des évaluations de risque"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Évaluations lues par requête")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError("--chunk-size doit être positif")
+
+        debut = time.perf_counter()
+
+        # Remise à zéro et borne du parcours dans la même transaction, sans lot d'EvaluationWriter
+        # en cours : les évaluations validées ensuite (id plus grand) sont comptées par
+        # EvaluationWriter, pas par ce parcours
+        with transaction.atomic():
+            verrouiller_evaluations()
+            StatistiqueRisque.objects.all().delete()
+            dernier_id = EvaluationGrossesse.objects.aggregate(dernier=Max('id'))['dernier'] or 0
+
+        total = 0
+        archives = set()
+        for mois, chemin in archive.fichiers_archives():
+            for bloc in archive.blocs_archive(chemin, CHAMPS):
+                colonnes = {nom: valeurs.tolist() for nom, valeurs in bloc.items()}
+                colonnes['date'] = [archive.depuis_microsecondes(valeur) for valeur in colonnes['date']]
+                lignes = [dict(zip(CHAMPS, ligne)) for ligne in zip(*(colonnes[nom] for nom in CHAMPS))]
+                with transaction.atomic():
+                    statistiques.cumuler(statistiques.compter(lignes))
+                archives.update(ligne['id'] for ligne in lignes)
+                total += len(lignes)
+
+        for bloc in parcourir(dernier_id, chunk_size):
+            # Une évaluation archivée mais pas encore supprimée n'est comptée qu'une fois
+            bloc = [ligne for ligne in bloc if ligne['id'] not in archives]
+            with transaction.atomic():
+                statistiques.cumuler(statistiques.compter(bloc))
+            total += len(bloc)
+            self.stdout.write(f"   {total} évaluations agrégées", ending='\r')
+
+        duree = time.perf_counter() - debut
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {total} évaluations agrégées en {duree:.1f} s "
+            f"({StatistiqueRisque.objects.count()} compteurs)"
+        ))
@@ -0,0 +1,209 @@
+"""
+Mesure ce que coûte l'analyse d'un message quand chaque analyseur normalise le texte lui-même,
+et ce qu'elle coûte quand tous partagent un seul NormalizedMessage
+Usage : python manage.py benchmark_nlp [--messages 2000] [--repeat 3] [--faq-sizes 10,1000,5000]
+Le corpus est généré à partir de questions types de patientes (symptômes, âge, semaines, FAQ...).
+Les deux chemins doivent donner les mêmes résultats (contrôle de parité).
+On compte aussi les normalisations par message et les octets de texte qu'elles copient.
+La recherche approximative dans la FAQ (get_close_matches sur le message entier, puis index de
+trigrammes) est ensuite mesurée sur des FAQ agrandies de clés synthétiques. Les messages
+contiennent une question de la FAQ mal orthographiée, et le taux de questions retrouvées est affiché.
+"""
+
+import random
+import sys
+from collections import Counter
+from difflib import get_close_matches
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot.management.commands.benchmark_prediction import mesurer
+from chatbot.keyword_automaton import etiquettes
+from chatbot.knowledge_base import GrossesseKnowledgeBase
+from chatbot.nlp_processor import NLPProcessor, fold_accents
+from chatbot.trigram_index import MOT, IndexTrigrammes
+
+DEBUTS = (
+    "Bonjour,", "Bonsoir docteur,", "Salut !", "Excusez-moi,", "", "Merci pour votre aide.",
+)
+CONTEXTES = (
+    "je suis enceinte de {semaines} semaines", "j'ai {age} ans et je suis au {trimestre} trimestre",
+    "je pèse {poids} kg pour {taille} cm", "c'est ma première grossesse", "je suis au {mois}ème mois",
+    "",
+)
+QUESTIONS = (
+    "j'ai des nausées depuis ce matin, est-ce normal ?",
+    "j'ai très mal au ventre et je suis inquiète",
+    "est-ce que je peux boire du café ?",
+    "quand dois-je faire la première échographie ?",
+    "j'ai un peu de fièvre et des frissons, que faire ?",
+    "je me sens fatiguée et épuisée tout le temps",
+    "puis-je continuer le sport et la natation ?",
+    "j'ai perdu du liquide cette nuit",
+    "quel régime alimentaire me conseillez-vous ?",
+    "j'ai des douleurs dans le dos et les jambes",
+    "je voudrais une évaluation de mon risque",
+    "combien de poids est-il normal de prendre ?",
+    "j'ai mal de tête et une vision floue",
+    "tout va bien, je suis heureuse !",
+    "au revoir et merci beaucoup",
+)
+TRIMESTRES = ('premier', 'deuxième', 'troisième', '1er', '2ème')
+
+ANALYSEURS = ('detect_intention', 'analyze_sentiment', 'extract_info', 'extract_medical_info',
+              'extract_pregnancy_stage', 'is_emergency', 'find_faq_match')
+
+
+def generer_corpus(n, seed=42):
+    generateur = random.Random(seed)
+    corpus = []
+    for _ in range(n):
+        contexte = generateur.choice(CONTEXTES).format(
+            semaines=generateur.randint(4, 40), age=generateur.randint(17, 45),
+            trimestre=generateur.choice(TRIMESTRES), poids=generateur.randint(48, 95),
+            taille=generateur.randint(150, 185), mois=generateur.randint(2, 9),
+        )
+        phrases = [generateur.choice(DEBUTS), contexte, *generateur.sample(QUESTIONS, generateur.randint(1, 3))]
+        corpus.append(' '.join(phrase for phrase in phrases if phrase))
+    return corpus
+
+
+def mal_orthographier(mot, generateur):
+    """Une faute de frappe : lettre doublée, oubliée ou remplacée (jamais la première)"""
+    if len(mot) < 4:
+        return mot
+    i = generateur.randint(1, len(mot) - 1)
+    faute = generateur.choice(('double', 'oubli', 'remplace'))
+    if faute == 'double':
+        return mot[:i] + mot[i] + mot[i:]
+    if faute == 'oubli':
+        return mot[:i] + mot[i + 1:]
+    return mot[:i] + generateur.choice('aeiourst') + mot[i + 1:]
+
+
+def cles_synthetiques(n, exclus, seed=42):
+    """n clés de FAQ d'un à trois mots tirés du vocabulaire de la base de connaissances
+
+    Les mots proches d'un mot exclu (ceux du corpus et des vraies questions) sont écartés : une
+    clé synthétique ne doit pas être une bonne réponse approximative.
+    """
+    def textes(noeud):
+        if isinstance(noeud, dict):
+            for valeur in noeud.values():
+                yield from textes(valeur)
+        elif isinstance(noeud, str):
+            yield noeud
+
+    vocabulaire = sorted({mot for texte in textes(GrossesseKnowledgeBase().knowledge)
+                          for mot in MOT.findall(fold_accents(texte.lower()))
+                          if len(mot) >= 4 and mot.isalpha()})
+    vocabulaire = [mot for mot in vocabulaire if not get_close_matches(mot, exclus, n=1, cutoff=0.7)]
+    generateur = random.Random(seed)
+    cles = set()
+    while len(cles) < n:
+        cles.add(' '.join(generateur.sample(vocabulaire, generateur.randint(1, 3))))
+    return sorted(cles)
+
+
+def compter_normalisations(nlp):
+    """Remplace nlp.normalize par une version qui compte les formes construites et leur taille"""
+    compteurs = Counter()
+    normalize = nlp.normalize
+
+    def normalize_compte(text):
+        message = normalize(text)
+        if message is not text:
+            compteurs['normalisations'] += 1
+            compteurs['octets'] += (sys.getsizeof(message.lower) + sys.getsizeof(message.tokens)
+                                    + sys.getsizeof(message.token_set)
+                                    + sum(sys.getsizeof(token) for token in message.tokens))
+            if message.folded is not message.lower:
+                compteurs['octets'] += sys.getsizeof(message.folded)
+        return message
+
+    nlp.normalize = normalize_compte
+    return compteurs
+
+
+class Command(BaseCommand):
+    help = "Benchmark de l'analyse d'un message : normalisation par analyseur ou partagée"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000, help="Taille du corpus généré")
+        parser.add_argument('--repeat', type=int, default=3, help="Passages sur le corpus")
+        parser.add_argument('--faq-sizes', default='10,1000,5000', help="Tailles de FAQ pour la recherche approximative")
+        parser.add_argument('--fuzzy-messages', type=int, default=200,
+                            help="Messages de la recherche approximative (get_close_matches est lent)")
+
+    def handle(self, *args, **options):
+        nlp = NLPProcessor()
+        corpus = [nlp.clean_text(message) for message in generer_corpus(options['messages'])]
+
+        def analyseurs_separes(texte):
+            # Chaque analyseur reçoit le texte brut et refait sa propre normalisation
+            return {analyseur: getattr(nlp, analyseur)(texte) for analyseur in ANALYSEURS}
+
+        def message_partage(texte):
+            normalized = nlp.normalize(texte)
+            return {analyseur: getattr(nlp, analyseur)(normalized) for analyseur in ANALYSEURS}
+
+        for texte in corpus:
+            if analyseurs_separes(texte) != message_partage(texte):
+                raise CommandError(f"❌ Parité rompue sur {texte!r}")
+        self.stdout.write(self.style.SUCCESS(f"✅ Parité vérifiée sur {len(corpus)} messages"))
+
+        longueur = sum(map(len, corpus)) / len(corpus)
+        self.stdout.write(f"Analyse complète ({longueur:.0f} caractères par message en moyenne)")
+        for nom, analyser in (('analyseurs séparés', analyseurs_separes), ('message partagé', message_partage)):
+            compteurs = compter_normalisations(nlp)
+            for texte in corpus:
+                analyser(texte)
+            del nlp.normalize
+
+            p50, p99 = mesurer(analyser, corpus, options['repeat'])
+            self.stdout.write(
+                f"  {nom:<20} p50 {p50 * 1e6:7.1f} µs   p99 {p99 * 1e6:7.1f} µs   "
+                f"{compteurs['normalisations'] / len(corpus):4.1f} normalisations   "
+                f"{compteurs['octets'] / len(corpus):7.0f} octets copiés par message"
+            )
+
+        self.mesurer_recherche_approchee(nlp, corpus, options)
+
+    def mesurer_recherche_approchee(self, nlp, corpus, options):
+        generateur = random.Random(7)
+        questions = [fold_accents(question) for question in nlp.faq]
+        # Comme dans find_faq_match, la recherche approximative ne sert que sans question exacte :
+        # messages sans clé de la FAQ, et clés synthétiques faites de mots absents du corpus
+        corpus = [texte for texte in corpus if not etiquettes(nlp.find_keywords(texte), 'faq')]
+        mots_exclus = {mot for texte in corpus + questions for mot in MOT.findall(fold_accents(texte.lower()))}
+        messages = []
+        for texte in corpus[:options['fuzzy_messages']]:
+            question = generateur.choice(questions)
+            faute = ' '.join(mal_orthographier(mot, generateur) for mot in question.split())
+            mots = fold_accents(texte.lower()).split()
+            mots.insert(generateur.randint(0, len(mots)), faute)
+            messages.append((' '.join(mots), question))
+
+        self.stdout.write(f"Recherche approximative dans la FAQ ({len(messages)} messages avec une question mal orthographiée)")
+        for taille in (int(t) for t in options['faq_sizes'].split(',')):
+            cles = questions + cles_synthetiques(max(0, taille - len(questions)), mots_exclus)
+            index = IndexTrigrammes()
+            index.ajouter_liste(cles)
+            index.meilleure('')
+
+            def difflib_(message):
+                return get_close_matches(message, cles, n=1, cutoff=0.6)
+
+            def trigrammes_(message):
+                return index.meilleure(message)
+
+            for nom, chercher, trouvee in (
+                ('get_close_matches', difflib_, lambda resultat, question: resultat == [question]),
+                ('index trigrammes', trigrammes_, lambda resultat, question: resultat is not None and resultat.cle == question),
+            ):
+                retrouvees = sum(trouvee(chercher(message), question) for message, question in messages)
+                p50, p99 = mesurer(chercher, [message for message, _ in messages], 1)
+                self.stdout.write(
+                    f"  {len(cles):>6} clés  {nom:<18} p50 {p50 * 1e6:9.1f} µs   p99 {p99 * 1e6:9.1f} µs   "
+                    f"{retrouvees / len(messages):6.1%} retrouvées"
+                )
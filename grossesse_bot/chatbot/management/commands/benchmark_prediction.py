@@ -0,0 +1,81 @@
+"""
+Compare la latence d'une prédiction unitaire : scikit-learn, code généré et forêt compilée
+Usage : python manage.py benchmark_prediction [--rows 1000] [--model model_risque_grossesse.pkl]
+Les lignes sont tirées de donnees_grossesse.csv, encodées avec les mappings générés par train_model ;
+les trois évaluateurs doivent donner les mêmes classes sur chacune (contrôle de parité).
+"""
+
+import time
+from io import BytesIO
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot import training
+from chatbot.flat_forest import FlatForest, exporter_foret
+from chatbot.forest_codegen import charger_code, generer_source
+from chatbot.model_registry import PROJECT_ROOT, ModelRegistry
+
+
+def echantillonner_lignes(chemin, n, seed=42):
+    """Tire n lignes encodées du CSV (via son cache en colonnes)"""
+    X = training.charger_colonnes(chemin).matrice()
+    indices = np.random.RandomState(seed).permutation(len(X))[:n]
+    return X[indices].tolist()
+
+
+def mesurer(predire, lignes, repetitions):
+    durees = []
+    for _ in range(repetitions):
+        for ligne in lignes:
+            debut = time.perf_counter()
+            predire(ligne)
+            durees.append(time.perf_counter() - debut)
+    durees.sort()
+    return durees[len(durees) // 2], durees[min(len(durees) - 1, int(0.99 * len(durees)))]
+
+
+class Command(BaseCommand):
+    help = "Benchmark p50/p99 d'une prédiction unitaire et contrôle de parité des évaluateurs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', help="Chemin du modèle .pkl (par défaut : registre partagé)")
+        parser.add_argument('--data', default=str(PROJECT_ROOT / 'donnees_grossesse.csv'))
+        parser.add_argument('--rows', type=int, default=1000, help="Nombre de lignes tirées du CSV")
+        parser.add_argument('--repeat', type=int, default=3, help="Passages sur l'échantillon")
+
+    def handle(self, *args, **options):
+        registry = ModelRegistry(path=options['model']) if options['model'] else ModelRegistry()
+        try:
+            model = registry.get_model()
+        except OSError as e:
+            raise CommandError(f"Modèle introuvable : {e}")
+        if isinstance(model, FlatForest):
+            raise CommandError("Le benchmark compare scikit-learn aux évaluateurs compilés : fournir un .pkl")
+
+        try:
+            lignes = echantillonner_lignes(options['data'], options['rows'])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Données illisibles : {e}")
+
+        foret = exporter_foret(model)
+        debut = time.perf_counter()
+        code = charger_code(BytesIO(generer_source(foret).encode('utf-8')))
+        self.stdout.write(f"🛠️ Code généré et compilé en {time.perf_counter() - debut:.2f}s")
+
+        # Parité : mêmes classes sur chaque ligne de l'échantillon
+        reference = model.predict(np.asarray(lignes, dtype=np.float64)).tolist()
+        for nom, evaluateur in (('code généré', code), ('forêt compilée', foret)):
+            ecarts = sum(a != b for a, b in zip(evaluateur.predict(lignes), reference))
+            if ecarts:
+                raise CommandError(f"❌ Parité rompue : {ecarts} écarts entre {nom} et scikit-learn")
+        self.stdout.write(self.style.SUCCESS(f"✅ Parité vérifiée sur {len(lignes)} lignes"))
+
+        evaluateurs = (
+            ('scikit-learn', lambda ligne: model.predict(np.asarray([ligne], dtype=np.float64))),
+            ('code généré', code.predict_row),
+            ('forêt compilée', foret.predict_row),
+        )
+        for nom, predire in evaluateurs:
+            p50, p99 = mesurer(predire, lignes, options['repeat'])
+            self.stdout.write(f"{nom:<16} p50 {p50 * 1e6:9.1f} µs   p99 {p99 * 1e6:9.1f} µs")
@@ -0,0 +1,116 @@
+"""
+Compare le coût par requête de la validation DRF et de la validation rapide de /api/predire/
+Usage : python manage.py benchmark_validation [--rows 500] [--repeat 3]
+Les enregistrements sont tirés de donnees_grossesse.csv, complétés de variantes invalides ;
+les deux validations doivent produire les mêmes données ou les mêmes erreurs (contrôle de parité).
+Mesure la validation seule, puis la requête complète (prédiction servie par le cache).
+"""
+
+import csv
+import itertools
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from chatbot import views
+from chatbot.management.commands.benchmark_prediction import mesurer
+from chatbot.model_registry import PROJECT_ROOT
+from chatbot.serializers import GrossesseInputSerializer
+
+# Altérations appliquées à une partie des enregistrements pour couvrir les chemins d'erreur
+VARIANTES_INVALIDES = (
+    {'age': 'trente'},
+    {'mois_grossesse': 12},
+    {'poids_kg': None},
+    {'taille_cm': 'nan'},
+    {'régime': ''},
+    {'symptôme': ['aucun']},
+)
+
+
+def echantillonner_enregistrements(chemin, n, seed=42):
+    """n enregistrements du CSV dont un sur cinq rendu invalide"""
+    with open(chemin, newline='', encoding='utf-8') as fichier:
+        lignes = list(itertools.islice(csv.DictReader(fichier), 20 * n))
+    generateur = random.Random(seed)
+    enregistrements = []
+    for ligne in generateur.sample(lignes, min(n, len(lignes))):
+        enregistrement = {
+            'age': int(ligne['age']),
+            'mois_grossesse': int(ligne['mois_grossesse']),
+            'poids_kg': float(ligne['poids_kg']),
+            'taille_cm': float(ligne['taille_cm']),
+            **{colonne: ligne[colonne] for colonne in ('activité', 'régime', 'antécédents', 'symptôme')},
+        }
+        if generateur.random() < 0.2:
+            enregistrement.update(generateur.choice(VARIANTES_INVALIDES))
+        enregistrements.append(enregistrement)
+    return enregistrements
+
+
+def valider_drf(enregistrement):
+    serializer = GrossesseInputSerializer(data=enregistrement)
+    if not serializer.is_valid():
+        return None, json.loads(json.dumps(serializer.errors))
+    return dict(serializer.validated_data), None
+
+
+class Command(BaseCommand):
+    help = "Benchmark du serializer DRF face à la validation rapide de /api/predire/"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', default=str(PROJECT_ROOT / 'donnees_grossesse.csv'))
+        parser.add_argument('--rows', type=int, default=500, help="Enregistrements tirés du CSV")
+        parser.add_argument('--repeat', type=int, default=3, help="Passages sur l'échantillon")
+
+    def handle(self, *args, **options):
+        try:
+            enregistrements = echantillonner_enregistrements(options['data'], options['rows'])
+        except (OSError, KeyError, ValueError) as e:
+            raise CommandError(f"Données illisibles : {e}")
+
+        # Parité : mêmes données validées, ou mêmes erreurs par champ
+        for enregistrement in enregistrements:
+            if valider_drf(enregistrement) != views.validateur.valider(enregistrement):
+                raise CommandError(f"❌ Parité rompue sur {enregistrement}")
+        self.stdout.write(self.style.SUCCESS(f"✅ Parité vérifiée sur {len(enregistrements)} enregistrements"))
+
+        def valider_rapide(enregistrement):
+            data, erreurs = views.validateur.valider(enregistrement)
+            if data is not None:
+                views.validateur.encoder(data)
+
+        def valider_serializer(enregistrement):
+            serializer = GrossesseInputSerializer(data=enregistrement)
+            if serializer.is_valid():
+                views.encoder_entree(serializer.validated_data)
+
+        self.stdout.write("Validation seule")
+        for nom, valider in (('serializer DRF', valider_serializer), ('validation rapide', valider_rapide)):
+            p50, p99 = mesurer(valider, enregistrements, options['repeat'])
+            self.stdout.write(f"  {nom:<18} p50 {p50 * 1e6:9.1f} µs   p99 {p99 * 1e6:9.1f} µs")
+
+        # Requête complète : un premier passage remplit le cache, la prédiction ne pèse plus
+        factory = RequestFactory()
+        corps = [json.dumps(enregistrement) for enregistrement in enregistrements]
+
+        def requete(vue):
+            def appeler(contenu):
+                reponse = vue(factory.post('/api/predire/', contenu, content_type='application/json'))
+                # Une Response DRF n'est sérialisée qu'au rendu
+                if hasattr(reponse, 'render'):
+                    reponse.render()
+            return appeler
+
+        chemins = (('DRF + Response', requete(views.predire_risque_drf)),
+                   ('JsonResponse', requete(views.predire_risque)))
+        for _, appeler in chemins:
+            for contenu in corps:
+                appeler(contenu)
+
+        self.stdout.write("Requête complète (prédiction en cache)")
+        for nom, appeler in chemins:
+            p50, p99 = mesurer(appeler, corps, options['repeat'])
+            self.stdout.write(f"  {nom:<18} p50 {p50 * 1e6:9.1f} µs   p99 {p99 * 1e6:9.1f} µs")
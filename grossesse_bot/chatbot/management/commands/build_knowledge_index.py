@@ -0,0 +1,83 @@
+"""
+Construit d'avance l'index BM25 des passages de la base de connaissances
+Usage : python manage.py build_knowledge_index [--output knowledge_base.index] [--benchmark 1000,10000,50000]
+Au démarrage, GrossesseKnowledgeBase projette ce fichier en mémoire au lieu de tokeniser chaque
+passage ; il est ignoré (et l'index reconstruit en mémoire) dès que la base de connaissances change.
+--benchmark mesure la latence des questions sur des bases agrandies de passages synthétiques,
+pour vérifier qu'elle ne croît pas avec le nombre de passages.
+"""
+
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot.knowledge_base import GrossesseKnowledgeBase
+from chatbot.management.commands.benchmark_nlp import QUESTIONS
+from chatbot.management.commands.benchmark_prediction import mesurer
+from chatbot.passage_index import MOT, IndexPassages, Passage, chemin_index_par_defaut, passages_de
+
+
+def passages_synthetiques(passages, n, seed=42):
+    """n passages de 8 à 25 mots tirés du vocabulaire des vrais passages"""
+    vocabulaire = sorted({mot for passage in passages for mot in MOT.findall(passage.texte.lower())})
+    generateur = random.Random(seed)
+    return [
+        Passage(('synthetique', str(i)), ' '.join(generateur.choices(vocabulaire, k=generateur.randint(8, 25))))
+        for i in range(n)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Construit l'index BM25 des passages de la base de connaissances"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=str(chemin_index_par_defaut()),
+                            help="Fichier d'index (par défaut : KNOWLEDGE_INDEX_PATH ou knowledge_base.index)")
+        parser.add_argument('--benchmark', default='', help="Tailles de bases synthétiques à mesurer, ex. 1000,10000")
+        parser.add_argument('--repeat', type=int, default=20, help="Passages sur les questions du benchmark")
+
+    def handle(self, *args, **options):
+        knowledge_base = GrossesseKnowledgeBase()
+        passages = passages_de(knowledge_base.knowledge, knowledge_base.titles)
+
+        debut = time.perf_counter()
+        index = IndexPassages.construire(passages)
+        construction = time.perf_counter() - debut
+        chemin = Path(options['output'])
+        try:
+            index.sauvegarder(chemin)
+        except OSError as e:
+            raise CommandError(f"Écriture impossible : {e}")
+
+        debut = time.perf_counter()
+        IndexPassages.charger(chemin, index.empreinte)
+        chargement = time.perf_counter() - debut
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Index écrit dans {chemin} : {len(index)} passages, {len(index.vocabulaire)} termes, "
+            f"{chemin.stat().st_size / 1024:.1f} Ko (construction {construction * 1e3:.1f} ms, "
+            f"chargement {chargement * 1e3:.2f} ms)"
+        ))
+
+        if options['benchmark']:
+            self.mesurer_croissance(passages, options)
+
+    def mesurer_croissance(self, passages, options):
+        self.stdout.write(f"Latence d'une question ({len(QUESTIONS)} questions types)")
+        with tempfile.TemporaryDirectory() as dossier:
+            for taille in [0] + [int(t) for t in options['benchmark'].split(',')]:
+                base = passages + passages_synthetiques(passages, taille)
+                debut = time.perf_counter()
+                index = IndexPassages.construire(base)
+                construction = time.perf_counter() - debut
+                chemin = Path(dossier) / f'{taille}.index'
+                index.sauvegarder(chemin)
+                index = IndexPassages.charger(chemin)
+
+                p50, p99 = mesurer(index.rechercher, QUESTIONS, options['repeat'])
+                self.stdout.write(
+                    f"  {len(base):>7} passages  construction {construction:7.2f} s   "
+                    f"p50 {p50 * 1e6:7.1f} µs   p99 {p99 * 1e6:7.1f} µs"
+                )
@@ -0,0 +1,141 @@
+"""
+Produit des variantes compactes du modèle de risque et leur frontière de Pareto
+Usage : python manage.py compact_model [--estimators 200,100,50,25,10] [--depths 0,8,6,4] [--save dossier]
+Chaque variante (moins d'arbres, profondeur limitée, seuils float32 et feuilles dédoublonnées)
+est mesurée sur la partie test de donnees_grossesse.csv : exactitude, taille sur disque
+(brute et gzip), temps de chargement et latence d'une prédiction unitaire.
+"""
+
+import gzip
+import time
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot import training
+from chatbot.flat_forest import FlatForest, compacter_foret, exporter_foret
+from chatbot.model_registry import PROJECT_ROOT, ModelRegistry
+
+
+def liste_entiers(texte):
+    return [int(valeur) for valeur in texte.split(',') if valeur.strip()]
+
+
+def probas_vectorisees(foret, X):
+    """Évalue la forêt sur toutes les lignes à la fois (numpy), pour mesurer l'exactitude"""
+    feature = np.frombuffer(foret.feature, dtype=foret.feature.typecode)
+    threshold = np.frombuffer(foret.threshold, dtype=foret.threshold.typecode)
+    left = np.frombuffer(foret.left, dtype=foret.left.typecode)
+    right = np.frombuffer(foret.right, dtype=foret.right.typecode)
+    probas = np.asarray(foret._proba)
+
+    X = np.asarray(X, dtype=np.float32)
+    lignes = np.arange(len(X))
+    totaux = np.zeros((len(X), foret.n_classes))
+    for racine in foret.roots:
+        noeuds = np.full(len(X), racine)
+        internes = left[noeuds] != -1
+        while internes.any():
+            n = noeuds[internes]
+            gauche = X[lignes[internes], feature[n]] <= threshold[n]
+            noeuds[internes] = np.where(gauche, left[n], right[n])
+            internes = left[noeuds] != -1
+        totaux += probas[right[noeuds]]
+    return totaux / foret.n_estimators
+
+
+def mesurer(foret, X_test, y_test, n_latence=200):
+    contenu = foret.to_bytes()
+
+    chargements = []
+    for _ in range(3):
+        debut = time.perf_counter()
+        FlatForest.from_bytes(contenu)
+        chargements.append(time.perf_counter() - debut)
+
+    durees = []
+    for ligne in X_test[:n_latence].tolist():
+        debut = time.perf_counter()
+        foret.predict_row(ligne)
+        durees.append(time.perf_counter() - debut)
+    durees.sort()
+
+    predictions = np.asarray(foret.classes)[probas_vectorisees(foret, X_test).argmax(axis=1)]
+    return {
+        'accuracy': float((predictions == y_test).mean()),
+        'size': len(contenu),
+        'gzip_size': len(gzip.compress(contenu, compresslevel=6)),
+        'load_ms': sorted(chargements)[1] * 1000,
+        'latency_ms': durees[len(durees) // 2] * 1000,
+    }
+
+
+def frontiere_pareto(variantes):
+    """Variantes non dominées : aucune autre n'est au moins aussi exacte, petite et rapide à la fois"""
+    def domine(a, b):
+        meilleure_ou_egale = (a['accuracy'] >= b['accuracy'] and a['size'] <= b['size']
+                              and a['latency_ms'] <= b['latency_ms'])
+        strictement = (a['accuracy'] > b['accuracy'] or a['size'] < b['size']
+                       or a['latency_ms'] < b['latency_ms'])
+        return meilleure_ou_egale and strictement
+
+    return [v for v in variantes if not any(domine(autre, v) for autre in variantes if autre is not v)]
+
+
+class Command(BaseCommand):
+    help = "Compare des variantes compactes du modèle (exactitude, taille, chargement, latence)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', help="Chemin du modèle .pkl (par défaut : registre partagé)")
+        parser.add_argument('--data', default=str(PROJECT_ROOT / 'donnees_grossesse.csv'))
+        parser.add_argument('--estimators', type=liste_entiers, default=[200, 100, 50, 25, 10],
+                            help="Nombres d'arbres conservés, séparés par des virgules")
+        parser.add_argument('--depths', type=liste_entiers, default=[0, 8, 6, 4],
+                            help="Profondeurs maximales (0 : profondeur du modèle)")
+        parser.add_argument('--save', help="Dossier où écrire les variantes de la frontière (.forest)")
+
+    def handle(self, *args, **options):
+        registry = ModelRegistry(path=options['model']) if options['model'] else ModelRegistry()
+        try:
+            model = registry.get_model()
+        except OSError as e:
+            raise CommandError(f"Modèle introuvable : {e}")
+        if not hasattr(model, 'estimators_'):
+            raise CommandError("La compaction part du RandomForest scikit-learn : fournir un .pkl")
+
+        try:
+            _, X_test, _, y_test = training.decouper(training.charger_colonnes(options['data']))
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Données illisibles : {e}")
+        self.stdout.write(f"📊 {len(X_test)} lignes de test, modèle {registry.version} "
+                          f"({len(model.estimators_)} arbres)")
+
+        variantes = []
+        for profondeur in options['depths']:
+            foret = exporter_foret(model, max_depth=profondeur or None)
+            for n_estimators in sorted(set(min(n, foret.n_estimators) for n in options['estimators']),
+                                       reverse=True):
+                for compacte in (False, True):
+                    variante = compacter_foret(foret, n_estimators=n_estimators,
+                                               float32=compacte, dedup_leaves=compacte)
+                    nom = f"n{n_estimators}-d{profondeur or 'max'}" + ('-f32' if compacte else '')
+                    variantes.append({'nom': nom, 'foret': variante, **mesurer(variante, X_test, y_test)})
+
+        pareto = frontiere_pareto(variantes)
+        self.stdout.write(f"{'':2}{'variante':<16}{'exactitude':>11}{'taille':>10}{'gzip':>10}"
+                          f"{'chargement':>12}{'latence':>10}")
+        for v in sorted(variantes, key=lambda v: v['size']):
+            self.stdout.write(
+                f"{'★' if v in pareto else '':2}{v['nom']:<16}{v['accuracy']:>11.4f}"
+                f"{v['size'] / 1024:>8.0f}Ko{v['gzip_size'] / 1024:>8.0f}Ko"
+                f"{v['load_ms']:>10.1f}ms{v['latency_ms']:>8.3f}ms"
+            )
+        self.stdout.write(self.style.SUCCESS(f"✅ {len(pareto)} variantes sur la frontière de Pareto (★)"))
+
+        if options['save']:
+            dossier = Path(options['save'])
+            dossier.mkdir(parents=True, exist_ok=True)
+            for v in pareto:
+                v['foret'].save(dossier / f"model_risque_grossesse-{v['nom']}.forest")
+            self.stdout.write(f"💾 Variantes de la frontière écrites dans {dossier}")
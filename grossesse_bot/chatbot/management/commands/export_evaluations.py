@@ -0,0 +1,66 @@
+"""
+Exporte l'historique des évaluations en CSV ou NDJSON, en flux
+Usage : python manage.py export_evaluations sortie.csv [--type ndjson] [--debut 2025-01-01] [--fin 2025-04-01] [--archives]
+Même parcours que GET /api/evaluations/export/ : pagination par clé sur (date, id),
+mémoire constante quelle que soit la période. « - » écrit sur la sortie standard.
+"""
+
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot import archive, export
+from chatbot.views import lire_date
+
+
+class Command(BaseCommand):
+    help = "Exporte les évaluations de risque en CSV ou NDJSON sans charger la période en mémoire"
+
+    def add_arguments(self, parser):
+        parser.add_argument('sortie', help="Fichier de sortie, ou - pour la sortie standard")
+        parser.add_argument('--type', choices=sorted(export.FORMATS), default='csv', dest='format')
+        parser.add_argument('--debut', help="Date ISO de début (incluse)")
+        parser.add_argument('--fin', help="Date ISO de fin (exclue)")
+        parser.add_argument('--archives', action='store_true',
+                            help="Inclure les évaluations archivées par archiver_evaluations")
+        parser.add_argument('--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE,
+                            help="Évaluations lues par requête")
+
+    def handle(self, *args, **options):
+        try:
+            debut = lire_date(options['debut'])
+            fin = lire_date(options['fin'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size doit être positif")
+
+        depart = time.perf_counter()
+        lignes = 0
+
+        def compter(blocs):
+            nonlocal lignes
+            for bloc in blocs:
+                lignes += len(bloc)
+                yield bloc
+
+        source = archive if options['archives'] else export
+        blocs = compter(source.parcourir(debut, fin, taille_bloc=options['chunk_size']))
+        if options['sortie'] == '-':
+            sortie = sys.stdout
+        else:
+            sortie = open(options['sortie'], 'w', encoding='utf-8', newline='')
+        try:
+            for morceau in export.generer(options['format'], blocs):
+                sortie.write(morceau)
+        finally:
+            if sortie is not sys.stdout:
+                sortie.close()
+
+        if options['sortie'] != '-':
+            duree = time.perf_counter() - depart
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {lignes} évaluations exportées vers {options['sortie']} en {duree:.1f} s"
+            ))
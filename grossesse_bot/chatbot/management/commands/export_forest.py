@@ -0,0 +1,72 @@
+"""
+Exporte le RandomForest entraîné en forêt compilée (tableaux plats)
+Usage : python manage.py export_forest [--output model_risque_grossesse.forest]
+        python manage.py export_forest --compress [--compact] [--max-size-kb 5120]
+Avec --compress, écrit l'artefact gzip versionné embarqué par les handlers Vercel légers,
+et refuse de le publier s'il dépasse le budget de taille.
+"""
+
+import time
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot.flat_forest import (DEFAULT_FOREST_PATH, EMBEDDED_FOREST_PATH, FlatForest, charger_foret,
+                                 compacter_foret, compresser_foret, exporter_foret)
+from chatbot.model_registry import ModelRegistry
+from chatbot.training import publier
+
+
+class Command(BaseCommand):
+    help = "Compile le modèle de risque en tableaux plats évaluables sans scikit-learn"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', help="Chemin du modèle .pkl (par défaut : registre partagé)")
+        parser.add_argument('--output', help="Fichier de sortie (par défaut : model_risque_grossesse.forest, "
+                                             "ou .forest.gz avec --compress)")
+        parser.add_argument('--compress', action='store_true', help="Écrire l'artefact gzip versionné")
+        parser.add_argument('--compact', action='store_true',
+                            help="Seuils float32 et feuilles dédoublonnées (prédictions inchangées)")
+        parser.add_argument('--n-estimators', type=int, help="Ne garder que les N premiers arbres")
+        parser.add_argument('--max-depth', type=int, help="Tronquer les arbres à cette profondeur")
+        parser.add_argument('--max-size-kb', type=float, default=settings.FOREST_SIZE_BUDGET_KB,
+                            help="Budget de taille de l'artefact compressé (0 : pas de contrôle)")
+
+    def handle(self, *args, **options):
+        registry = ModelRegistry(path=options['model']) if options['model'] else ModelRegistry()
+
+        try:
+            model = registry.get_model()
+        except OSError as e:
+            raise CommandError(f"Modèle introuvable : {e}")
+
+        debut = time.perf_counter()
+        foret = exporter_foret(model, max_depth=options['max_depth'])
+        if options['compact'] or options['n_estimators']:
+            foret = compacter_foret(foret, n_estimators=options['n_estimators'],
+                                    float32=options['compact'], dedup_leaves=options['compact'])
+
+        if options['compress']:
+            sortie = options['output'] or str(EMBEDDED_FOREST_PATH)
+            contenu = compresser_foret(foret)
+            budget = options['max_size_kb']
+            if budget and len(contenu) > budget * 1024:
+                raise CommandError(
+                    f"❌ Artefact de {len(contenu) / 1024:.0f} Ko au-delà du budget de {budget:.0f} Ko : non publié "
+                    f"(essayez --compact, --n-estimators ou --max-depth, voir compact_model)"
+                )
+            # Vérifier la relecture avant de publier
+            charger_foret(BytesIO(contenu))
+        else:
+            sortie = options['output'] or str(DEFAULT_FOREST_PATH)
+            contenu = foret.to_bytes()
+            FlatForest.from_bytes(contenu)
+
+        publier(Path(sortie), contenu)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Forêt compilée : {foret.n_estimators} arbres, {foret.n_nodes} nœuds, "
+            f"{len(contenu) / 1024:.0f} Ko -> {sortie} ({time.perf_counter() - debut:.2f}s)"
+        ))
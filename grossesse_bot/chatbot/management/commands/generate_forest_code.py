@@ -0,0 +1,51 @@
+"""
+Génère le module Python de prédiction (if imbriqués) à partir du modèle entraîné
+Usage : python manage.py generate_forest_code [--model model_risque_grossesse.pkl] [--output model_risque_grossesse_genere.py]
+Le module est aussi byte-compilé (.pyc) : MODEL_PATH peut pointer vers l'un ou l'autre.
+"""
+
+import py_compile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot.flat_forest import FlatForest, exporter_foret
+from chatbot.forest_codegen import generer_source
+from chatbot.model_registry import PROJECT_ROOT, ModelRegistry
+
+DEFAULT_CODE_PATH = PROJECT_ROOT / 'model_risque_grossesse_genere.py'
+
+
+class Command(BaseCommand):
+    help = "Génère et byte-compile une fonction de décision Python équivalente au modèle de risque"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', help="Modèle .pkl ou forêt compilée .forest (par défaut : registre partagé)")
+        parser.add_argument('--output', default=str(DEFAULT_CODE_PATH), help="Fichier .py généré")
+
+    def handle(self, *args, **options):
+        registry = ModelRegistry(path=options['model']) if options['model'] else ModelRegistry()
+
+        try:
+            model = registry.get_model()
+        except OSError as e:
+            raise CommandError(f"Modèle introuvable : {e}")
+
+        debut = time.perf_counter()
+        foret = model if isinstance(model, FlatForest) else exporter_foret(model)
+
+        try:
+            source = generer_source(foret)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        sortie = Path(options['output'])
+        sortie.write_text(source, encoding='utf-8')
+        compile_ = sortie.with_suffix('.pyc')
+        py_compile.compile(str(sortie), cfile=str(compile_), doraise=True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Code généré : {foret.n_estimators} arbres, {len(source) / 1024:.0f} Ko -> {sortie}, "
+            f"byte-compilé -> {compile_} ({time.perf_counter() - debut:.2f}s)"
+        ))
@@ -0,0 +1,34 @@
+"""
+Lance le serveur d'inférence partagé par les workers web
+Usage : python manage.py runinference [--socket /tmp/grossesse_inference.sock]
+Les workers l'utilisent quand INFERENCE_SOCKET pointe vers la même socket.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chatbot.inference_server import InferenceServer
+from chatbot.model_registry import risk_model
+
+
+class Command(BaseCommand):
+    help = "Sert les prédictions de risque sur une socket Unix pour tous les workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=settings.INFERENCE_SOCKET or '/tmp/grossesse_inference.sock',
+                            help="Chemin de la socket Unix")
+
+    def handle(self, *args, **options):
+        risk_model.warm_up()
+        info = risk_model.info()
+        self.stdout.write(f"🤖 Modèle {info['version']} chargé en {info['load_time_ms']} ms")
+
+        serveur = InferenceServer(options['socket'], risk_model)
+        self.stdout.write(self.style.SUCCESS(f"✅ Serveur d'inférence à l'écoute sur {options['socket']}"))
+
+        try:
+            serveur.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            serveur.server_close()
@@ -0,0 +1,129 @@
+"""
+Score un fichier CSV de patientes en flux, sans le charger en mémoire
+Usage : python manage.py score_csv entree.csv sortie.csv [--chunk-size 10000] [--workers 4]
+Le fichier d'entrée a les colonnes de donnees_grossesse.csv ; la sortie reprend chaque
+ligne avec profil_risque, conseil et, pour les lignes invalides, le motif de l'erreur.
+"""
+
+import csv
+import itertools
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot.model_registry import risk_model
+from chatbot.validation import TABLES
+from chatbot.views import conseils, encoder_entree
+
+COLONNES_NUMERIQUES = ('age', 'mois_grossesse', 'poids_kg', 'taille_cm')
+COLONNES_RESULTAT = ('profil_risque', 'conseil', 'erreur')
+
+
+def lire_par_blocs(lecteur, taille):
+    """Itère sur le CSV par blocs de `taille` lignes"""
+    while True:
+        bloc = list(itertools.islice(lecteur, taille))
+        if not bloc:
+            return
+        yield bloc
+
+
+def scorer_bloc(bloc):
+    """Encode puis score un bloc d'enregistrements en un seul appel au modèle"""
+    model, _ = risk_model.snapshot()
+
+    resultats = [None] * len(bloc)
+    lignes = []
+    indices = []
+    for i, enregistrement in enumerate(bloc):
+        try:
+            donnees = dict(enregistrement)
+            for colonne in COLONNES_NUMERIQUES:
+                donnees[colonne] = float(donnees[colonne])
+            # Ligne trop courte : csv.DictReader complète les dernières colonnes par None
+            for colonne in TABLES:
+                if not isinstance(donnees[colonne], str):
+                    raise ValueError(f"Valeur manquante pour {colonne}")
+            lignes.append(encoder_entree(donnees))
+            indices.append(i)
+        except (KeyError, TypeError, ValueError) as e:
+            resultats[i] = ('', '', str(e))
+
+    if lignes:
+        predictions = model.predict(np.asarray(lignes, dtype=np.float64))
+        for i, prediction in zip(indices, predictions):
+            prediction = str(prediction)
+            resultats[i] = (prediction, conseils.get(prediction, "Aucun conseil disponible."), '')
+
+    return resultats
+
+
+class Command(BaseCommand):
+    help = "Score un CSV de patientes par blocs et écrit profil_risque et conseil dans un CSV de sortie"
+
+    def add_arguments(self, parser):
+        parser.add_argument('entree', help="CSV d'entrée (colonnes de donnees_grossesse.csv)")
+        parser.add_argument('sortie', help="CSV de sortie")
+        parser.add_argument('--chunk-size', type=int, default=10000, help="Lignes par bloc")
+        parser.add_argument('--workers', type=int, default=1, help="Processus de scoring (1 : dans ce processus)")
+
+    def handle(self, *args, **options):
+        taille = options['chunk_size']
+        workers = options['workers']
+        if taille < 1 or workers < 1:
+            raise CommandError("--chunk-size et --workers doivent être positifs")
+
+        # Charger le modèle avant de créer les processus : ils en héritent au fork
+        try:
+            risk_model.warm_up()
+        except OSError as e:
+            raise CommandError(f"Modèle introuvable : {e}")
+
+        debut = time.perf_counter()
+        total = 0
+        erreurs = 0
+
+        try:
+            with open(options['entree'], newline='', encoding='utf-8') as entree, \
+                    open(options['sortie'], 'w', newline='', encoding='utf-8') as sortie:
+                lecteur = csv.DictReader(entree)
+                colonnes = [c for c in (lecteur.fieldnames or []) if c not in COLONNES_RESULTAT]
+                ecrivain = csv.writer(sortie)
+                ecrivain.writerow(colonnes + list(COLONNES_RESULTAT))
+
+                def ecrire(bloc, resultats):
+                    nonlocal total, erreurs
+                    for enregistrement, resultat in zip(bloc, resultats):
+                        ecrivain.writerow([enregistrement.get(c, '') for c in colonnes] + list(resultat))
+                    total += len(bloc)
+                    erreurs += sum(1 for resultat in resultats if resultat[2])
+
+                blocs = lire_par_blocs(lecteur, taille)
+                if workers == 1:
+                    for bloc in blocs:
+                        ecrire(bloc, scorer_bloc(bloc))
+                else:
+                    # Au plus deux blocs en vol par processus : la mémoire reste bornée
+                    with ProcessPoolExecutor(max_workers=workers) as executor:
+                        en_cours = deque()
+                        for bloc in blocs:
+                            en_cours.append((bloc, executor.submit(scorer_bloc, bloc)))
+                            if len(en_cours) >= 2 * workers:
+                                bloc_termine, future = en_cours.popleft()
+                                ecrire(bloc_termine, future.result())
+                        while en_cours:
+                            bloc_termine, future = en_cours.popleft()
+                            ecrire(bloc_termine, future.result())
+
+        except OSError as e:
+            raise CommandError(str(e))
+
+        duree = time.perf_counter() - debut
+        debit = total / duree if duree else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {total} lignes scorées ({erreurs} invalides) en {duree:.2f}s : {debit:,.0f} lignes/s "
+            f"-> {options['sortie']} (modèle {risk_model.version})"
+        ))
@@ -0,0 +1,80 @@
+"""
+Entraîne le modèle de risque à partir de donnees_grossesse.csv (remplace chatbot.ipynb)
+Usage : python manage.py train_model [--data donnees_grossesse.csv] [--n-jobs -1] [--latency-budget-ms 50]
+Produit le modèle, les encodeurs, un fichier de métadonnées et régénère chatbot/mappings.py.
+"""
+
+import io
+import json
+import pickle
+from pathlib import Path
+
+import joblib
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot import training
+from chatbot.model_registry import PROJECT_ROOT, chemin_modele_par_defaut
+
+MAPPINGS_PATH = Path(__file__).resolve().parents[2] / 'mappings.py'
+
+
+class Command(BaseCommand):
+    help = "Entraîne le RandomForest de risque et publie modèle, encodeurs et métadonnées"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', default=str(PROJECT_ROOT / 'donnees_grossesse.csv'))
+        parser.add_argument('--output', default=str(chemin_modele_par_defaut()), help="Modèle .pkl publié")
+        parser.add_argument('--n-jobs', type=int, default=-1, help="Cœurs utilisés pour l'entraînement")
+        parser.add_argument('--n-estimators', type=int, default=training.PARAMETRES_FORET['n_estimators'])
+        parser.add_argument('--max-depth', type=int, default=training.PARAMETRES_FORET['max_depth'])
+        parser.add_argument('--latency-budget-ms', type=float, default=settings.MODEL_LATENCY_BUDGET_MS,
+                            help="Latence p50 maximale d'une prédiction unitaire (0 : pas de contrôle)")
+        parser.add_argument('--mappings', default=str(MAPPINGS_PATH), help="Module de mappings généré")
+
+    def handle(self, *args, **options):
+        try:
+            colonnes = training.charger_colonnes(options['data'])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Données illisibles : {e}")
+        self.stdout.write(f"📊 {len(colonnes)} lignes chargées depuis {options['data']}")
+
+        resultat = training.entrainer(
+            colonnes,
+            n_jobs=options['n_jobs'],
+            n_estimators=options['n_estimators'],
+            max_depth=options['max_depth'],
+        )
+        model = resultat['model']
+        metadata = resultat['metadata']
+        latence = metadata['latency']
+        self.stdout.write(
+            f"🤖 Exactitude {metadata['accuracy']:.4f}, entraînement {metadata['training_time_s']:.2f}s, "
+            f"latence p50 {latence['p50_ms']} ms / p99 {latence['p99_ms']} ms"
+        )
+
+        budget = options['latency_budget_ms']
+        if budget and latence['p50_ms'] > budget:
+            raise CommandError(
+                f"❌ Latence p50 {latence['p50_ms']} ms au-delà du budget de {budget} ms : modèle non publié"
+            )
+
+        sortie = Path(options['output'])
+        contenu = io.BytesIO()
+        joblib.dump(model, contenu)
+        training.publier(sortie, contenu.getvalue())
+
+        encodeurs = training.encodeurs(metadata['mappings'])
+        training.publier(sortie.with_name('label_encoders.pkl'), pickle.dumps(encodeurs))
+
+        metadata['model_file'] = sortie.name
+        training.publier(sortie.with_suffix('.json'),
+                         json.dumps(metadata, ensure_ascii=False, indent=2).encode('utf-8'))
+
+        source = training.generer_module_mappings(metadata, Path(options['data']).name)
+        training.publier(Path(options['mappings']), source.encode('utf-8'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Modèle publié -> {sortie} (métadonnées {sortie.with_suffix('.json').name}, "
+            f"mappings {options['mappings']})"
+        ))
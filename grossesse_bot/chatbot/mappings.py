@@ -0,0 +1,41 @@
+"""
+Encodage des caractéristiques attendu par le modèle de risque
+Généré par `python manage.py train_model` à partir de donnees_grossesse.csv : ne pas modifier
+"""
+
+FEATURE_ORDER = ['age', 'mois_grossesse', 'poids_kg', 'taille_cm', 'activité', 'régime', 'antécédents', 'symptôme']
+
+MAPPING_ACTIVITE = {
+    'faible': 0,
+    'modérée': 1,
+    'élevée': 2,
+}
+
+MAPPING_REGIME = {
+    'omnivore': 0,
+    'végétalien': 1,
+    'végétarien': 2,
+}
+
+MAPPING_ANTECEDENT = {
+    'asthme': 0,
+    'aucun': 1,
+    'autre': 2,
+    'diabète': 3,
+    'hypertension': 4,
+}
+
+MAPPING_SYMPTOME = {
+    'aucun': 0,
+    'douleur': 1,
+    'fatigue': 2,
+    'nausée': 3,
+}
+
+# Variables catégorielles par nom de colonne
+MAPPINGS = {
+    'activité': MAPPING_ACTIVITE,
+    'régime': MAPPING_REGIME,
+    'antécédents': MAPPING_ANTECEDENT,
+    'symptôme': MAPPING_SYMPTOME,
+}
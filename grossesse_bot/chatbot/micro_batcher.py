@@ -0,0 +1,122 @@
+"""
+Micro-batching des prédictions de risque
+Regroupe les lignes soumises en parallèle par les threads de requête et les évalue
+en un seul appel vectorisé à model.predict, pour amortir le coût fixe de scikit-learn.
+Un lot part dès qu'il atteint max_batch_size ou que la plus ancienne ligne a attendu max_wait.
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, Sequence, Tuple
+
+import numpy as np
+
+
+class MicroBatcher:
+    """File d'inférence partagée : un thread de fond vide la file par lots"""
+
+    def __init__(self, registry, max_batch_size: int = 64, max_wait: float = 0.002,
+                 historique: int = 2048):
+        self.registry = registry
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+        # Métriques : distribution des tailles de lot et délais d'attente récents
+        self.batch_sizes = Counter()
+        self.batches = 0
+        self.rows = 0
+        self.timeouts = 0
+        self._delais = deque(maxlen=historique)
+
+    def predict(self, row: Sequence[float], timeout: float = 5.0) -> Tuple[Any, str]:
+        """Soumet une ligne encodée et attend (prédiction, version du modèle) ; TimeoutError au-delà de timeout"""
+        future = Future()
+        self._file().put((time.perf_counter(), row, future))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Ligne abandonnée : le thread de fond l'écartera sans l'évaluer
+            future.cancel()
+            self.timeouts += 1
+            raise TimeoutError(f"Micro-batch sans réponse après {timeout} s")
+
+    def _file(self) -> queue.Queue:
+        # Démarrage paresseux, et redémarrage après un fork (workers gunicorn avec --preload)
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                    self._thread = threading.Thread(target=self._boucle, name='micro-batcher', daemon=True)
+                    self._thread.start()
+                    self._pid = os.getpid()
+        return self._queue
+
+    def _boucle(self):
+        file = self._queue
+        while True:
+            lot = [file.get()]
+            limite = lot[0][0] + self.max_wait
+
+            while len(lot) < self.max_batch_size:
+                restant = limite - time.perf_counter()
+                if restant <= 0:
+                    break
+                try:
+                    lot.append(file.get(timeout=restant))
+                except queue.Empty:
+                    break
+
+            self._traiter(lot)
+
+    def _traiter(self, lot):
+        # Lignes dont l'appelant a cessé d'attendre : annulées, ni évaluées ni complétées
+        lot = [element for element in lot if element[2].set_running_or_notify_cancel()]
+        if not lot:
+            return
+        depart = time.perf_counter()
+        try:
+            model, version = self.registry.snapshot()
+            predictions = model.predict(np.asarray([row for _, row, _ in lot], dtype=np.float64))
+        except Exception as e:
+            for _, _, future in lot:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self.batches += 1
+            self.rows += len(lot)
+            self.batch_sizes[len(lot)] += 1
+            self._delais.extend(depart - soumis for soumis, _, _ in lot)
+
+        for (_, _, future), prediction in zip(lot, predictions):
+            future.set_result((prediction, version))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            delais = sorted(self._delais)
+            tailles = dict(sorted(self.batch_sizes.items()))
+
+        def percentile(p):
+            if not delais:
+                return None
+            return round(delais[min(len(delais) - 1, int(p * len(delais)))] * 1000, 3)
+
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'batches': self.batches,
+            'rows': self.rows,
+            'timeouts': self.timeouts,
+            'mean_batch_size': round(self.rows / self.batches, 2) if self.batches else None,
+            'batch_sizes': tailles,
+            'queue_delay_ms': {'p50': percentile(0.50), 'p99': percentile(0.99), 'max': percentile(1.0)},
+        }
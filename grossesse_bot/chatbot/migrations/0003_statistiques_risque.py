@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0002_date_horodatee_a_la_requete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiqueRisque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularite', models.CharField(choices=[('heure', 'Heure'), ('jour', 'Jour')], max_length=5)),
+                ('periode', models.DateTimeField()),
+                ('profil_risque', models.CharField(max_length=20)),
+                ('tranche_age', models.CharField(max_length=10)),
+                ('mois_grossesse', models.IntegerField()),
+                ('nombre', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='evaluationgrossesse',
+            index=models.Index(fields=['date', 'profil_risque'], name='evaluation_date_profil_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='statistiquerisque',
+            constraint=models.UniqueConstraint(fields=('granularite', 'periode', 'profil_risque', 'tranche_age', 'mois_grossesse'), name='statistique_risque_unique'),
+        ),
+    ]
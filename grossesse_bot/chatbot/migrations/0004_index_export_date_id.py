@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0003_statistiques_risque'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evaluationgrossesse',
+            index=models.Index(fields=['date', 'id'], name='evaluation_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,255 @@
+"""
+Registre partagé du modèle de risque
+Charge le modèle à la première utilisation (ou via warm_up) plutôt qu'à l'import,
+pour que les commandes manage.py et les migrations démarrent sans le désérialiser,
+et le recharge à chaud quand le fichier change (ou sur demande d'un administrateur).
+Module sans dépendance Django : utilisable aussi par les handlers Vercel légers.
+"""
+
+import hashlib
+import os
+import threading
+import time
+import urllib.request
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Emplacements recherchés par défaut : racine du projet (config.MODEL_PATH),
+# puis l'ancien chemin relatif utilisé par chatbot/views.py
+DEFAULT_MODEL_PATHS = [
+    PROJECT_ROOT / 'model_risque_grossesse.pkl',
+    PROJECT_ROOT / 'grossesse_bot' / 'model_risque_grossesse.pkl',
+]
+
+
+def chemin_modele_par_defaut() -> Path:
+    """Retourne le chemin du modèle : variable MODEL_PATH, sinon le premier fichier existant"""
+    if os.getenv('MODEL_PATH'):
+        return Path(os.getenv('MODEL_PATH'))
+
+    for chemin in DEFAULT_MODEL_PATHS:
+        if chemin.exists():
+            return chemin
+
+    return DEFAULT_MODEL_PATHS[0]
+
+
+def joblib_loader(fichier):
+    """Désérialise un modèle scikit-learn (joblib n'est importé qu'à ce moment)"""
+    import joblib
+    return joblib.load(fichier)
+
+
+def loader_pour_chemin(path: Path) -> Callable:
+    """Choisit le loader selon l'extension : forêt compilée, code généré ou pickle joblib"""
+    suffixe = Path(path).suffix
+    if suffixe == '.forest' or Path(path).name.endswith('.forest.gz'):
+        from .flat_forest import charger_foret
+        return charger_foret
+    if suffixe in ('.py', '.pyc'):
+        from .forest_codegen import charger_code
+        return charger_code
+    return joblib_loader
+
+
+def estimer_taille_memoire(model: Any, taille_brute: int) -> int:
+    """Estime l'empreinte mémoire du modèle en octets"""
+    # Modèles exposant directement leur taille (évaluateurs compilés)
+    if hasattr(model, 'nbytes'):
+        return int(model.nbytes)
+
+    # Forêts scikit-learn : somme des tableaux de chaque arbre
+    estimators = getattr(model, 'estimators_', None)
+    if estimators:
+        total = 0
+        for estimator in estimators:
+            tree = getattr(estimator, 'tree_', None)
+            if tree is None:
+                return taille_brute
+            for attribut in ('children_left', 'children_right', 'feature', 'threshold',
+                             'value', 'impurity', 'n_node_samples', 'weighted_n_node_samples'):
+                total += getattr(tree, attribut).nbytes
+        return total
+
+    return taille_brute
+
+
+class ModelRegistry:
+    """Charge paresseusement un modèle depuis un fichier ou une URL et le partage entre appelants.
+
+    Le modèle et sa version sont publiés ensemble dans un seul tuple : un rechargement
+    remplace ce tuple d'un coup, si bien qu'une requête en cours termine avec l'ancien
+    modèle tandis que les suivantes voient le nouveau.
+    """
+
+    def __init__(self, path: Optional[Path] = None, url: Optional[str] = None,
+                 loader: Optional[Callable] = None, timeout: int = 30,
+                 watch_interval: Optional[float] = None, cache=None):
+        if path is None and url is None:
+            path = chemin_modele_par_defaut()
+
+        self.path = Path(path) if path is not None else None
+        self.url = url
+        self.loader = loader or (loader_pour_chemin(self.path) if self.path is not None else joblib_loader)
+        self.timeout = timeout
+        # Cache disque des téléchargements (DownloadCache), pour les modèles servis par URL
+        self.cache = cache
+
+        # Surveillance du fichier (secondes entre deux vérifications, 0 pour désactiver)
+        if watch_interval is None:
+            watch_interval = float(os.getenv('MODEL_WATCH_INTERVAL', 30)) if self.path is not None else 0
+        self.watch_interval = watch_interval
+
+        # (modèle, version) publiés de manière atomique
+        self._etat = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._reload_thread = None
+        self._signature = None
+        self._derniere_verification = time.monotonic()
+
+        # Métriques exposées par info()
+        self.load_time = None
+        self.memory_size = None
+        self.loaded_at = None
+        self.reload_count = 0
+        self.last_error = None
+
+    @property
+    def source(self) -> str:
+        return str(self.path) if self.path is not None else self.url
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._etat is not None
+
+    @property
+    def version(self) -> Optional[str]:
+        etat = self._etat
+        return etat[1] if etat is not None else None
+
+    def snapshot(self) -> Tuple[Any, str]:
+        """Retourne (modèle, version) ; à capturer une fois par requête"""
+        etat = self._etat
+        if etat is None:
+            with self._lock:
+                if self._etat is None:
+                    self._installer(self._charger())
+                etat = self._etat
+        else:
+            self._verifier_fichier()
+        return etat
+
+    def get_model(self):
+        """Retourne le modèle, en le chargeant une seule fois au premier appel"""
+        return self.snapshot()[0]
+
+    def warm_up(self):
+        """Charge le modèle immédiatement (hook de démarrage des workers)"""
+        return self.get_model()
+
+    def reload(self, background: bool = True):
+        """Recharge le modèle depuis sa source puis le publie ; l'ancien reste actif en cas d'échec"""
+        with self._reload_lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return self._reload_thread
+
+            if background:
+                self._reload_thread = threading.Thread(target=self._recharger, name='model-reload', daemon=True)
+                self._reload_thread.start()
+                return self._reload_thread
+
+        self._recharger()
+        return None
+
+    def _signature_fichier(self):
+        stat = self.path.stat()
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _verifier_fichier(self):
+        """Déclenche un rechargement en arrière-plan si le fichier du modèle a changé"""
+        if not self.watch_interval or self.path is None:
+            return
+
+        maintenant = time.monotonic()
+        if maintenant - self._derniere_verification < self.watch_interval:
+            return
+        self._derniere_verification = maintenant
+
+        try:
+            signature = self._signature_fichier()
+        except OSError:
+            return
+
+        if signature != self._signature:
+            self.reload(background=True)
+
+    def _charger(self) -> Dict[str, Any]:
+        debut = time.perf_counter()
+
+        if self.path is not None:
+            signature = self._signature_fichier()
+            contenu = self.path.read_bytes()
+        elif self.cache is not None:
+            signature = None
+            chemin, _ = self.cache.fetch(self.url, timeout=self.timeout)
+            contenu = chemin.read_bytes()
+        else:
+            signature = None
+            with urllib.request.urlopen(self.url, timeout=self.timeout) as response:
+                contenu = response.read()
+
+        model = self.loader(BytesIO(contenu))
+
+        return {
+            'model': model,
+            'version': hashlib.sha256(contenu).hexdigest()[:12],
+            'signature': signature,
+            'load_time': time.perf_counter() - debut,
+            'memory_size': estimer_taille_memoire(model, len(contenu)),
+        }
+
+    def _installer(self, charge: Dict[str, Any]):
+        self.load_time = charge['load_time']
+        self.memory_size = charge['memory_size']
+        self.loaded_at = time.time()
+        self._signature = charge['signature']
+        self.last_error = None
+
+        # Publication atomique : une seule affectation
+        self._etat = (charge['model'], charge['version'])
+
+    def _recharger(self):
+        try:
+            charge = self._charger()
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"❌ Rechargement du modèle impossible, version {self.version} conservée : {e}")
+            return
+
+        ancienne_version = self.version
+        self._installer(charge)
+        self.reload_count += 1
+        print(f"🔄 Modèle rechargé : {ancienne_version} -> {charge['version']}")
+
+    def info(self) -> Dict[str, Any]:
+        """Résumé de l'état du modèle pour les endpoints de santé"""
+        return {
+            'source': self.source,
+            'loaded': self.is_loaded,
+            'version': self.version,
+            'load_time_ms': round(self.load_time * 1000, 2) if self.load_time is not None else None,
+            'memory_bytes': self.memory_size,
+            'loaded_at': self.loaded_at,
+            'reloads': self.reload_count,
+            'reloading': self._reload_thread is not None and self._reload_thread.is_alive(),
+            'last_error': self.last_error,
+            'download_cache': self.cache.stats() if self.cache is not None else None,
+        }
+
+
+# Instance partagée par chatbot.views, vercel_app.py et les scripts du projet
+risk_model = ModelRegistry()
@@ -1,5 +1,5 @@
 from django.db import models
-from django.db import models
+from django.utils import timezone
 
 class EvaluationGrossesse(models.Model):
     age = models.IntegerField()
@@ -11,9 +11,42 @@ class EvaluationGrossesse(models.Model):
     antécédents = models.CharField(max_length=50)
     symptôme = models.CharField(max_length=30)
     profil_risque = models.CharField(max_length=20)
-    date = models.DateTimeField(auto_now_add=True)
+    # Horodatée à la requête : l'insertion, différée par EvaluationWriter, peut avoir lieu plus tard
+    date = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            # Filtres par période des tableaux de bord, puis par profil
+            models.Index(fields=['date', 'profil_risque'], name='evaluation_date_profil_idx'),
+            # Pagination par clé (date, id) des exports
+            models.Index(fields=['date', 'id'], name='evaluation_date_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.age} ans - Risque: {self.profil_risque}"
 
+
+class StatistiqueRisque(models.Model):
+    """Compteur d'évaluations par période (heure ou jour), profil, tranche d'âge et mois de grossesse"""
+
+    GRANULARITES = [('heure', 'Heure'), ('jour', 'Jour')]
+
+    granularite = models.CharField(max_length=5, choices=GRANULARITES)
+    periode = models.DateTimeField()
+    profil_risque = models.CharField(max_length=20)
+    tranche_age = models.CharField(max_length=10)
+    mois_grossesse = models.IntegerField()
+    nombre = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularite', 'periode', 'profil_risque', 'tranche_age', 'mois_grossesse'],
+                name='statistique_risque_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.granularite} {self.periode:%Y-%m-%d %H:%M} - {self.profil_risque}: {self.nombre}"
+
 # Create your models here.
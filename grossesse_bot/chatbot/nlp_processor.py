@@ -4,8 +4,127 @@ Analyse les messages des utilisateurs et extrait les intentions
 """
 
 import re
-from typing import Dict, List, Tuple, Optional
-from difflib import get_close_matches
+import threading
+import time
+import unicodedata
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, List, Tuple, Optional, Union
+from .keyword_automaton import AutomateMotsCles, Correspondance, etiquettes
+from .trigram_index import IndexTrigrammes
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def fold_accents(text: str) -> str:
+    """Supprime les accents : 'fièvre élevée' -> 'fievre elevee'"""
+    if text.isascii():
+        return text
+    return ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+
+
+class NormalizedMessage:
+    """Message mis en minuscules, sans accents et découpé en mots une seule fois
+
+    Les analyseurs de NLPProcessor lisent ces formes au lieu de refaire chacun leur .lower() ;
+    les mots-clés trouvés et les informations extraites y sont mémorisés au premier calcul.
+    """
+
+    __slots__ = ('text', 'lower', 'folded', 'tokens', 'token_set', 'matches', 'info')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lower = text.lower()
+        self.folded = fold_accents(self.lower)
+        self.tokens = tuple(TOKEN_PATTERN.findall(self.lower))
+        self.token_set = frozenset(self.tokens)
+        self.matches: Optional[List[Correspondance]] = None
+        self.info: Optional[Dict[str, any]] = None
+
+    def __repr__(self):
+        return f"NormalizedMessage({self.text!r})"
+
+
+# Intentions pour lesquelles generate_follow_up_questions propose des questions
+FOLLOW_UP_INTENTIONS = ('symptome', 'evaluation_risque')
+
+# Champs calculés à la demande : (calcul, champs à calculer avant). 'keywords' n'est pas exposé,
+# il isole le coût de la passe de l'automate dans les compteurs de temps
+ANALYSIS_FIELDS: Dict[str, Tuple[Callable[['NLPProcessor', 'MessageAnalysis'], Any], Tuple[str, ...]]] = {
+    'keywords': (lambda nlp, analysis: nlp.find_keywords(analysis.normalized), ()),
+    'intention': (lambda nlp, analysis: nlp.detect_intention(analysis.normalized), ('keywords',)),
+    'sentiment': (lambda nlp, analysis: nlp.analyze_sentiment(analysis.normalized), ('keywords',)),
+    'extracted_info': (lambda nlp, analysis: nlp.extract_info(analysis.normalized), ()),
+    'medical_info': (lambda nlp, analysis: nlp.extract_medical_info(analysis.normalized), ('keywords',)),
+    'pregnancy_stage': (lambda nlp, analysis: nlp.extract_pregnancy_stage(analysis.normalized), ('extracted_info',)),
+    'is_emergency': (lambda nlp, analysis: nlp.is_emergency(analysis.normalized), ('keywords',)),
+    'faq_match': (lambda nlp, analysis: nlp.find_faq_match(analysis.normalized), ('keywords',)),
+    'follow_up_questions': (lambda nlp, analysis: nlp.follow_up_questions(analysis), ('intention',)),
+}
+
+
+class MessageAnalysis(Mapping):
+    """Résultat de NLPProcessor.process_message, calculé champ par champ au premier accès
+
+    Se lit comme l'ancien dictionnaire (analysis['intention'], .get(), dict(analysis)), mais un
+    champ jamais lu n'est jamais calculé : une urgence ou une salutation ne paie pas la recherche
+    approximative dans la FAQ. Chaque calcul est mémorisé et son temps propre (sans celui des
+    champs dont il dépend) est ajouté aux compteurs du processeur.
+    """
+
+    KEYS = ('original_message', 'cleaned_message', 'normalized_message', 'intention', 'sentiment',
+            'extracted_info', 'medical_info', 'pregnancy_stage', 'is_emergency', 'faq_match',
+            'follow_up_questions')
+
+    def __init__(self, processor: 'NLPProcessor', message: str, cleaned_message: str):
+        self.processor = processor
+        self.normalized = processor.normalize(cleaned_message)
+        self._values: Dict[str, Any] = {
+            'original_message': message,
+            'cleaned_message': cleaned_message,
+            'normalized_message': self.normalized,
+        }
+        self._durations: Dict[str, float] = {}
+        self._nested = 0.0
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        return self._compute(key)
+
+    def _compute(self, key: str) -> Any:
+        compute, prerequisites = ANALYSIS_FIELDS[key]
+        for prerequisite in prerequisites:
+            self[prerequisite]
+        
+        # Les champs lus pendant ce calcul (follow_up_questions) gardent leur propre temps
+        outer, self._nested = self._nested, 0.0
+        start = time.perf_counter()
+        value = compute(self.processor, self)
+        elapsed = time.perf_counter() - start
+        duration = elapsed - self._nested
+        self._nested = outer + elapsed
+        
+        self._values[key] = value
+        self._durations[key] = duration
+        self.processor.record_timing(key, duration)
+        return value
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def computed(self) -> Dict[str, float]:
+        """Champs calculés jusqu'ici et leur temps propre en secondes"""
+        return dict(self._durations)
+
+    def __repr__(self):
+        computed = ', '.join(self._durations) or 'aucun champ'
+        return f"MessageAnalysis({self.normalized.text!r}, calculés : {computed})"
+
 
 class NLPProcessor:
     """Processeur de langage naturel pour comprendre les questions des utilisateurs"""
@@ -87,44 +206,113 @@ class NLPProcessor:
                 'inquiète', 'peur', 'stress', 'angoisse', 'problème'
             ]
         }
+        
+        # Symptômes courants
+        self.medical_symptoms = {
+            'nausées': ['nausée', 'nausées', 'envie de vomir', 'mal au cœur'],
+            'fatigue': ['fatigue', 'fatiguée', 'épuisée', 'crevée'],
+            'douleurs': ['douleur', 'mal', 'souffre', 'fait mal'],
+            'saignements': ['saignement', 'saigne', 'sang', 'pertes'],
+            'contractions': ['contraction', 'contractions', 'ventre dur'],
+            'fièvre': ['fièvre', 'température', 'chaud', 'frissons']
+        }
+        
+        # Localisation de la douleur
+        self.pain_locations = {
+            'ventre': ['ventre', 'abdomen', 'estomac'],
+            'dos': ['dos', 'reins', 'lombaire'],
+            'tête': ['tête', 'crâne', 'migraine'],
+            'seins': ['seins', 'poitrine'],
+            'jambes': ['jambes', 'pieds', 'chevilles']
+        }
+        
+        # Phrases d'urgence avérée
+        self.emergency_phrases = [
+            'saignement abondant', 'beaucoup de sang',
+            'douleur insupportable', 'très mal',
+            'contractions régulières', 'travail',
+            'perte des eaux', 'liquide',
+            'fièvre élevée', 'plus de 38',
+            'vision floue', 'maux de tête sévères',
+            'vomissements incessants'
+        ]
+        
+        # Un seul automate pour toutes les tables : une passe par message au lieu d'un `in` par mot-clé
+        self.automate = AutomateMotsCles()
+        self.automate.ajouter_liste('urgence', self.urgence_keywords)
+        self.automate.ajouter_table('intention', self.intentions)
+        self.automate.ajouter_table('sentiment', self.sentiment_words)
+        self.automate.ajouter_liste('faq', self.faq)
+        self.automate.ajouter_table('symptome', self.medical_symptoms)
+        self.automate.ajouter_table('localisation', self.pain_locations)
+        self.automate.ajouter_liste('phrase_urgence', self.emergency_phrases)
+        # Construit ici plutôt qu'à la première requête : l'instance est partagée entre threads
+        self.automate.construire()
+        
+        # Recherche approximative dans la FAQ : index de trigrammes des questions, sans accents
+        self.faq_index = IndexTrigrammes()
+        for question in self.faq:
+            self.faq_index.ajouter(fold_accents(question), question)
+        self.faq_index.construire()
+        
+        # Temps de calcul par champ d'analyse : {champ: [appels, secondes]}
+        self._timings: Dict[str, List[float]] = {}
+        self._timings_lock = threading.Lock()
+    
+    def normalize(self, text: Union[str, NormalizedMessage]) -> NormalizedMessage:
+        """Forme normalisée du message ; un NormalizedMessage est réutilisé tel quel"""
+        if isinstance(text, NormalizedMessage):
+            return text
+        return NormalizedMessage(text)
+    
+    def find_keywords(self, text: Union[str, NormalizedMessage]) -> List[Correspondance]:
+        """Toutes les occurrences de mots-clés du message (catégorie, étiquette, motif, position)"""
+        message = self.normalize(text)
+        if message.matches is None:
+            message.matches = self.automate.rechercher(message.lower)
+        return message.matches
     
-    def extract_info(self, text: str) -> Dict[str, any]:
+    def extract_info(self, text: Union[str, NormalizedMessage]) -> Dict[str, any]:
         """Extrait les informations numériques du texte"""
-        info = {}
-        text = text.lower()
+        message = self.normalize(text)
+        if message.info is not None:
+            return message.info
         
+        info = {}
         for key, pattern in self.patterns.items():
-            match = re.search(pattern, text)
+            match = re.search(pattern, message.lower)
             if match:
                 value = float(match.group(1)) if '.' in match.group(1) else int(match.group(1))
                 info[key] = value
         
+        message.info = info
         return info
     
-    def detect_intention(self, text: str) -> str:
+    def detect_intention(self, text: Union[str, NormalizedMessage]) -> str:
         """Détecte l'intention principale du message"""
-        text = text.lower()
+        matches = self.find_keywords(text)
         
         # Vérifier les urgences en premier
-        for keyword in self.urgence_keywords:
-            if keyword in text:
-                return 'urgence'
+        if etiquettes(matches, 'urgence'):
+            return 'urgence'
         
-        # Vérifier les intentions
-        for intention, keywords in self.intentions.items():
-            for keyword in keywords:
-                if keyword in text:
-                    return intention
+        # Vérifier les intentions, dans l'ordre de la table
+        found = etiquettes(matches, 'intention')
+        for intention in self.intentions:
+            if intention in found:
+                return intention
         
         # Par défaut, c'est une question générale
         return 'question_generale'
     
-    def analyze_sentiment(self, text: str) -> str:
+    def analyze_sentiment(self, text: Union[str, NormalizedMessage]) -> str:
         """Analyse le sentiment du message"""
-        text = text.lower()
+        matches = self.find_keywords(text)
         
-        positive_count = sum(1 for word in self.sentiment_words['positif'] if word in text)
-        negative_count = sum(1 for word in self.sentiment_words['negatif'] if word in text)
+        # Chaque mot compte une fois, quel que soit son nombre d'occurrences
+        words = {(m.etiquette, m.motif) for m in matches if m.categorie == 'sentiment'}
+        positive_count = sum(1 for polarity, _ in words if polarity == 'positif')
+        negative_count = sum(1 for polarity, _ in words if polarity == 'negatif')
         
         if negative_count > positive_count:
             return 'negatif'
@@ -133,84 +321,50 @@ class NLPProcessor:
         else:
             return 'neutre'
     
-    def find_faq_match(self, text: str) -> Optional[str]:
+    def find_faq_match(self, text: Union[str, NormalizedMessage]) -> Optional[str]:
         """Trouve une correspondance dans la FAQ"""
-        text = text.lower()
+        message = self.normalize(text)
         
         # Recherche exacte
+        found = etiquettes(self.find_keywords(message), 'faq')
         for question, answer in self.faq.items():
-            if question in text:
+            if question in found:
                 return answer
         
-        # Recherche approximative
-        questions = list(self.faq.keys())
-        matches = get_close_matches(text, questions, n=1, cutoff=0.6)
-        if matches:
-            return self.faq[matches[0]]
+        # Recherche approximative : mot mal orthographié n'importe où dans le message
+        match = self.faq_index.meilleure(message.folded)
+        if match:
+            return self.faq[match.etiquette]
         
         return None
     
-    def extract_medical_info(self, text: str) -> Dict[str, str]:
+    def extract_medical_info(self, text: Union[str, NormalizedMessage]) -> Dict[str, str]:
         """Extrait les informations médicales du texte"""
         info = {}
-        text = text.lower()
-        
-        # Symptômes courants
-        symptoms = {
-            'nausées': ['nausée', 'nausées', 'envie de vomir', 'mal au cœur'],
-            'fatigue': ['fatigue', 'fatiguée', 'épuisée', 'crevée'],
-            'douleurs': ['douleur', 'mal', 'souffre', 'fait mal'],
-            'saignements': ['saignement', 'saigne', 'sang', 'pertes'],
-            'contractions': ['contraction', 'contractions', 'ventre dur'],
-            'fièvre': ['fièvre', 'température', 'chaud', 'frissons']
-        }
+        matches = self.find_keywords(text)
         
-        for symptom, keywords in symptoms.items():
-            for keyword in keywords:
-                if keyword in text:
-                    info['symptome'] = symptom
-                    break
+        # Symptômes courants : le dernier de la table présent dans le message l'emporte
+        found = etiquettes(matches, 'symptome')
+        for symptom in self.medical_symptoms:
+            if symptom in found:
+                info['symptome'] = symptom
         
         # Localisation de la douleur
-        locations = {
-            'ventre': ['ventre', 'abdomen', 'estomac'],
-            'dos': ['dos', 'reins', 'lombaire'],
-            'tête': ['tête', 'crâne', 'migraine'],
-            'seins': ['seins', 'poitrine'],
-            'jambes': ['jambes', 'pieds', 'chevilles']
-        }
-        
-        for location, keywords in locations.items():
-            for keyword in keywords:
-                if keyword in text:
-                    info['localisation'] = location
-                    break
+        found = etiquettes(matches, 'localisation')
+        for location in self.pain_locations:
+            if location in found:
+                info['localisation'] = location
         
         return info
     
-    def is_emergency(self, text: str) -> bool:
+    def is_emergency(self, text: Union[str, NormalizedMessage]) -> bool:
         """Détermine si le message indique une urgence"""
-        text = text.lower()
-        
-        emergency_phrases = [
-            'saignement abondant', 'beaucoup de sang',
-            'douleur insupportable', 'très mal',
-            'contractions régulières', 'travail',
-            'perte des eaux', 'liquide',
-            'fièvre élevée', 'plus de 38',
-            'vision floue', 'maux de tête sévères',
-            'vomissements incessants'
-        ]
-        
-        for phrase in emergency_phrases:
-            if phrase in text:
-                return True
-        
-        return False
+        return bool(etiquettes(self.find_keywords(text), 'phrase_urgence'))
     
-    def extract_pregnancy_stage(self, text: str) -> Optional[str]:
+    def extract_pregnancy_stage(self, text: Union[str, NormalizedMessage]) -> Optional[str]:
         """Détermine le stade de grossesse mentionné"""
-        text = text.lower()
+        message = self.normalize(text)
+        text = message.lower
         
         if 'trimestre' in text:
             if 'premier' in text or '1er' in text or '1' in text:
@@ -220,8 +374,8 @@ class NLPProcessor:
             elif 'troisième' in text or '3ème' in text or '3' in text:
                 return 'troisieme_trimestre'
         
-        # Extraction par semaines
-        info = self.extract_info(text)
+        # Extraction par semaines (informations déjà extraites du même message)
+        info = self.extract_info(message)
         if 'semaines' in info:
             weeks = info['semaines']
             if weeks <= 12:
@@ -233,6 +387,16 @@ class NLPProcessor:
         
         return None
     
+    def follow_up_questions(self, analysis: 'MessageAnalysis') -> List[str]:
+        """Questions de suivi d'une analyse ; les infos ne sont extraites que si l'intention en a besoin"""
+        intention = analysis['intention']
+        if intention not in FOLLOW_UP_INTENTIONS:
+            return []
+        return self.generate_follow_up_questions(
+            intention,
+            {**analysis['extracted_info'], **analysis['medical_info']}
+        )
+    
     def generate_follow_up_questions(self, intention: str, info: Dict) -> List[str]:
         """Génère des questions de suivi basées sur l'intention et les infos"""
         questions = []
@@ -268,27 +432,26 @@ class NLPProcessor:
         
         return text
     
-    def process_message(self, message: str) -> Dict[str, any]:
-        """Traite complètement un message et retourne toutes les informations extraites"""
-        cleaned_message = self.clean_text(message)
-        
-        result = {
-            'original_message': message,
-            'cleaned_message': cleaned_message,
-            'intention': self.detect_intention(cleaned_message),
-            'sentiment': self.analyze_sentiment(cleaned_message),
-            'extracted_info': self.extract_info(cleaned_message),
-            'medical_info': self.extract_medical_info(cleaned_message),
-            'pregnancy_stage': self.extract_pregnancy_stage(cleaned_message),
-            'is_emergency': self.is_emergency(cleaned_message),
-            'faq_match': self.find_faq_match(cleaned_message),
-            'follow_up_questions': []
+    def process_message(self, message: str) -> 'MessageAnalysis':
+        """Traite un message ; chaque information est extraite au premier accès (voir MessageAnalysis)"""
+        # Normalisé une seule fois : minuscules, mots et mots-clés partagés par tous les analyseurs
+        return MessageAnalysis(self, message, self.clean_text(message))
+    
+    def record_timing(self, field: str, duration: float):
+        with self._timings_lock:
+            timing = self._timings.setdefault(field, [0, 0.0])
+            timing[0] += 1
+            timing[1] += duration
+    
+    def timing_stats(self) -> Dict[str, Dict[str, float]]:
+        """Appels, temps total et temps moyen de chaque champ d'analyse calculé"""
+        with self._timings_lock:
+            timings = {field: list(timing) for field, timing in self._timings.items()}
+        return {
+            field: {
+                'calls': calls,
+                'total_ms': round(total * 1000, 3),
+                'mean_us': round(total / calls * 1e6, 1),
+            }
+            for field, (calls, total) in timings.items()
         }
-        
-        # Générer des questions de suivi
-        result['follow_up_questions'] = self.generate_follow_up_questions(
-            result['intention'], 
-            {**result['extracted_info'], **result['medical_info']}
-        )
-        
-        return result
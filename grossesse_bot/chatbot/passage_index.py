@@ -0,0 +1,256 @@
+"""
+Recherche de passages dans la base de connaissances (BM25)
+Chaque feuille de GrossesseKnowledgeBase.knowledge (phrase, ou liste d'éléments) devient un passage.
+Son texte et les noms de ses sections sont découpés en termes (minuscules, sans accents, sans
+mots vides, racinisés) dans un index inversé. Les listes de chaque terme sont triées par poids
+BM25 précalculé, et une requête n'en lit que les max_postings premiers : la latence ne dépend
+que du nombre de termes de la question, pas du nombre de passages.
+L'index peut être construit d'avance (python manage.py build_knowledge_index). Il est alors
+projeté en mémoire au démarrage, tant que l'empreinte de la base de connaissances n'a pas changé.
+"""
+
+import hashlib
+import json
+import math
+import os
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .model_registry import PROJECT_ROOT
+from .nlp_processor import fold_accents
+from .training import publier
+from .trigram_index import MOT
+
+MAGIC_INDEX = b'GBPASSAG'
+FORMAT_INDEX = 1
+ALIGNEMENT = 8
+
+# Mots vides, sans accents
+MOTS_VIDES = frozenset('''
+    a ai as au aux avec avez avoir c ca ce ces cet cette comment combien d dans de des dois doit donc du elle
+    elles en est et etre faire fait faut il ils j je l la le les leur leurs m ma mais me mes moi mon n ne nos
+    notre nous on ont ou par pas pendant peu peut peux plus pour pourquoi puis qu quand que quel quelle quelles quels
+    qui quoi s sa sans se ses si son sont sur t ta te tes ton tres tu un une vos votre vous y
+'''.split())
+
+# Suffixes retirés par la racinisation légère, du plus long au plus court
+SUFFIXES = tuple(sorted((
+    'issement', 'ement', 'ment', 'ation', 'ateur', 'atrice', 'tion', 'ion', 'ance', 'ence', 'ite', 'euse',
+    'eux', 'ive', 'if', 'ique', 'iste', 'isme', 'able', 'ible', 'ee', 'er', 'ez', 'ir', 'ie', 'es', 'e',
+), key=len, reverse=True))
+
+
+def raciniser(mot: str) -> str:
+    """Racinisation légère du français (mot sans accents) : 'nausees' -> 'naus', 'vomir' -> 'vom'
+
+    Pluriel retiré, puis le plus long suffixe qui laisse un radical d'au moins 3 lettres.
+    """
+    if len(mot) <= 3 or not mot.isalpha():
+        return mot
+    if mot.endswith('aux') and len(mot) > 4:
+        mot = mot[:-3] + 'al'
+    elif mot[-1] in 'sx':
+        mot = mot[:-1]
+    for suffixe in SUFFIXES:
+        if mot.endswith(suffixe) and len(mot) - len(suffixe) >= 3:
+            return mot[:-len(suffixe)]
+    return mot
+
+
+def termes(texte: str) -> List[str]:
+    """Termes indexés d'un texte : minuscules, sans accents ni mots vides, racinisés"""
+    return [raciniser(mot) for mot in MOT.findall(fold_accents(texte.lower())) if mot not in MOTS_VIDES]
+
+
+class Passage(NamedTuple):
+    chemin: Tuple[str, ...]
+    texte: str
+
+
+def passages_de(knowledge: Dict[str, Any], titres: Optional[Dict[str, str]] = None) -> List[Passage]:
+    """Feuilles de la base de connaissances, dans l'ordre du dictionnaire
+
+    Une liste forme un seul passage, précédé de son titre (titres[clé], sinon la clé).
+    """
+    titres = titres or {}
+
+    def parcourir(noeud, chemin) -> Iterator[Passage]:
+        if isinstance(noeud, dict):
+            for cle, valeur in noeud.items():
+                yield from parcourir(valeur, chemin + (cle,))
+        elif isinstance(noeud, (list, tuple)):
+            titre = titres.get(chemin[-1], chemin[-1].replace('_', ' ').capitalize())
+            yield Passage(chemin, f"{titre} : {' ; '.join(str(element) for element in noeud)}")
+        else:
+            yield Passage(chemin, str(noeud))
+
+    return list(parcourir(knowledge, ()))
+
+
+def empreinte_passages(passages: List[Passage]) -> str:
+    contenu = json.dumps([list(passage) for passage in passages], ensure_ascii=False)
+    return hashlib.sha256(contenu.encode('utf-8')).hexdigest()
+
+
+def chemin_index_par_defaut() -> Path:
+    """Variable KNOWLEDGE_INDEX_PATH, sinon knowledge_base.index à la racine du projet"""
+    return Path(os.getenv('KNOWLEDGE_INDEX_PATH') or PROJECT_ROOT / 'knowledge_base.index')
+
+
+class IndexPassages:
+    """Index inversé BM25 des passages ; construire() ou charger() un fichier produit par sauvegarder()"""
+
+    def __init__(self, passages: List[Passage], vocabulaire: Dict[str, int], debuts: np.ndarray,
+                 documents: np.ndarray, poids: np.ndarray, empreinte: str, max_postings: int = 1000):
+        self.passages = passages
+        self.vocabulaire = vocabulaire
+        self.debuts = debuts
+        self.documents = documents
+        self.poids = poids
+        self.empreinte = empreinte
+        self.max_postings = max_postings
+
+    def __len__(self):
+        return len(self.passages)
+
+    @classmethod
+    def construire(cls, passages: List[Passage], k1: float = 1.2, b: float = 0.75, **options) -> 'IndexPassages':
+        """Tokenise chaque passage (texte et noms de sections) et précalcule les poids BM25"""
+        frequences: Dict[str, Dict[int, int]] = {}
+        longueurs = []
+        for numero, passage in enumerate(passages):
+            sections = ' '.join(cle.replace('_', ' ') for cle in passage.chemin)
+            liste = termes(f"{sections} {passage.texte}")
+            longueurs.append(len(liste))
+            for terme in liste:
+                documents = frequences.setdefault(terme, {})
+                documents[numero] = documents.get(numero, 0) + 1
+
+        n = len(passages)
+        longueur_moyenne = (sum(longueurs) / n) if n else 1.0
+        vocabulaire, debuts, documents_termes, poids_termes = {}, [0], [], []
+        for terme, documents in frequences.items():
+            idf = math.log(1 + (n - len(documents) + 0.5) / (len(documents) + 0.5))
+            liste = [
+                (idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * longueurs[numero] / longueur_moyenne)), numero)
+                for numero, tf in documents.items()
+            ]
+            # Meilleurs passages d'abord : une requête peut s'arrêter aux max_postings premiers
+            liste.sort(key=lambda element: (-element[0], element[1]))
+            vocabulaire[terme] = len(vocabulaire)
+            documents_termes.extend(numero for _, numero in liste)
+            poids_termes.extend(poids for poids, _ in liste)
+            debuts.append(len(documents_termes))
+
+        return cls(
+            passages, vocabulaire,
+            np.asarray(debuts, dtype=np.int64),
+            np.asarray(documents_termes, dtype=np.int32),
+            np.asarray(poids_termes, dtype=np.float32),
+            empreinte_passages(passages), **options,
+        )
+
+    def rechercher(self, texte: str, n: int = 3, frequence_max: float = 0.1,
+                   part_du_meilleur: float = 0.5) -> List[Tuple[Passage, float]]:
+        """Au plus n passages par score BM25 décroissant
+
+        Un passage n'est retenu que s'il contient un terme spécifique de la question : présent dans
+        au plus frequence_max des passages ('grossesse' seul ne suffit pas). part_du_meilleur écarte
+        les passages bien moins pertinents que le premier.
+        """
+        numeros = {self.vocabulaire[terme] for terme in termes(texte) if terme in self.vocabulaire}
+        frequents = max(1, int(frequence_max * len(self.passages)))
+        specifiques = [numero for numero in numeros if self.debuts[numero + 1] - self.debuts[numero] <= frequents]
+        if not specifiques:
+            return []
+
+        documents, poids = {}, {}
+        for numero in numeros:
+            debut = self.debuts[numero]
+            fin = min(self.debuts[numero + 1], debut + self.max_postings)
+            documents[numero] = self.documents[debut:fin]
+            poids[numero] = self.poids[debut:fin]
+        # Scores cumulés sur les seuls passages rencontrés, quel que soit leur nombre total
+        candidats, positions = np.unique(np.concatenate(list(documents.values())), return_inverse=True)
+        scores = np.bincount(positions, weights=np.concatenate(list(poids.values())))
+        retenus = np.isin(candidats, np.concatenate([documents[numero] for numero in specifiques]))
+        scores[~retenus] = 0.0
+
+        k = min(n, len(candidats))
+        meilleurs = np.argpartition(-scores, k - 1)[:k]
+        meilleurs = sorted(meilleurs, key=lambda i: (-scores[i], candidats[i]))
+        seuil = scores[meilleurs[0]] * part_du_meilleur
+        return [
+            (self.passages[int(candidats[i])], round(float(scores[i]), 3))
+            for i in meilleurs if scores[i] > 0 and scores[i] >= seuil
+        ]
+
+    def sauvegarder(self, chemin: Path):
+        """En-tête JSON (passages, vocabulaire, empreinte) puis tableaux alignés sur 8 octets"""
+        tableaux = (('debuts', self.debuts), ('documents', self.documents), ('poids', self.poids))
+        descriptions = []
+        position = 0
+        for nom, tableau in tableaux:
+            descriptions.append({'name': nom, 'dtype': tableau.dtype.newbyteorder('<').str,
+                                 'offset': position, 'length': len(tableau)})
+            position += -(-tableau.nbytes // ALIGNEMENT) * ALIGNEMENT
+
+        vocabulaire = sorted(self.vocabulaire, key=self.vocabulaire.get)
+        entete = json.dumps({
+            'format': FORMAT_INDEX,
+            'knowledge_sha256': self.empreinte,
+            'passages': [list(passage) for passage in self.passages],
+            'vocabulary': vocabulaire,
+            'arrays': descriptions,
+        }, ensure_ascii=False).encode('utf-8')
+        debut = len(MAGIC_INDEX) + 4 + len(entete)
+        entete += b' ' * (-debut % ALIGNEMENT)
+
+        morceaux = [MAGIC_INDEX, struct.pack('<I', len(entete)), entete]
+        for (_, tableau), description in zip(tableaux, descriptions):
+            donnees = tableau.astype(description['dtype'], copy=False).tobytes()
+            morceaux.append(donnees + b'\0' * (-len(donnees) % ALIGNEMENT))
+        publier(Path(chemin), b''.join(morceaux))
+
+    @classmethod
+    def charger(cls, chemin: Path, empreinte: Optional[str] = None, **options) -> Optional['IndexPassages']:
+        """Projette l'index en mémoire ; None s'il est absent, illisible ou construit pour d'autres passages"""
+        try:
+            donnees = np.memmap(chemin, dtype=np.uint8, mode='r')
+        except (OSError, ValueError):
+            return None
+        if bytes(donnees[:len(MAGIC_INDEX)]) != MAGIC_INDEX:
+            return None
+
+        # Fichier tronqué ou corrompu : None, l'index est reconstruit en mémoire
+        try:
+            position = len(MAGIC_INDEX)
+            (taille_entete,) = struct.unpack('<I', bytes(donnees[position:position + 4]))
+            position += 4
+            entete = json.loads(bytes(donnees[position:position + taille_entete]).decode('utf-8'))
+            position += taille_entete
+            if entete['format'] != FORMAT_INDEX or (empreinte is not None and entete['knowledge_sha256'] != empreinte):
+                return None
+
+            tableaux = {
+                description['name']: np.frombuffer(donnees, dtype=np.dtype(description['dtype']),
+                                                   count=description['length'], offset=position + description['offset'])
+                for description in entete['arrays']
+            }
+            return cls(
+                [Passage(tuple(chemin_), texte) for chemin_, texte in entete['passages']],
+                {terme: numero for numero, terme in enumerate(entete['vocabulary'])},
+                tableaux['debuts'], tableaux['documents'], tableaux['poids'],
+                entete['knowledge_sha256'], **options,
+            )
+        except (struct.error, ValueError, KeyError, TypeError, UnicodeDecodeError):
+            return None
+
+
+def index_passages(passages: List[Passage], chemin: Optional[Path] = None) -> IndexPassages:
+    """Index construit d'avance s'il correspond encore aux passages, sinon construit en mémoire"""
+    index = IndexPassages.charger(chemin or chemin_index_par_defaut(), empreinte_passages(passages))
+    return index if index is not None else IndexPassages.construire(passages)
@@ -0,0 +1,94 @@
+"""
+Cache des prédictions de risque
+Cache LRU borné avec expiration (TTL), placé devant model.predict et indexé par
+le vecteur encodé des 8 caractéristiques. Vidé automatiquement quand la version
+du modèle change.
+"""
+
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+
+class PredictionCache:
+    """Cache LRU/TTL thread-safe des prédictions, avec compteurs de hits et de misses"""
+
+    def __init__(self, max_size: int = 4096, ttl: float = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @staticmethod
+    def cle(inputs: Sequence[float]) -> Tuple[float, ...]:
+        """Clé quantifiée en float32 : les arbres ne voient pas de différence en deçà"""
+        return tuple(array('f', inputs).tolist())
+
+    def _verifier_version(self, version: Optional[str]):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, version: Optional[str], cle: Tuple[float, ...]) -> Optional[Any]:
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            self._verifier_version(version)
+            entree = self._entries.get(cle)
+
+            if entree is None or entree[0] < time.monotonic():
+                if entree is not None:
+                    del self._entries[cle]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(cle)
+            self.hits += 1
+            return entree[1]
+
+    def set(self, version: Optional[str], cle: Tuple[float, ...], prediction: Any):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._verifier_version(version)
+            self._entries[cle] = (time.monotonic() + self.ttl, prediction)
+            self._entries.move_to_end(cle)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else None,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'model_version': self._version,
+        }
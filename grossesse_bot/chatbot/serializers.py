@@ -1,10 +1,11 @@
 from rest_framework import serializers
 
 class GrossesseInputSerializer(serializers.Serializer):
-    age = serializers.IntegerField()
-    mois_grossesse = serializers.IntegerField()
-    poids_kg = serializers.FloatField()
-    taille_cm = serializers.FloatField()
+    # Bornes volontairement larges autour de donnees_grossesse.csv (16-45 ans, 45-110 kg, 145-180 cm)
+    age = serializers.IntegerField(min_value=12, max_value=60)
+    mois_grossesse = serializers.IntegerField(min_value=1, max_value=9)
+    poids_kg = serializers.FloatField(min_value=30, max_value=250)
+    taille_cm = serializers.FloatField(min_value=100, max_value=230)
     activité = serializers.CharField()
     régime = serializers.CharField()
     antécédents = serializers.CharField()
@@ -0,0 +1,88 @@
+"""
+Statistiques de risque pré-agrégées
+Chaque évaluation incrémente les compteurs horaires et journaliers de StatistiqueRisque
+(profil, tranche d'âge, mois de grossesse), dans la même transaction que son insertion.
+Les tableaux de bord lisent ces quelques lignes au lieu d'un GROUP BY sur EvaluationGrossesse.
+"""
+
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import StatistiqueRisque
+
+# Bornes inférieures des tranches d'âge
+TRANCHES_AGE = ((40, '40+'), (35, '35-39'), (30, '30-34'), (25, '25-29'), (20, '20-24'))
+TRANCHE_MIN = '<20'
+
+GRANULARITES = ('heure', 'jour')
+
+
+def tranche_age(age: int) -> str:
+    for borne, libelle in TRANCHES_AGE:
+        if age >= borne:
+            return libelle
+    return TRANCHE_MIN
+
+
+def tronquer(date: datetime, granularite: str) -> datetime:
+    """Début de l'heure ou du jour (fuseau TIME_ZONE) contenant la date"""
+    locale = timezone.localtime(date)
+    if granularite == 'jour':
+        return locale.replace(hour=0, minute=0, second=0, microsecond=0)
+    return locale.replace(minute=0, second=0, microsecond=0)
+
+
+def compter(evaluations: Iterable[Dict[str, Any]]) -> Counter:
+    """Compteurs (granularité, période, profil, tranche d'âge, mois) pour des évaluations"""
+    compteurs = Counter()
+    for evaluation in evaluations:
+        dimensions = (evaluation['profil_risque'], tranche_age(evaluation['age']), evaluation['mois_grossesse'])
+        for granularite in GRANULARITES:
+            compteurs[(granularite, tronquer(evaluation['date'], granularite), *dimensions)] += 1
+    return compteurs
+
+
+def cumuler(compteurs: Counter):
+    """Ajoute les compteurs à StatistiqueRisque (UPDATE nombre = nombre + n, sinon INSERT)"""
+    for (granularite, periode, profil, tranche, mois), n in compteurs.items():
+        cle = dict(granularite=granularite, periode=periode, profil_risque=profil,
+                   tranche_age=tranche, mois_grossesse=mois)
+        if StatistiqueRisque.objects.filter(**cle).update(nombre=F('nombre') + n):
+            continue
+        try:
+            # Point de sauvegarde : un autre worker a pu créer la ligne entre-temps
+            with transaction.atomic():
+                StatistiqueRisque.objects.create(nombre=n, **cle)
+        except IntegrityError:
+            StatistiqueRisque.objects.filter(**cle).update(nombre=F('nombre') + n)
+
+
+# Dimensions par lesquelles les séries peuvent être ventilées
+DIMENSIONS = ('profil_risque', 'tranche_age', 'mois_grossesse')
+
+
+def series(granularite: str, debut: datetime = None, fin: datetime = None, par: Iterable[str] = ('profil_risque',)):
+    """Nombre d'évaluations par période et par dimensions demandées, lu dans StatistiqueRisque"""
+    if granularite not in GRANULARITES:
+        raise ValueError(f"Granularité inconnue : {granularite} (attendu : {', '.join(GRANULARITES)})")
+    par = list(par)
+    inconnues = [dimension for dimension in par if dimension not in DIMENSIONS]
+    if inconnues:
+        raise ValueError(f"Dimension inconnue : {', '.join(inconnues)} (attendu : {', '.join(DIMENSIONS)})")
+
+    lignes = StatistiqueRisque.objects.filter(granularite=granularite)
+    if debut is not None:
+        lignes = lignes.filter(periode__gte=debut)
+    if fin is not None:
+        lignes = lignes.filter(periode__lt=fin)
+
+    champs = ['periode', *par]
+    return [
+        {**ligne, 'periode': timezone.localtime(ligne['periode']).isoformat()}
+        for ligne in lignes.values(*champs).annotate(nombre=Sum('nombre')).order_by(*champs)
+    ]
@@ -1,3 +1,1503 @@
-from django.test import TestCase
+import base64
+import csv
+import hashlib
+import http.server
+import json
+import py_compile
+import re
+import tempfile
+import threading
+import unittest
+import time
+from array import array
+from datetime import datetime, timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import joblib
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import InterfaceError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from sklearn.ensemble import RandomForestClassifier
+
+from . import archive, export, validation, views
+from . import training
+from .management.commands import score_csv
+from .download_cache import DownloadCache
+from .evaluation_writer import EvaluationWriter
+from . import flat_forest
+from .flat_forest import FlatForest, charger_foret, compacter_foret, compresser_foret, exporter_foret
+from .forest_codegen import generer_source
+from .keyword_automaton import AutomateMotsCles, etiquettes
+from .knowledge_base import GrossesseKnowledgeBase
+from .inference_server import InferenceClient, InferenceError, InferenceServer
+from .intelligent_chatbot import IntelligentGrossesseChatbot
+from .micro_batcher import MicroBatcher
+from .model_registry import PROJECT_ROOT, ModelRegistry
+from .nlp_processor import MessageAnalysis, NLPProcessor, NormalizedMessage
+from .passage_index import IndexPassages, Passage, passages_de, raciniser, termes
+from .models import EvaluationGrossesse, StatistiqueRisque
+from .prediction_cache import PredictionCache
+from .serializers import GrossesseInputSerializer
+from .trigram_index import IndexTrigrammes
+from . import statistiques
+
+DATA_PATH = PROJECT_ROOT / 'donnees_grossesse.csv'
+
+
+def entrainer_petit_modele(n_estimators=5, seed=0):
+    """Entraîne une petite forêt sur des profils synthétiques (8 caractéristiques encodées)"""
+    rng = np.random.RandomState(seed)
+    n = 400
+    X = np.column_stack([
+        rng.randint(16, 46, n),
+        rng.randint(1, 10, n),
+        rng.randint(45, 111, n),
+        rng.randint(145, 181, n),
+        rng.randint(0, 3, n),
+        rng.randint(0, 3, n),
+        rng.randint(0, 5, n),
+        rng.randint(0, 4, n),
+    ]).astype(float)
+    y = np.where(X[:, 6] >= 3, 'élevé', np.where(X[:, 0] > 35, 'modéré', 'normal'))
+    model = RandomForestClassifier(n_estimators=n_estimators, max_depth=6, random_state=seed)
+    return model.fit(X, y)
+
+
+def charger_donnees_encodees():
+    """Lit donnees_grossesse.csv (via son cache en colonnes), catégories encodées comme LabelEncoder"""
+    colonnes = training.charger_colonnes(DATA_PATH)
+    return colonnes.matrice(), colonnes.cible
+
+
+class ModeleTemporaireMixin:
+    """Écrit un petit modèle sur disque et l'injecte dans chatbot.views"""
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.model_path = Path(self.tmpdir.name) / 'model.pkl'
+        joblib.dump(entrainer_petit_modele(), self.model_path)
+
+        self.registry = ModelRegistry(path=self.model_path)
+        self.cache = PredictionCache(max_size=100, ttl=60)
+        for nom, valeur in (('risk_model', self.registry), ('prediction_cache', self.cache)):
+            patcher = mock.patch.object(views, nom, valeur)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+ENREGISTREMENT = {
+    "age": 30,
+    "mois_grossesse": 6,
+    "poids_kg": 70,
+    "taille_cm": 165,
+    "activité": "modérée",
+    "régime": "omnivore",
+    "antécédents": "aucun",
+    "symptôme": "aucun",
+}
+
+
+class ModelRegistryTests(ModeleTemporaireMixin, TestCase):
+
+    def test_chargement_paresseux(self):
+        self.assertFalse(self.registry.is_loaded)
+        self.assertIsNone(self.registry.info()['load_time_ms'])
+
+        model = self.registry.get_model()
+
+        self.assertIs(model, self.registry.get_model())
+        info = self.registry.info()
+        self.assertTrue(info['loaded'])
+        self.assertGreater(info['memory_bytes'], 0)
+        self.assertIsNotNone(info['load_time_ms'])
+
+    def test_warm_up(self):
+        self.registry.warm_up()
+        self.assertTrue(self.registry.is_loaded)
+
+    def test_rechargement_atomique(self):
+        ancien_modele, ancienne_version = self.registry.snapshot()
+
+        joblib.dump(entrainer_petit_modele(seed=1), self.model_path)
+        self.registry.reload(background=True).join()
+
+        nouveau_modele, nouvelle_version = self.registry.snapshot()
+        self.assertIsNot(nouveau_modele, ancien_modele)
+        self.assertNotEqual(nouvelle_version, ancienne_version)
+        self.assertEqual(self.registry.info()['reloads'], 1)
+
+    def test_surveillance_du_fichier(self):
+        self.registry.watch_interval = 0.01
+        _, ancienne_version = self.registry.snapshot()
+
+        joblib.dump(entrainer_petit_modele(seed=2), self.model_path)
+        time.sleep(0.02)
+        self.registry.snapshot()
+        self.registry._reload_thread.join()
+
+        self.assertNotEqual(self.registry.version, ancienne_version)
+
+    def test_echec_du_rechargement_conserve_le_modele(self):
+        _, version = self.registry.snapshot()
+
+        self.model_path.write_bytes(b'fichier tronque')
+        self.registry.reload(background=False)
+
+        self.assertEqual(self.registry.version, version)
+        self.assertIsNotNone(self.registry.info()['last_error'])
+
+
+class PredictionLotTests(ModeleTemporaireMixin, TestCase):
+
+    def test_erreurs_par_index(self):
+        lot = [
+            ENREGISTREMENT,
+            {**ENREGISTREMENT, "age": "trente"},
+            {**ENREGISTREMENT, "régime": "carnivore"},
+            ENREGISTREMENT,
+        ]
+        response = self.client.post('/api/predire/batch/', lot, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['nombre_valides'], 2)
+        self.assertEqual(data['nombre_erreurs'], 2)
+        self.assertEqual([r['index'] for r in data['resultats']], [0, 1, 2, 3])
+        self.assertIn('age', data['resultats'][1]['erreurs'])
+        self.assertIn('non_field_errors', data['resultats'][2]['erreurs'])
+        self.assertEqual(data['resultats'][0], data['resultats'][3] | {"index": 0})
+
+    def test_un_seul_appel_au_modele(self):
+        model = self.registry.get_model()
+        with mock.patch.object(model, 'predict', wraps=model.predict) as predict:
+            self.client.post('/api/predire/batch/', [ENREGISTREMENT] * 50, content_type='application/json')
+        self.assertEqual(predict.call_count, 1)
+
+    def test_version_dans_la_reponse(self):
+        response = self.client.post('/api/predire/', ENREGISTREMENT, content_type='application/json')
+        self.assertEqual(response.json()['version_modele'], self.registry.version)
+
+        sante = self.client.get('/health/').json()
+        self.assertEqual(sante['model']['version'], self.registry.version)
+
+    def test_corps_invalide(self):
+        response = self.client.post('/api/predire/batch/', ENREGISTREMENT, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/predire/batch/', "pas une liste", content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_lot_trop_volumineux(self):
+        with self.settings(PREDICTION_BATCH_MAX_SIZE=3):
+            refuse = self.client.post('/api/predire/batch/', [ENREGISTREMENT] * 4, content_type='application/json')
+            accepte = self.client.post('/api/predire/batch/', [ENREGISTREMENT] * 3, content_type='application/json')
+
+        self.assertEqual(refuse.status_code, 400)
+        self.assertIn('3', refuse.json()['error'])
+        self.assertEqual(accepte.status_code, 200)
+        self.assertEqual(accepte.json()['nombre_valides'], 3)
+
+
+class PredictionCacheTests(ModeleTemporaireMixin, TestCase):
+
+    def test_profil_repete_sans_parcours_des_arbres(self):
+        model = self.registry.get_model()
+        with mock.patch.object(model, 'predict', wraps=model.predict) as predict:
+            premier = views.effectuer_prediction(ENREGISTREMENT)
+            second = views.effectuer_prediction({**ENREGISTREMENT, "poids_kg": 70.0})
+
+        self.assertEqual(premier, second)
+        self.assertEqual(predict.call_count, 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_invalidation_au_changement_de_version(self):
+        views.effectuer_prediction(ENREGISTREMENT)
+
+        joblib.dump(entrainer_petit_modele(seed=3), self.model_path)
+        self.registry.reload(background=False)
+        views.effectuer_prediction(ENREGISTREMENT)
+
+        self.assertEqual(self.cache.misses, 2)
+        self.assertEqual(self.cache.stats()['model_version'], self.registry.version)
+
+    def test_taille_bornee(self):
+        cache = PredictionCache(max_size=2, ttl=60)
+        for age in (20, 30, 40):
+            cache.set('v1', cache.cle([age, 6, 70, 165, 1, 0, 1, 0]), 'normal')
+
+        self.assertEqual(cache.stats()['size'], 2)
+        self.assertEqual(cache.evictions, 1)
+        self.assertIsNone(cache.get('v1', cache.cle([20, 6, 70, 165, 1, 0, 1, 0])))
+
+
+class MicroBatcherTests(ModeleTemporaireMixin, TestCase):
+
+    def test_regroupement_des_appels_concurrents(self):
+        batcher = MicroBatcher(self.registry, max_batch_size=16, max_wait=0.05)
+        model = self.registry.get_model()
+        lignes = [[20 + i, 6, 70, 165, 1, 0, i % 5, 0] for i in range(16)]
+        resultats = [None] * len(lignes)
+
+        def soumettre(i):
+            resultats[i] = batcher.predict(lignes[i])
+
+        with mock.patch.object(model, 'predict', wraps=model.predict) as predict:
+            threads = [threading.Thread(target=soumettre, args=(i,)) for i in range(len(lignes))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        attendu = model.predict(np.asarray(lignes, dtype=np.float64)).tolist()
+        self.assertEqual([prediction for prediction, _ in resultats], attendu)
+        self.assertLess(predict.call_count, len(lignes))
+
+        stats = batcher.stats()
+        self.assertEqual(stats['rows'], len(lignes))
+        self.assertEqual(sum(taille * n for taille, n in stats['batch_sizes'].items()), len(lignes))
+        self.assertIsNotNone(stats['queue_delay_ms']['p99'])
+
+    def test_erreur_transmise_aux_appelants(self):
+        batcher = MicroBatcher(self.registry, max_wait=0)
+        with self.assertRaises(ValueError):
+            batcher.predict([30, 6, 70])
+
+    def test_delai_depasse_repli_local(self):
+        batcher = MicroBatcher(self.registry, max_wait=0)
+        bloque, libere = threading.Event(), threading.Event()
+        snapshot = self.registry.snapshot
+
+        def snapshot_lent():
+            bloque.set()
+            libere.wait(5)
+            return snapshot()
+
+        with mock.patch.object(self.registry, 'snapshot', side_effect=snapshot_lent):
+            premier = threading.Thread(target=lambda: batcher.predict([20, 6, 70, 165, 1, 0, 1, 0]))
+            premier.start()
+            bloque.wait(5)
+            # Le thread de fond est occupé : cette ligne attend dans la file et expire
+            with self.assertRaises(TimeoutError):
+                batcher.predict([30, 6, 70, 165, 1, 0, 1, 0], timeout=0.05)
+            libere.set()
+            premier.join(5)
+
+        self.assertEqual(batcher.stats()['timeouts'], 1)
+        # La ligne expirée est écartée sans être évaluée
+        time.sleep(0.05)
+        self.assertEqual(batcher.rows, 1)
+
+        # La vue se rabat sur le modèle local au lieu de répondre 500
+        with mock.patch.object(views, 'micro_batcher', batcher), \
+                mock.patch.object(batcher, 'predict', side_effect=TimeoutError("Micro-batch sans réponse")):
+            resultat = views.effectuer_prediction(ENREGISTREMENT)
+        self.assertEqual(resultat['version_modele'], self.registry.version)
+
+
+class InferenceServerTests(ModeleTemporaireMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.socket_path = str(Path(self.tmpdir.name) / 'inference.sock')
+
+    def demarrer_serveur(self):
+        serveur = InferenceServer(self.socket_path, self.registry)
+        threading.Thread(target=serveur.serve_forever, daemon=True).start()
+        self.addCleanup(serveur.server_close)
+        self.addCleanup(serveur.shutdown)
+
+    def test_predictions_identiques_au_modele(self):
+        self.demarrer_serveur()
+        client = InferenceClient(self.socket_path, pool_size=2, timeout=2)
+        lignes = [[20 + i, 6, 70, 165, 1, 0, i % 5, 0] for i in range(30)]
+
+        predictions, version = client.predict(lignes)
+        client.predict(lignes[:1])
+
+        model = self.registry.get_model()
+        self.assertEqual(predictions, model.predict(np.asarray(lignes, dtype=np.float64)).tolist())
+        self.assertEqual(version, self.registry.version)
+        self.assertEqual(client.stats()['pooled_connections'], 1)
+
+    def test_erreur_du_serveur(self):
+        self.demarrer_serveur()
+        client = InferenceClient(self.socket_path, timeout=2)
+        with self.assertRaises(InferenceError):
+            client.predict([[30, 6, 70]])
+
+    def test_rechargement_du_serveur_sans_cache_perime(self):
+        self.demarrer_serveur()
+        client = InferenceClient(self.socket_path, timeout=2)
+        with mock.patch.object(views, 'inference_client', client):
+            avant = views.effectuer_prediction(ENREGISTREMENT)
+            joblib.dump(entrainer_petit_modele(seed=3), self.model_path)
+            self.registry.reload(background=False)
+            apres = views.effectuer_prediction(ENREGISTREMENT)
+
+        self.assertNotEqual(avant['version_modele'], apres['version_modele'])
+        self.assertEqual(apres['version_modele'], self.registry.version)
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_lot_au_dela_de_l_entete(self):
+        self.demarrer_serveur()
+        client = InferenceClient(self.socket_path, timeout=5)
+        ligne = [30, 6, 70, 165, 1, 0, 1, 0]
+        predictions, _ = client.predict([ligne] * 0xFFFF)
+        self.assertEqual(len(predictions), 0xFFFF)
+        with self.assertRaises(InferenceError):
+            client.predict([ligne] * 0x10000)
+
+        # La vue se rabat sur le modèle local
+        with mock.patch.object(views, 'inference_client', client):
+            predictions, version = views.evaluer_lignes([ligne] * 0x10000)
+        self.assertEqual(len(predictions), 0x10000)
+        self.assertEqual(version, self.registry.version)
+
+    def test_repli_sur_le_modele_local(self):
+        client = InferenceClient(self.socket_path, timeout=0.1)
+        with mock.patch.object(views, 'inference_client', client):
+            resultat = views.effectuer_prediction(ENREGISTREMENT)
+
+        self.assertEqual(resultat['version_modele'], self.registry.version)
+        self.assertEqual(client.failures, 1)
+
+
+class EvaluationWriterTests(ModeleTemporaireMixin, TransactionTestCase):
+    """Le thread d'écriture utilise sa propre connexion : pas de transaction englobante"""
+
+    def attendre(self, condition, delai=5.0):
+        limite = time.monotonic() + delai
+        while not condition():
+            if time.monotonic() > limite:
+                self.fail("Condition non atteinte à temps")
+            time.sleep(0.01)
+
+    def test_lots_par_taille(self):
+        writer = EvaluationWriter(batch_size=5, flush_interval=60)
+        self.addCleanup(writer.close)
+        for age in range(20, 30):
+            writer.enregistrer({**ENREGISTREMENT, "age": age}, "normal")
+
+        self.attendre(lambda: writer.written == 10)
+        self.assertEqual(writer.flushes, 2)
+        self.assertEqual(sorted(EvaluationGrossesse.objects.values_list('age', flat=True)), list(range(20, 30)))
+
+    def test_vidage_periodique(self):
+        writer = EvaluationWriter(batch_size=100, flush_interval=0.05)
+        self.addCleanup(writer.close)
+        writer.enregistrer(ENREGISTREMENT, "élevé")
+
+        self.attendre(lambda: writer.written == 1)
+        self.assertEqual(EvaluationGrossesse.objects.get().profil_risque, "élevé")
+
+    def test_modalites_canoniques(self):
+        writer = EvaluationWriter(batch_size=3, flush_interval=60)
+        for activite in ('Moderee', ' MODÉRÉE', 'modérée'):
+            writer.enregistrer({**ENREGISTREMENT, "activité": activite, "antécédents": "DIABETE"}, "élevé")
+        writer.close()
+
+        self.assertEqual(set(EvaluationGrossesse.objects.values_list('activité', 'antécédents')),
+                         {('modérée', 'diabète')})
+
+    def test_reconnexion_apres_coupure(self):
+        writer = EvaluationWriter(batch_size=1, flush_interval=60)
+        self.addCleanup(writer.close)
+        base = {'coupee': True}
+        bulk_create = EvaluationGrossesse.objects.bulk_create
+
+        def bulk_create_coupe(*args, **kwargs):
+            if base['coupee']:
+                raise InterfaceError("connection already closed")
+            return bulk_create(*args, **kwargs)
+
+        def close_old_connections():
+            # Comme Django : une connexion en erreur est fermée, puis rouverte à la requête suivante
+            if writer.failed:
+                base['coupee'] = False
+
+        with mock.patch.object(EvaluationGrossesse.objects, 'bulk_create', side_effect=bulk_create_coupe), \
+                mock.patch('chatbot.evaluation_writer.close_old_connections', side_effect=close_old_connections):
+            writer.enregistrer({**ENREGISTREMENT, "age": 20}, "normal")
+            self.attendre(lambda: writer.failed == 1)
+            writer.enregistrer({**ENREGISTREMENT, "age": 21}, "normal")
+            self.attendre(lambda: writer.written == 1)
+
+        self.assertEqual(list(EvaluationGrossesse.objects.values_list('age', flat=True)), [21])
+        self.assertIn("connection already closed", writer.stats()['last_error'])
+
+    def test_vidage_a_l_arret(self):
+        writer = EvaluationWriter(batch_size=100, flush_interval=60)
+        for _ in range(3):
+            writer.enregistrer(ENREGISTREMENT, "normal")
+        writer.close()
+
+        self.assertEqual(EvaluationGrossesse.objects.count(), 3)
+        self.assertEqual(writer.stats()['written'], 3)
+
+    def test_file_pleine_abandon(self):
+        writer = EvaluationWriter(batch_size=1, max_queue=1)
+        en_cours, liberer = threading.Event(), threading.Event()
+
+        def ecriture_lente(lot):
+            en_cours.set()
+            liberer.wait(5)
+
+        with mock.patch.object(writer, '_ecrire', side_effect=ecriture_lente):
+            self.assertTrue(writer.enregistrer(ENREGISTREMENT, "normal"))
+            en_cours.wait(5)
+            self.assertTrue(writer.enregistrer(ENREGISTREMENT, "normal"))
+            self.assertFalse(writer.enregistrer(ENREGISTREMENT, "normal"))
+            liberer.set()
+            writer.close()
+
+        self.assertEqual(writer.stats()['dropped'], 1)
+
+    def test_politique_inconnue(self):
+        with self.assertRaises(ValueError):
+            EvaluationWriter(overflow='ignore')
+
+    def test_journalisation_des_predictions(self):
+        writer = EvaluationWriter(batch_size=100, flush_interval=60)
+        with mock.patch.object(views, 'evaluation_writer', writer):
+            resultat = self.client.post('/api/predire/', ENREGISTREMENT, content_type='application/json').json()
+            self.client.post('/api/predire/batch/', [ENREGISTREMENT, {**ENREGISTREMENT, "age": "x"}],
+                             content_type='application/json')
+            # Rien n'est écrit pendant les requêtes
+            self.assertEqual(EvaluationGrossesse.objects.count(), 0)
+            self.assertEqual(self.client.get('/health/').json()['evaluations']['enqueued'], 2)
+        writer.close()
+
+        evaluations = EvaluationGrossesse.objects.all()
+        self.assertEqual(len(evaluations), 2)
+        self.assertEqual({e.profil_risque for e in evaluations}, {resultat['profil_risque']})
+        self.assertEqual(evaluations[0].activité, "modérée")
+
+
+class StatistiquesRisqueTests(TestCase):
+
+    def setUp(self):
+        self.heure = timezone.make_aware(datetime(2025, 3, 10, 14, 25))
+
+    def evaluation(self, age=30, mois=6, profil="normal", decalage=timedelta()):
+        return {**ENREGISTREMENT, "age": age, "mois_grossesse": mois, "profil_risque": profil,
+                "date": self.heure + decalage}
+
+    def test_tranches_d_age(self):
+        self.assertEqual([statistiques.tranche_age(age) for age in (17, 20, 29, 35, 44)],
+                         ['<20', '20-24', '25-29', '35-39', '40+'])
+
+    def test_cumul_incremental(self):
+        evaluations = [self.evaluation(), self.evaluation(profil="élevé"),
+                       self.evaluation(decalage=timedelta(hours=1))]
+        statistiques.cumuler(statistiques.compter(evaluations[:2]))
+        statistiques.cumuler(statistiques.compter(evaluations[2:]))
+
+        jour = StatistiqueRisque.objects.get(granularite='jour', profil_risque='normal')
+        self.assertEqual(jour.nombre, 2)
+        self.assertEqual(timezone.localtime(jour.periode).hour, 0)
+        self.assertEqual(StatistiqueRisque.objects.filter(granularite='heure', profil_risque='normal').count(), 2)
+
+    def test_api_depuis_les_compteurs(self):
+        statistiques.cumuler(statistiques.compter(
+            [self.evaluation(age=22), self.evaluation(age=23), self.evaluation(age=38, profil="élevé"),
+             self.evaluation(decalage=timedelta(days=1))]
+        ))
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/statistiques/', {'granularite': 'jour', 'par': 'tranche_age',
+                                                               'debut': '2025-03-10', 'fin': '2025-03-11'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(s['tranche_age'], s['nombre']) for s in response.json()['series']],
+                         [('20-24', 2), ('35-39', 1)])
+
+        response = self.client.get('/api/statistiques/', {'granularite': 'heure'})
+        self.assertEqual(len(response.json()['series']), 3)
+
+    def test_parametres_invalides(self):
+        for parametres in ({'granularite': 'mois'}, {'par': 'poids_kg'}, {'debut': 'hier'}):
+            self.assertEqual(self.client.get('/api/statistiques/', parametres).status_code, 400)
+
+    def test_backfill_par_blocs(self):
+        EvaluationGrossesse.objects.bulk_create([
+            EvaluationGrossesse(**self.evaluation(age=20 + i % 25, profil=("normal", "élevé")[i % 2]))
+            for i in range(23)
+        ])
+        # Compteurs faux à remplacer
+        StatistiqueRisque.objects.create(granularite='jour', periode=self.heure, profil_risque='normal',
+                                         tranche_age='<20', mois_grossesse=1, nombre=99)
+
+        call_command('backfill_statistiques', chunk_size=5, stdout=StringIO())
+
+        attendu = statistiques.compter(EvaluationGrossesse.objects.values())
+        obtenu = {(s.granularite, s.periode, s.profil_risque, s.tranche_age, s.mois_grossesse): s.nombre
+                  for s in StatistiqueRisque.objects.all()}
+        self.assertEqual(obtenu, dict(attendu))
+
+    def test_backfill_attend_les_ecritures_en_cours(self):
+        from chatbot.management.commands import backfill_statistiques
+
+        with mock.patch.object(backfill_statistiques, 'connection') as connexion:
+            connexion.vendor = 'postgresql'
+            connexion.ops.quote_name.side_effect = lambda nom: f'"{nom}"'
+            backfill_statistiques.verrouiller_evaluations()
+        execute = connexion.cursor.return_value.__enter__.return_value.execute
+        execute.assert_called_once_with('LOCK TABLE "chatbot_evaluationgrossesse" IN SHARE MODE')
+
+        # SQLite sérialise déjà les écritures : aucune requête
+        with CaptureQueriesContext(connection) as requetes:
+            backfill_statistiques.verrouiller_evaluations()
+        self.assertEqual(len(requetes), 0)
+
+    def test_ecriture_differee_met_a_jour_les_compteurs(self):
+        writer = EvaluationWriter()
+        writer._ecrire([self.evaluation(), self.evaluation()])
+        self.assertEqual(StatistiqueRisque.objects.get(granularite='heure').nombre, 2)
+
+
+class ExportEvaluationsTests(TestCase):
+
+    def setUp(self):
+        debut = timezone.make_aware(datetime(2025, 1, 31, 23, 0))
+        # Plusieurs évaluations à la même date : l'id départage l'ordre de pagination
+        EvaluationGrossesse.objects.bulk_create([
+            EvaluationGrossesse(**{**ENREGISTREMENT, "age": 20 + i}, profil_risque="normal",
+                                date=debut + timedelta(hours=i // 3))
+            for i in range(25)
+        ])
+        self.attendu = list(EvaluationGrossesse.objects.order_by('date', 'id').values_list('id', flat=True))
+
+    def test_pagination_par_cle_sans_offset(self):
+        with CaptureQueriesContext(connection) as requetes:
+            blocs = list(export.parcourir(taille_bloc=4))
+
+        self.assertEqual([ligne[0] for bloc in blocs for ligne in bloc], self.attendu)
+        self.assertTrue(all(len(bloc) <= 4 for bloc in blocs))
+        self.assertEqual(len(requetes), len(blocs))
+        self.assertFalse(any('OFFSET' in requete['sql'] for requete in requetes))
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', "plan de requête SQLite")
+    def test_bloc_suivant_par_recherche_d_index(self):
+        with CaptureQueriesContext(connection) as requetes:
+            list(export.parcourir(taille_bloc=4))
+        # Borne simple à côté du OR : tous les planificateurs peuvent s'en servir pour l'index
+        self.assertIn('"date" >= ', requetes[1]['sql'])
+        # Les blocs après le premier cherchent leur point de départ dans l'index, sans le parcourir
+        with connection.cursor() as curseur:
+            curseur.execute('EXPLAIN QUERY PLAN ' + requetes[1]['sql'])
+            plan = ' '.join(str(ligne[-1]) for ligne in curseur.fetchall())
+        self.assertIn('SEARCH', plan)
+        self.assertIn('evaluation_date_id_idx', plan)
+
+    def test_bornes_de_dates(self):
+        debut = timezone.make_aware(datetime(2025, 2, 1, 1, 0))
+        ids = [ligne[0] for bloc in export.parcourir(debut=debut, taille_bloc=5) for ligne in bloc]
+        self.assertEqual(ids, self.attendu[6:])
+
+    def test_api_reservee_aux_administrateurs(self):
+        self.assertEqual(self.client.get('/api/evaluations/export/').status_code, 403)
+
+    def test_api_csv_et_ndjson(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.force_login(admin)
+
+        with mock.patch.object(views.settings, 'EXPORT_CHUNK_SIZE', 7):
+            response = self.client.get('/api/evaluations/export/', {'debut': '2025-01-01'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lignes = list(csv.DictReader(b''.join(response.streaming_content).decode('utf-8').splitlines()))
+        self.assertEqual([int(ligne['id']) for ligne in lignes], self.attendu)
+        self.assertEqual(lignes[0]['activité'], 'modérée')
+
+        response = self.client.get('/api/evaluations/export/', {'type': 'ndjson'})
+        lignes = [json.loads(ligne) for ligne in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual([ligne['id'] for ligne in lignes], self.attendu)
+
+        self.assertEqual(self.client.get('/api/evaluations/export/', {'type': 'xml'}).status_code, 400)
+
+    def test_commande(self):
+        with tempfile.TemporaryDirectory() as dossier:
+            sortie = Path(dossier) / 'evaluations.ndjson'
+            call_command('export_evaluations', str(sortie), format='ndjson', chunk_size=6, stdout=StringIO())
+            lignes = sortie.read_text(encoding='utf-8').splitlines()
+        self.assertEqual([json.loads(ligne)['id'] for ligne in lignes], self.attendu)
+
+
+class ArchiveEvaluationsTests(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.dossier = Path(self.tmpdir.name)
+        reglages = self.settings(EVALUATION_ARCHIVE_DIR=self.tmpdir.name)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+
+        # Du 20 janvier au 15 mars 2025, une évaluation toutes les 13 heures, plus une récente
+        debut = timezone.make_aware(datetime(2025, 1, 20, 8, 0))
+        EvaluationGrossesse.objects.bulk_create(
+            [EvaluationGrossesse(**{**ENREGISTREMENT, "age": 18 + i % 25, "symptôme": ("aucun", "nausée")[i % 2]},
+                                 profil_risque=("normal", "modéré", "élevé")[i % 3], date=debut + timedelta(hours=13 * i))
+             for i in range(100)]
+            + [EvaluationGrossesse(**ENREGISTREMENT, profil_risque="normal")]
+        )
+        self.toutes = [ligne for bloc in export.parcourir() for ligne in bloc]
+        self.limite = timezone.make_aware(datetime(2025, 3, 1))
+
+    def test_archivage_par_mois(self):
+        bilan = archive.archiver(self.limite, taille_lot=7, dossier=self.dossier)
+
+        anciennes = [ligne for ligne in self.toutes if ligne[1] < self.limite]
+        self.assertEqual(bilan, {'2025-01': 22, '2025-02': 52})
+        self.assertEqual(sum(bilan.values()), len(anciennes))
+        self.assertEqual(EvaluationGrossesse.objects.filter(date__lt=self.limite).count(), 0)
+        self.assertEqual(EvaluationGrossesse.objects.count(), len(self.toutes) - len(anciennes))
+
+        janvier = archive.lire_archive(archive.chemin_archive('2025-01', self.dossier))
+        self.assertEqual(list(archive.lignes_archive(janvier)), anciennes[:22])
+
+    def test_lecture_des_seules_colonnes_demandees(self):
+        archive.archiver(self.limite, dossier=self.dossier)
+        colonnes = archive.lire_archive(archive.chemin_archive('2025-02', self.dossier), ['profil_risque'])
+        self.assertEqual(list(colonnes), ['profil_risque'])
+        self.assertEqual(set(colonnes['profil_risque']), {"normal", "modéré", "élevé"})
+
+    def test_reprise_sans_doublon(self):
+        archive.archiver(self.limite, dossier=self.dossier)
+        # Suppression interrompue : une ligne archivée est encore dans la table
+        ligne = dict(zip(export.COLONNES, self.toutes[0]))
+        EvaluationGrossesse.objects.create(**ligne)
+
+        self.assertEqual(len([l for bloc in archive.parcourir(dossier=self.dossier) for l in bloc]), len(self.toutes))
+        archive.archiver(self.limite, dossier=self.dossier)
+
+        janvier = archive.lire_archive(archive.chemin_archive('2025-01', self.dossier), ['id'])
+        self.assertEqual(len(janvier['id']), 22)
+        self.assertFalse(EvaluationGrossesse.objects.filter(id=ligne['id']).exists())
+
+    def test_lecture_transparente(self):
+        # Archivage jusqu'au 10 février : février est à moitié archivé, à moitié dans la table
+        archive.archiver(timezone.make_aware(datetime(2025, 2, 10)), dossier=self.dossier)
+
+        lignes = [ligne for bloc in archive.parcourir(taille_bloc=9, dossier=self.dossier) for ligne in bloc]
+        self.assertEqual(lignes, self.toutes)
+
+        debut, fin = timezone.make_aware(datetime(2025, 1, 25)), timezone.make_aware(datetime(2025, 2, 20))
+        lignes = [ligne for bloc in archive.parcourir(debut, fin, dossier=self.dossier) for ligne in bloc]
+        self.assertEqual(lignes, [ligne for ligne in self.toutes if debut <= ligne[1] < fin])
+
+    def test_lecture_bloc_par_bloc(self):
+        archive.archiver(self.limite, dossier=self.dossier, taille_bloc=10)
+        with open(archive.chemin_archive('2025-02', self.dossier), 'rb') as fichier:
+            self.assertEqual([groupe['n_rows'] for groupe in archive.sommaire(fichier)], [10, 10, 10, 10, 10, 2])
+
+        # Le premier bloc exporté ne décompresse que le premier bloc d'archive
+        with mock.patch.object(archive, 'lignes_archive', wraps=archive.lignes_archive) as decodage:
+            premier = next(archive.parcourir(taille_bloc=5, dossier=self.dossier))
+        self.assertEqual(premier, self.toutes[:5])
+        self.assertEqual(decodage.call_count, 1)
+
+        lignes = [ligne for bloc in archive.parcourir(taille_bloc=7, dossier=self.dossier) for ligne in bloc]
+        self.assertEqual(lignes, self.toutes)
+
+    def test_dictionnaire_au_dela_de_16_bits(self):
+        n = 70000
+        colonnes = archive.colonnes_depuis_lignes(
+            [(i, self.toutes[0][1], 30, 5, 60.0, 165.0, f'activité {i}', 'normal', 'aucun', 'aucun', 'normal')
+             for i in range(n)])
+        chemin = self.dossier / 'large.archive'
+        archive.ecrire_archive(chemin, [colonnes])
+        relu = archive.lire_archive(chemin, ['activité'])['activité']
+        self.assertEqual(relu[-1], f'activité {n - 1}')
+        self.assertEqual(len(set(relu)), n)
+
+    def test_commande_et_statistiques(self):
+        call_command('backfill_statistiques', stdout=StringIO())
+        avant = dict(StatistiqueRisque.objects.values_list('id', 'nombre'))
+
+        sortie = StringIO()
+        call_command('archiver_evaluations', jours=30, dossier=self.tmpdir.name, stdout=sortie)
+        self.assertIn('2025-03', sortie.getvalue())
+        self.assertEqual(EvaluationGrossesse.objects.count(), 1)
+
+        # Les compteurs se reconstruisent à l'identique depuis les archives
+        call_command('backfill_statistiques', stdout=StringIO())
+        self.assertEqual(sorted(StatistiqueRisque.objects.values_list('nombre', flat=True)), sorted(avant.values()))
+
+
+class ValidationRapideTests(ModeleTemporaireMixin, TestCase):
+
+    CAS = [
+        ENREGISTREMENT,
+        {**ENREGISTREMENT, "age": "30.0", "poids_kg": "70.5", "taille_cm": 165},
+        {**ENREGISTREMENT, "age": 30.5, "mois_grossesse": True, "poids_kg": "soixante"},
+        {**ENREGISTREMENT, "age": 11, "mois_grossesse": 10, "poids_kg": 251, "taille_cm": "inf"},
+        {**ENREGISTREMENT, "activité": "", "régime": "   ", "antécédents": None, "symptôme": ["aucun"]},
+        {**ENREGISTREMENT, "activité": 3, "régime": False, "age": "9" * 1001},
+        {"age": 30},
+        {},
+    ]
+
+    def test_parite_avec_le_serializer(self):
+        validateur = views.validateur
+        for cas in self.CAS + [None, [ENREGISTREMENT], "x"]:
+            serializer = GrossesseInputSerializer(data=cas)
+            with self.subTest(cas=cas):
+                if serializer.is_valid():
+                    self.assertEqual(validateur.valider(cas), (dict(serializer.validated_data), None))
+                else:
+                    self.assertEqual(validateur.valider(cas), (None, json.loads(json.dumps(serializer.errors))))
+
+        self.assertEqual(validateur.valider([ENREGISTREMENT])[1].keys(), {'non_field_errors'})
+
+    def test_accents_et_casse_normalises(self):
+        self.assertEqual(views.encoder_entree({**ENREGISTREMENT, "activité": "MODEREE ", "symptôme": "Nausee"}),
+                         views.encoder_entree({**ENREGISTREMENT, "activité": "modérée", "symptôme": "nausée"}))
+        self.assertNotEqual(validation.encoder_categorie('régime', 'vegetalien'),
+                            validation.encoder_categorie('régime', 'végétarien'))
+
+    def test_chemin_rapide_identique_au_chemin_drf(self):
+        for cas in self.CAS + [{**ENREGISTREMENT, "régime": "carnivore"}]:
+            with self.subTest(cas=cas):
+                rapide = self.client.post('/api/predire/', cas, content_type='application/json')
+                with self.settings(PREDICTION_FAST_PATH=False):
+                    drf = self.client.post('/api/predire/', cas, content_type='application/json')
+                self.assertNotIn('rest_framework', type(rapide).__module__)
+                self.assertEqual(rapide.status_code, drf.status_code)
+                self.assertEqual(rapide.json(), drf.json())
+
+        for corps in ('null', '[]', '"x"'):
+            with self.subTest(corps=corps):
+                rapide = self.client.post('/api/predire/', corps, content_type='application/json')
+                with self.settings(PREDICTION_FAST_PATH=False):
+                    drf = self.client.post('/api/predire/', corps, content_type='application/json')
+                self.assertEqual(rapide.status_code, drf.status_code)
+                self.assertEqual(rapide.json(), drf.json())
+
+        reponse = self.client.post('/api/predire/', {**ENREGISTREMENT, "régime": "carnivore"},
+                                   content_type='application/json')
+        self.assertEqual(reponse.json(), {"error": "Valeur invalide pour une variable catégorielle : 'carnivore'"})
+
+    def test_autres_corps_par_drf(self):
+        reponse = self.client.post('/api/predire/', ENREGISTREMENT)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertIn('rest_framework', type(reponse).__module__)
+
+        self.assertEqual(self.client.post('/api/predire/', '{', content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.get('/api/predire/').status_code, 405)
+
+    @unittest.skipUnless(DATA_PATH.exists(), "donnees_grossesse.csv absent")
+    def test_benchmark(self):
+        sortie = StringIO()
+        call_command('benchmark_validation', rows=50, repeat=1, stdout=sortie)
+        self.assertIn('Parité vérifiée sur 50', sortie.getvalue())
+        self.assertIn('JsonResponse', sortie.getvalue())
+
+
+class ScoreCsvTests(ModeleTemporaireMixin, TestCase):
+
+    def ecrire_entree(self, n):
+        chemin = Path(self.tmpdir.name) / 'entree.csv'
+        with open(chemin, 'w', newline='', encoding='utf-8') as fichier:
+            ecrivain = csv.DictWriter(fichier, fieldnames=list(ENREGISTREMENT) + ['profil_risque'])
+            ecrivain.writeheader()
+            for i in range(n):
+                ecrivain.writerow({**ENREGISTREMENT, 'age': 18 + i % 25, 'régime': 'carnivore' if i == 3 else 'omnivore',
+                                   'profil_risque': 'normal'})
+        return chemin
+
+    def scorer(self, entree, **options):
+        sortie = Path(self.tmpdir.name) / f"sortie_{options.get('workers', 1)}.csv"
+        with mock.patch.object(score_csv, 'risk_model', self.registry):
+            call_command('score_csv', str(entree), str(sortie), stdout=mock.MagicMock(), **options)
+        with open(sortie, newline='', encoding='utf-8') as fichier:
+            return list(csv.DictReader(fichier))
+
+    def test_scoring_par_blocs(self):
+        entree = self.ecrire_entree(50)
+        lignes = self.scorer(entree, chunk_size=7)
+
+        self.assertEqual(len(lignes), 50)
+        self.assertIn('carnivore', lignes[3]['erreur'])
+        self.assertEqual(lignes[3]['profil_risque'], '')
+
+        attendu = views.effectuer_prediction({**ENREGISTREMENT, 'age': 18})['profil_risque']
+        self.assertEqual(lignes[0]['profil_risque'], attendu)
+        self.assertEqual(lignes[0]['conseil'], views.conseils[attendu])
+
+    def test_ligne_incomplete(self):
+        entree = self.ecrire_entree(3)
+        with open(entree, 'a', newline='', encoding='utf-8') as fichier:
+            fichier.write('30,6,70,165\n')
+        lignes = self.scorer(entree)
+
+        self.assertEqual(len(lignes), 4)
+        self.assertEqual(lignes[3]['profil_risque'], '')
+        self.assertIn('Valeur manquante', lignes[3]['erreur'])
+        self.assertNotEqual(lignes[0]['profil_risque'], '')
+
+    def test_pool_de_processus_meme_sortie(self):
+        entree = self.ecrire_entree(40)
+        self.assertEqual(self.scorer(entree, chunk_size=5, workers=2), self.scorer(entree, chunk_size=5))
+
+
+class TrainModelTests(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.dossier = Path(self.tmpdir.name)
+        self.data = self.dossier / 'donnees.csv'
+
+        rng = np.random.RandomState(0)
+        activites = ['faible', 'modérée', 'élevée']
+        regimes = ['omnivore', 'végétalien', 'végétarien']
+        antecedents = ['aucun', 'asthme', 'autre', 'diabète', 'hypertension']
+        symptomes = ['aucun', 'douleur', 'fatigue', 'nausée']
+        with open(self.data, 'w', newline='', encoding='utf-8') as fichier:
+            ecrivain = csv.writer(fichier)
+            ecrivain.writerow(training.FEATURE_ORDER + [training.CIBLE])
+            for i in range(300):
+                antecedent = antecedents[rng.randint(5)]
+                ligne = [rng.randint(16, 46), rng.randint(1, 10), rng.randint(45, 111), rng.randint(145, 181),
+                         activites[rng.randint(3)], regimes[rng.randint(3)], antecedent, symptomes[rng.randint(4)],
+                         'élevé' if antecedent in ('diabète', 'hypertension') else 'normal']
+                ecrivain.writerow(ligne)
+                if i % 10 == 0:
+                    ecrivain.writerow(ligne)
+
+    def entrainer(self, **options):
+        call_command('train_model', data=str(self.data), output=str(self.dossier / 'model.pkl'),
+                     mappings=str(self.dossier / 'mappings.py'), n_estimators=5, n_jobs=1,
+                     stdout=mock.MagicMock(), **options)
+
+    def test_chargement_par_colonnes(self):
+        colonnes = training.charger_colonnes(self.data)
+
+        self.assertEqual(len(colonnes), 330)
+        self.assertEqual(colonnes.numeriques['age'].dtype, np.int64)
+        self.assertEqual(colonnes.mappings['régime'], {'omnivore': 0, 'végétalien': 1, 'végétarien': 2})
+        X, _ = training.dedoublonner(colonnes.matrice(), colonnes.cible)
+        self.assertEqual(len(X), 300)
+
+    def test_cache_en_colonnes(self):
+        reference = training.charger_colonnes(self.data, cache=False)
+        training.charger_colonnes(self.data)
+        self.assertTrue(training.chemin_cache(self.data).exists())
+
+        with mock.patch.object(training, 'lire_csv_colonnes') as lire_csv:
+            colonnes = training.charger_colonnes(self.data)
+        lire_csv.assert_not_called()
+        self.assertIsInstance(colonnes.numeriques['age'].base, np.memmap)
+        self.assertTrue(np.array_equal(colonnes.matrice(), reference.matrice()))
+        self.assertEqual(colonnes.cible.tolist(), reference.cible.tolist())
+        self.assertEqual(colonnes.categories, reference.categories)
+
+        # CSV modifié : nouvelle empreinte, cache reconstruit
+        with open(self.data, 'a', newline='', encoding='utf-8') as fichier:
+            fichier.write('30,6,70,165,faible,omnivore,aucun,aucun,normal\n')
+        self.assertEqual(len(training.charger_colonnes(self.data)), len(reference) + 1)
+
+    def test_cache_tronque_reconstruit(self):
+        reference = training.charger_colonnes(self.data)
+        cache = training.chemin_cache(self.data)
+        contenu = cache.read_bytes()
+        empreinte = training.empreinte_fichier(self.data)
+        # Coupé dans la longueur d'en-tête, dans l'en-tête JSON, dans les tableaux
+        for taille in (10, 40, len(contenu) - 100):
+            cache.write_bytes(contenu[:taille])
+            self.assertIsNone(training.lire_cache(cache, empreinte))
+
+        colonnes = training.charger_colonnes(self.data)
+        self.assertTrue(np.array_equal(colonnes.matrice(), reference.matrice()))
+        self.assertEqual(cache.read_bytes(), contenu)
+
+    def test_artefacts_publies(self):
+        self.entrainer(latency_budget_ms=0)
+
+        model = joblib.load(self.dossier / 'model.pkl')
+        self.assertIsNone(model.n_jobs)
+        metadata = json.loads((self.dossier / 'model.json').read_text(encoding='utf-8'))
+        self.assertEqual(metadata['feature_order'], training.FEATURE_ORDER)
+        self.assertEqual(metadata['classes'], model.classes_.tolist())
+        self.assertIn('p50_ms', metadata['latency'])
+
+        encodeurs = joblib.load(self.dossier / 'label_encoders.pkl')
+        self.assertEqual(encodeurs['symptôme'].transform(['nausée']).tolist(), [3])
+
+        # Le module généré est identique au module versionné pour le même jeu de catégories
+        espace = {}
+        exec((self.dossier / 'mappings.py').read_text(encoding='utf-8'), espace)
+        self.assertEqual(espace['MAPPINGS'], views.MAPPINGS)
+
+    def test_budget_de_latence(self):
+        with self.assertRaises(CommandError):
+            self.entrainer(latency_budget_ms=1e-6)
+        self.assertFalse((self.dossier / 'model.pkl').exists())
+
+
+class FlatForestTests(TestCase):
+
+    @unittest.skipUnless(DATA_PATH.exists(), "donnees_grossesse.csv absent")
+    def test_parite_sur_donnees_grossesse(self):
+        X, y = charger_donnees_encodees()
+        model = RandomForestClassifier(n_estimators=10, max_depth=10, class_weight='balanced', random_state=42)
+        model.fit(X, y)
+
+        foret = FlatForest.from_bytes(exporter_foret(model).to_bytes())
+        lignes = X.tolist()
+
+        # Chaque ligne du jeu de données : mêmes classes et mêmes probabilités, bit à bit
+        self.assertEqual(foret.predict(lignes), model.predict(X).tolist())
+        self.assertEqual(foret.predict_proba(lignes), model.predict_proba(X).tolist())
+
+    def test_chargement_par_le_registre(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            chemin = Path(tmpdir) / 'model.forest'
+            exporter_foret(entrainer_petit_modele()).save(chemin)
+
+            registry = ModelRegistry(path=chemin, loader=charger_foret)
+            foret = registry.get_model()
+
+        self.assertEqual(registry.info()['memory_bytes'], foret.nbytes)
+        self.assertIn(foret.predict([[30, 6, 70, 165, 1, 0, 1, 0]])[0], ['normal', 'modéré', 'élevé'])
+
+
+    def test_compaction_sans_perte(self):
+        model = entrainer_petit_modele(n_estimators=6)
+        X = np.random.RandomState(5).randint(0, 180, (300, 8)).astype(float)
+        foret = exporter_foret(model)
+
+        compacte = FlatForest.from_bytes(compacter_foret(foret, float32=True, dedup_leaves=True).to_bytes())
+
+        self.assertEqual(compacte.threshold.typecode, 'f')
+        self.assertLess(compacte.nbytes, foret.nbytes)
+        self.assertEqual(compacte.predict_proba(X.tolist()), model.predict_proba(X).tolist())
+
+    def test_variantes_reduites(self):
+        model = entrainer_petit_modele(n_estimators=6)
+        X = np.random.RandomState(6).randint(0, 180, (50, 8)).astype(float)
+
+        # Trois premiers arbres : même résultat qu'une forêt scikit-learn réduite à ces arbres
+        trois = compacter_foret(exporter_foret(model), n_estimators=3)
+        model.estimators_ = model.estimators_[:3]
+        model.n_estimators = 3
+        self.assertEqual(trois.n_estimators, 3)
+        self.assertEqual(trois.predict_proba(X.tolist()), model.predict_proba(X).tolist())
+
+        # Profondeur 2 : au plus 7 nœuds par arbre
+        tronquee = exporter_foret(model, max_depth=2)
+        self.assertLessEqual(tronquee.n_nodes, 7 * 3)
+        self.assertEqual(len(tronquee.predict(X.tolist())), 50)
+
+
+class ServeurModele(http.server.ThreadingHTTPServer):
+    """Serveur HTTP local qui sert `contenu` avec un ETag et répond 304 aux requêtes conditionnelles"""
+
+    def __init__(self, contenu):
+        self.contenu = contenu
+        self.requetes = []
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(handler):
+                etag = '"%s"' % hashlib.sha256(self.contenu).hexdigest()[:8]
+                self.requetes.append(handler.headers.get('If-None-Match'))
+                if handler.headers.get('If-None-Match') == etag:
+                    handler.send_response(304)
+                    handler.end_headers()
+                    return
+                handler.send_response(200)
+                handler.send_header('ETag', etag)
+                handler.send_header('Content-Length', str(len(self.contenu)))
+                handler.end_headers()
+                handler.wfile.write(self.contenu)
+
+            def log_message(handler, *args):
+                pass
+
+        super().__init__(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server_address[1]}/model.forest'
+
+
+class DownloadCacheTests(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.contenu = exporter_foret(entrainer_petit_modele()).to_bytes()
+        self.serveur = ServeurModele(self.contenu)
+        threading.Thread(target=self.serveur.serve_forever, daemon=True).start()
+        self.addCleanup(self.serveur.server_close)
+        self.addCleanup(self.serveur.shutdown)
+
+    def test_hit_revalidation_et_miss(self):
+        cache = DownloadCache(self.tmpdir.name, max_age=60, chunk_size=1024)
+        chemin, empreinte = cache.fetch(self.serveur.url)
+        self.assertEqual(chemin.read_bytes(), self.contenu)
+        self.assertEqual(empreinte, hashlib.sha256(self.contenu).hexdigest())
+
+        # Invocation voisine : aucune requête réseau pendant max_age
+        voisin = DownloadCache(self.tmpdir.name, max_age=60)
+        self.assertEqual(voisin.fetch(self.serveur.url)[0], chemin)
+        self.assertEqual((voisin.last_status, len(self.serveur.requetes)), ('hit', 1))
+
+        # Entrée expirée : requête conditionnelle, 304
+        expire = DownloadCache(self.tmpdir.name, max_age=0)
+        expire.fetch(self.serveur.url)
+        self.assertEqual(expire.last_status, 'revalidated')
+        self.assertIsNotNone(self.serveur.requetes[-1])
+
+        # Nouveau contenu : nouveau fichier sous sa nouvelle empreinte, l'ancien est supprimé
+        self.serveur.contenu = exporter_foret(entrainer_petit_modele(seed=1)).to_bytes()
+        nouveau, _ = expire.fetch(self.serveur.url)
+        self.assertEqual(expire.last_status, 'miss')
+        self.assertEqual(nouveau.read_bytes(), self.serveur.contenu)
+        self.assertFalse(chemin.exists())
+        self.assertIsNotNone(expire.stats()['last_download_ms'])
+
+    def test_source_injoignable(self):
+        cache = DownloadCache(self.tmpdir.name, max_age=0)
+        chemin, _ = cache.fetch(self.serveur.url)
+        self.serveur.shutdown()
+        self.serveur.server_close()
+
+        self.assertEqual(cache.fetch(self.serveur.url, timeout=1)[0], chemin)
+        self.assertEqual(cache.last_status, 'stale')
+        with self.assertRaises(OSError):
+            DownloadCache(Path(self.tmpdir.name) / 'vide').fetch(self.serveur.url, timeout=1)
+
+    def test_registre_par_url(self):
+        registry = ModelRegistry(url=self.serveur.url, loader=charger_foret,
+                                 cache=DownloadCache(self.tmpdir.name, max_age=60))
+        self.assertEqual(registry.version, None)
+        registry.get_model()
+
+        info = registry.info()
+        self.assertEqual(info['version'], hashlib.sha256(self.contenu).hexdigest()[:12])
+        self.assertEqual(info['download_cache']['last_status'], 'miss')
+
+
+class EmbeddedForestTests(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.dossier = Path(self.tmpdir.name)
+        self.model = entrainer_petit_modele()
+        joblib.dump(self.model, self.dossier / 'model.pkl')
+
+    def test_embarque_contre_url(self):
+        foret = exporter_foret(self.model)
+        artefact = self.dossier / 'model.forest.gz'
+        artefact.write_bytes(compresser_foret(foret))
+        self.assertEqual(compresser_foret(foret), artefact.read_bytes())
+
+        # Ancien chemin : téléchargement depuis un serveur de fichiers local
+        serveur = ServeurModele(foret.to_bytes())
+        threading.Thread(target=serveur.serve_forever, daemon=True).start()
+        self.addCleanup(serveur.server_close)
+        self.addCleanup(serveur.shutdown)
+        par_url = ModelRegistry(url=serveur.url, loader=charger_foret)
+
+        # Nouveau chemin : artefact embarqué, décompressé à la première prédiction
+        with mock.patch.object(flat_forest, 'EMBEDDED_FOREST_PATH', artefact), \
+                mock.patch.dict('os.environ', {'FOREST_URL': '', 'FOREST_PATH': ''}):
+            embarque = flat_forest.registre_foret()
+        self.assertEqual(embarque.source, str(artefact))
+        self.assertFalse(embarque.is_loaded)
+
+        X = np.random.RandomState(7).randint(0, 180, (100, 8)).astype(float).tolist()
+        self.assertEqual(embarque.get_model().predict(X), par_url.get_model().predict(X))
+        self.assertEqual(len(serveur.requetes), 1)
+
+    def test_budget_de_taille(self):
+        sortie = self.dossier / 'model.forest.gz'
+        options = {'model': str(self.dossier / 'model.pkl'), 'output': str(sortie), 'compress': True,
+                   'stdout': mock.MagicMock()}
+
+        with self.assertRaises(CommandError):
+            call_command('export_forest', max_size_kb=0.01, **options)
+        self.assertFalse(sortie.exists())
+
+        call_command('export_forest', compact=True, max_size_kb=1024, **options)
+        foret = ModelRegistry(path=sortie).get_model()
+        self.assertEqual(foret.threshold.typecode, 'f')
+
+
+class SurgeModelExportTests(TestCase):
+
+    def test_parite_de_l_evaluateur_exporte(self):
+        import surge_app
+
+        model = entrainer_petit_modele(n_estimators=6)
+        mappings = {'feature_order': views.FEATURE_ORDER, 'categories': views.MAPPINGS}
+        blob = json.loads(json.dumps(surge_app.exporter_modele_js(exporter_foret(model), mappings, views.conseils)))
+        X = np.random.RandomState(8).randint(0, 180, (200, 8)).astype(float)
+
+        evaluateur = surge_app.EvaluateurBlob(blob)
+        self.assertEqual([evaluateur.predict_row(ligne) for ligne in X.tolist()], model.predict(X).tolist())
+        self.assertEqual(surge_app.verifier_parite(blob, exporter_foret(model), X.tolist()), 200)
+
+        # Un seuil altéré dans le blob est détecté
+        feature = array('h', base64.b64decode(blob['arrays']['feature']))
+        seuils = array('f', base64.b64decode(blob['arrays']['threshold']))
+        seuils[next(noeud for noeud, f in enumerate(feature) if f != -1)] += 50
+        blob['arrays']['threshold'] = base64.b64encode(seuils.tobytes()).decode('ascii')
+        with self.assertRaises(ValueError):
+            surge_app.verifier_parite(blob, exporter_foret(model), X.tolist())
+
+
+class ForestCodegenTests(TestCase):
+
+    def test_parite_du_code_genere(self):
+        model = entrainer_petit_modele(n_estimators=8)
+        X = np.random.RandomState(4).randint(0, 180, (300, 8)).astype(float)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source = Path(tmpdir) / 'foret.py'
+            source.write_text(generer_source(exporter_foret(model)), encoding='utf-8')
+            compile_ = source.with_suffix('.pyc')
+            py_compile.compile(str(source), cfile=str(compile_), doraise=True)
+
+            # Le registre choisit le loader selon l'extension : source et byte-code
+            for chemin in (source, compile_):
+                code = ModelRegistry(path=chemin).get_model()
+                self.assertEqual(code.predict(X.tolist()), model.predict(X).tolist())
+                self.assertEqual(code.predict_proba(X.tolist()), model.predict_proba(X).tolist())
+
+    def test_prediction_unitaire_par_le_code_genere(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            chemin = Path(tmpdir) / 'foret.py'
+            chemin.write_text(generer_source(exporter_foret(entrainer_petit_modele())), encoding='utf-8')
+            registry = ModelRegistry(path=chemin)
+
+            with mock.patch.object(views, 'risk_model', registry), \
+                    mock.patch.object(views, 'prediction_cache', PredictionCache(max_size=0)):
+                resultat = views.effectuer_prediction(ENREGISTREMENT)
+
+        attendu = registry.get_model().predict_row(views.encoder_entree(ENREGISTREMENT))
+        self.assertEqual(resultat['profil_risque'], attendu)
+
+
+class KeywordAutomatonTests(unittest.TestCase):
+
+    def test_toutes_les_occurrences(self):
+        rng = np.random.RandomState(7)
+        alphabet = list('abcé ')
+        motifs = sorted({''.join(rng.choice(alphabet, rng.randint(1, 5))) for _ in range(60)} - {''})
+        automate = AutomateMotsCles()
+        automate.ajouter_liste('motif', motifs)
+
+        for _ in range(200):
+            texte = ''.join(rng.choice(alphabet, rng.randint(0, 40)))
+            attendu = sorted((i, motif) for motif in motifs for i in range(len(texte)) if texte.startswith(motif, i))
+            self.assertEqual(sorted((c.position, c.motif) for c in automate.rechercher(texte)), attendu)
+
+    def test_ajout_apres_recherche(self):
+        automate = AutomateMotsCles()
+        automate.ajouter_table('sujet', {'douleur': ['mal', 'douleur']})
+        self.assertEqual(etiquettes(automate.rechercher("j'ai mal"), 'sujet'), {'douleur'})
+
+        automate.ajouter('mal au dos', 'localisation', 'dos')
+        correspondances = automate.rechercher("très mal au dos")
+        self.assertEqual([(c.categorie, c.position) for c in correspondances], [('sujet', 5), ('localisation', 5)])
+
+    def test_premieres_recherches_concurrentes(self):
+        automate = AutomateMotsCles()
+        automate.ajouter_table('sujet', {'douleur': ['mal', 'douleur'], 'dos': ['mal au dos']})
+        construire = automate._construire
+
+        def lente():
+            time.sleep(0.05)
+            construire()
+
+        depart = threading.Barrier(8)
+        resultats = []
+
+        def chercher():
+            depart.wait()
+            resultats.append([tuple(c) for c in automate.rechercher("très mal au dos et douleur")])
+
+        with mock.patch.object(automate, '_construire', side_effect=lente) as appel:
+            fils = [threading.Thread(target=chercher) for _ in range(8)]
+            for fil in fils:
+                fil.start()
+            for fil in fils:
+                fil.join()
+        self.assertEqual(appel.call_count, 1)
+        self.assertEqual(len(resultats), 8)
+        self.assertTrue(all(resultat == resultats[0] for resultat in resultats))
+        self.assertEqual(len(resultats[0]), 3)
+
+    def test_construit_avant_la_premiere_requete(self):
+        self.assertTrue(NLPProcessor().automate._construit)
+        self.assertTrue(GrossesseKnowledgeBase().automate._construit)
+
+
+class NLPProcessorTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.nlp = NLPProcessor()
+        cls.kb = GrossesseKnowledgeBase()
+
+    def test_analyseurs(self):
+        nlp = self.nlp
+        self.assertEqual(nlp.detect_intention("Bonjour !"), 'salutation')
+        self.assertEqual(nlp.detect_intention("J'ai des saignements"), 'urgence')
+        self.assertEqual(nlp.detect_intention("Je voudrais une évaluation"), 'evaluation_risque')
+        self.assertEqual(nlp.analyze_sentiment("Je suis inquiète et j'ai peur, très peur"), 'negatif')
+        self.assertEqual(nlp.analyze_sentiment("Tout va bien, je suis heureuse"), 'positif')
+        # Le dernier symptôme de la table présent l'emporte, comme avant
+        self.assertEqual(nlp.extract_medical_info("nausées et fièvre, mal au dos"),
+                         {'symptome': 'fièvre', 'localisation': 'dos'})
+        self.assertTrue(nlp.is_emergency("J'ai perdu du liquide"))
+        self.assertFalse(nlp.is_emergency("Tout va bien"))
+        self.assertEqual(nlp.find_faq_match("Puis-je boire du café ?"), nlp.faq['café'])
+
+    def test_une_seule_passe_par_message(self):
+        with mock.patch.object(self.nlp.automate, 'rechercher', wraps=self.nlp.automate.rechercher) as rechercher:
+            resultat = dict(self.nlp.process_message("J'ai mal au ventre et des nausées, je suis inquiète"))
+        self.assertEqual(rechercher.call_count, 1)
+        self.assertEqual(resultat['medical_info'], {'symptome': 'douleurs', 'localisation': 'ventre'})
+        self.assertEqual(resultat['intention'], 'urgence')
+        self.assertEqual(resultat['follow_up_questions'], [])
+
+    def test_message_normalise_une_fois(self):
+        message = NormalizedMessage("Fièvre ÉLEVÉE à 20 semaines, fièvre !")
+        self.assertEqual(message.lower, "fièvre élevée à 20 semaines, fièvre !")
+        self.assertEqual(message.folded, "fievre elevee a 20 semaines, fievre !")
+        self.assertEqual(message.tokens, ('fièvre', 'élevée', 'à', '20', 'semaines', 'fièvre'))
+        self.assertEqual(message.token_set, {'fièvre', 'élevée', 'à', '20', 'semaines'})
+        self.assertIs(self.nlp.normalize(message), message)
+
+        # Mots-clés et informations calculés au premier analyseur, relus par les suivants
+        with mock.patch.object(self.nlp.automate, 'rechercher', wraps=self.nlp.automate.rechercher) as rechercher, \
+                mock.patch('chatbot.nlp_processor.re.search', wraps=re.search) as recherche_motif:
+            self.assertTrue(self.nlp.is_emergency(message))
+            self.assertEqual(self.nlp.detect_intention(message), 'urgence')
+            self.assertEqual(self.nlp.extract_info(message), {'semaines': 20, 'temperature': 20})
+            self.assertEqual(self.nlp.extract_pregnancy_stage(message), 'deuxieme_trimestre')
+        self.assertEqual(rechercher.call_count, 1)
+        self.assertEqual(recherche_motif.call_count, len(self.nlp.patterns))
+
+    def test_analyse_paresseuse(self):
+        nlp = NLPProcessor()
+        with mock.patch.object(nlp.faq_index, 'rechercher') as recherche_approchee:
+            analyse = nlp.process_message("Bonjour, je suis à 20 semaines")
+            self.assertEqual(analyse.computed(), {})
+            self.assertEqual(analyse['intention'], 'salutation')
+            self.assertEqual(analyse.get('follow_up_questions'), [])
+            recherche_approchee.assert_not_called()
+            self.assertEqual(set(analyse.computed()), {'keywords', 'intention', 'follow_up_questions'})
+
+            # Le stade dépend des informations extraites, calculées une fois et comptées à part
+            self.assertEqual(analyse['pregnancy_stage'], 'deuxieme_trimestre')
+            self.assertEqual(analyse['extracted_info'], {'semaines': 20, 'temperature': 20})
+
+        self.assertEqual(list(analyse), list(MessageAnalysis.KEYS))
+        self.assertEqual(nlp.timing_stats()['extracted_info']['calls'], 1)
+        self.assertEqual(set(nlp.timing_stats()), set(analyse.computed()))
+        with self.assertRaises(KeyError):
+            analyse['inconnu']
+
+    def test_chatbot_urgence_sans_analyse_couteuse(self):
+        bot = IntelligentGrossesseChatbot()
+        with mock.patch.object(bot.nlp_processor.faq_index, 'rechercher') as recherche_approchee:
+            reponse = bot.process_message("J'ai perdu du liquide et beaucoup de sang")
+        recherche_approchee.assert_not_called()
+        self.assertTrue(reponse['is_emergency'])
+        self.assertIn('🚨', reponse['response'])
+
+        bot.process_message("Merci beaucoup")
+        bot.process_message("Puis-je boire du café ?")
+        stats = bot.stats()
+        self.assertEqual(set(stats['intentions']), {'urgence', 'remerciement', 'question_generale'})
+        self.assertNotIn('faq_match', stats['intentions']['urgence']['fields'])
+        self.assertNotIn('medical_info', stats['intentions']['remerciement']['fields'])
+        self.assertEqual(stats['intentions']['question_generale']['fields']['faq_match'], 1)
+        self.assertEqual(stats['fields']['keywords']['calls'], 3)
+
+    def test_faq_approximative(self):
+        nlp = self.nlp
+        self.assertEqual(nlp.find_faq_match("Bonjour, je voulais savoir si je peux prendre un cafée le matin ?"),
+                         nlp.faq['café'])
+        self.assertEqual(nlp.find_faq_match("quand faire l'échografie ?"), nlp.faq['échographie'])
+        self.assertEqual(nlp.find_faq_match("Combien dure le congé maternitée ?"), nlp.faq['congé maternité'])
+        self.assertEqual(nlp.find_faq_match("un test de grosesse"), nlp.faq['test grossesse'])
+        self.assertIsNone(nlp.find_faq_match("Je me sens bien aujourd'hui"))
+
+    def test_sujet_de_la_base_de_connaissances(self):
+        self.assertEqual(self.kb.find_best_match("Que manger le soir ?"), 'alimentation')
+        self.assertEqual(self.kb.find_best_match("Mon bébé doit-il bouger ?"), 'exercice')
+        self.assertEqual(self.kb.find_best_match("Mon bébé bouge beaucoup"), 'bébé')
+        # Mot mal orthographié au milieu du message
+        self.assertEqual(self.kb.find_best_match("depuis hier je suis très fatigé le soir"), 'fatigue')
+        self.assertEqual(self.kb.find_best_match("j'ai des nosées le matin"), 'nausées')
+        self.assertIsNone(self.kb.find_best_match("xyz"))
+
+
+class TrigramIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.index = IndexTrigrammes()
+        self.index.ajouter_table({
+            'grossesse': ['test grossesse'],
+            'voyage': ['voyage', 'avion'],
+            'cafe': ['cafe'],
+            'douleur': ['mal'],
+        })
+
+    def test_mot_mal_orthographie_dans_un_long_message(self):
+        correspondance = self.index.meilleure("bonjour je voudrais voyajer en train la semaine prochaine si possible")
+        self.assertEqual((correspondance.etiquette, correspondance.cle), ('voyage', 'voyage'))
+        self.assertGreaterEqual(correspondance.score, self.index.seuil)
+
+        # Clé de plusieurs mots, avec un mot intercalé dans le message
+        self.assertEqual(self.index.meilleure("un tets de grossesse positif").cle, 'test grossesse')
+        # À score égal, ordre d'indexation
+        self.assertEqual([c.cle for c in self.index.rechercher("cafe et voyage", n=5)], ['voyage', 'cafe'])
+
+    def test_rejets(self):
+        # Clé trop courte : trouvée seulement par correspondance exacte (automate)
+        self.assertEqual(len(self.index), 4)
+        self.assertIsNone(self.index.meilleure("j'ai mai"))
+        # Première lettre différente ou mots trop éloignés
+        self.assertIsNone(self.index.meilleure("pendant la nuit"))
+        self.assertIsNone(self.index.meilleure(""))
+        self.assertEqual(IndexTrigrammes().rechercher("voyage"), [])
+
+    def test_premieres_recherches_concurrentes(self):
+        construire = self.index._construire
+
+        def lente():
+            time.sleep(0.05)
+            construire()
+
+        depart = threading.Barrier(8)
+        resultats = []
+
+        def chercher():
+            depart.wait()
+            resultats.append(self.index.rechercher("je voudrais voyajer en avion", n=5))
+
+        with mock.patch.object(self.index, '_construire', side_effect=lente) as appel:
+            fils = [threading.Thread(target=chercher) for _ in range(8)]
+            for fil in fils:
+                fil.start()
+            for fil in fils:
+                fil.join()
+        self.assertEqual(appel.call_count, 1)
+        self.assertEqual(len(resultats), 8)
+        self.assertTrue(resultats[0] and all(resultat == resultats[0] for resultat in resultats))
+
+    def test_construit_avant_la_premiere_requete(self):
+        self.assertTrue(NLPProcessor().faq_index._construit)
+        self.assertTrue(GrossesseKnowledgeBase().index._construit)
+
+    def test_grande_faq(self):
+        rng = np.random.RandomState(3)
+        lettres = np.array(list('bcdfglmnprstv'))
+        voyelles = np.array(list('aeiou'))
+        index = IndexTrigrammes()
+        for _ in range(3000):
+            index.ajouter(''.join(lettres[rng.randint(13)] + voyelles[rng.randint(5)] for _ in range(4)), 'bruit')
+        index.ajouter('echographie', 'echographie')
+
+        correspondance = index.meilleure("quand faut il faire la premiere echografie du bebe")
+        self.assertEqual(correspondance.etiquette, 'echographie')
+
+
+class KnowledgePassageTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.kb = GrossesseKnowledgeBase()
+
+    def chemins(self, question):
+        return [passage.chemin[-1] for passage, _ in self.kb.search_passages(question)]
+
+    def test_racinisation(self):
+        self.assertEqual(raciniser('nausees'), raciniser('nausee'))
+        self.assertEqual(raciniser('vomissements'), raciniser('vomir'))
+        self.assertEqual(raciniser('accouchement'), raciniser('accoucher'))
+        self.assertEqual(raciniser('chevaux'), 'cheval')
+        self.assertEqual(raciniser('ski'), 'ski')
+        self.assertEqual(termes("Les échographies de la Grossesse"), ['echograph', 'grossess'])
+
+    def test_feuilles_indexees(self):
+        passages = passages_de({'a': {'phrase': "Texte.", 'liste_x': ["un", "deux"]}}, {'liste_x': "Titre"})
+        self.assertEqual(passages, [Passage(('a', 'phrase'), "Texte."), Passage(('a', 'liste_x'), "Titre : un ; deux")])
+        self.assertEqual(len(self.kb.passages), len(passages_de(self.kb.knowledge)))
+
+    def test_contenu_hors_sujets(self):
+        # Feuilles qu'aucun des sujets de find_best_match ne permettait d'atteindre
+        self.assertEqual(self.chemins("J'ai les jambes lourdes le soir")[0], 'jambes_lourdes')
+        self.assertEqual(self.chemins("Que mettre dans la valise pour la maternité ?")[0], 'valise_maternite')
+        self.assertEqual(self.chemins("Combien d'échographies faut-il faire ?"), ['echographies'])
+        self.assertEqual(self.chemins("J'ai des brûlures d'estomac"), ['reflux'])
+        self.assertIn('aliments_eviter', self.chemins("Est-ce que je peux manger des sushis ?"))
+
+    def test_question_sans_terme_specifique(self):
+        self.assertEqual(self.kb.search_passages("Bonjour"), [])
+        self.assertEqual(self.kb.search_passages("Que manger pendant la grossesse ?"), [])
+
+    def test_chatbot_repond_avec_les_passages(self):
+        bot = IntelligentGrossesseChatbot()
+        reponse = bot.handle_general_question(bot.nlp_processor.process_message("Que mettre dans la valise de maternité ?"))
+        self.assertIn("Valise de maternité : Documents", reponse)
+        # Sans passage pertinent, le sujet de la base de connaissances répond toujours
+        reponse = bot.handle_general_question(bot.nlp_processor.process_message("Que manger pendant la grossesse ?"))
+        self.assertEqual(reponse, bot.knowledge_base.get_response('alimentation', "que manger pendant la grossesse ?"))
+
+    def test_index_sur_disque(self):
+        passages = passages_de(self.kb.knowledge, self.kb.titles)
+        index = IndexPassages.construire(passages)
+        with tempfile.TemporaryDirectory() as dossier:
+            chemin = Path(dossier) / 'knowledge.index'
+            index.sauvegarder(chemin)
+            charge = IndexPassages.charger(chemin, index.empreinte)
+            self.assertEqual(charge.passages, passages)
+            self.assertEqual(charge.vocabulaire, index.vocabulaire)
+            for question in ("jambes lourdes", "acide folique", "prise de sang"):
+                self.assertEqual(charge.rechercher(question), index.rechercher(question))
+
+            # Base de connaissances modifiée : le fichier est ignoré et l'index reconstruit
+            self.assertIsNone(IndexPassages.charger(chemin, 'autre empreinte'))
+            self.assertIsNone(IndexPassages.charger(Path(dossier) / 'absent.index'))
+            with mock.patch.object(IndexPassages, 'construire', wraps=IndexPassages.construire) as construire:
+                GrossesseKnowledgeBase(index_path=chemin)
+            construire.assert_not_called()
+
+    def test_index_tronque(self):
+        passages = passages_de(self.kb.knowledge, self.kb.titles)
+        index = IndexPassages.construire(passages)
+        with tempfile.TemporaryDirectory() as dossier:
+            chemin = Path(dossier) / 'knowledge.index'
+            index.sauvegarder(chemin)
+            contenu = chemin.read_bytes()
+            tronque = Path(dossier) / 'tronque.index'
+            # Dans la taille de l'en-tête, dans le JSON, puis dans les tableaux
+            for taille in (10, 40, len(contenu) - 16):
+                tronque.write_bytes(contenu[:taille])
+                self.assertIsNone(IndexPassages.charger(tronque, index.empreinte), taille)
+
+            with mock.patch.object(IndexPassages, 'construire', wraps=IndexPassages.construire) as construire:
+                kb = GrossesseKnowledgeBase(index_path=tronque)
+            construire.assert_called_once()
+            self.assertEqual(kb.get_response('alimentation', "que manger ?"), self.kb.get_response('alimentation', "que manger ?"))
+
+    def test_listes_tronquees_par_impact(self):
+        passages = [Passage(('bruit', str(i)), "fatigue " + "mot " * i) for i in range(50)]
+        passages += [Passage(('rare',), "fatigue et insomnie")]
+        index = IndexPassages.construire(passages, max_postings=5)
+        resultats = index.rechercher("fatigue insomnie", n=2)
+        self.assertEqual(resultats[0][0].chemin, ('rare',))
+        # Seuls les 5 passages les plus courts (meilleur poids) sont lus pour 'fatigue'
+        self.assertEqual(len(index.rechercher("fatigue", n=10, frequence_max=1.0)), 5)
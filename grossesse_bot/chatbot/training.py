@@ -0,0 +1,301 @@
+"""
+Pipeline d'entraînement du modèle de risque (remplace chatbot.ipynb)
+Chargement typé par colonnes de donnees_grossesse.csv, encodage des catégories
+dans l'ordre trié de LabelEncoder, entraînement du RandomForest sur tous les cœurs,
+puis mesure de l'exactitude et de la latence d'inférence par ligne.
+"""
+
+import csv
+import hashlib
+import json
+import struct
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Ordre des caractéristiques attendu par le modèle
+FEATURE_ORDER = ['age', 'mois_grossesse', 'poids_kg', 'taille_cm', 'activité', 'régime', 'antécédents', 'symptôme']
+COLONNES_NUMERIQUES = {'age': np.int64, 'mois_grossesse': np.int64, 'poids_kg': np.float64, 'taille_cm': np.float64}
+COLONNES_CATEGORIELLES = ['activité', 'régime', 'antécédents', 'symptôme']
+CIBLE = 'profil_risque'
+
+# Cache binaire en colonnes, reconstruit quand l'empreinte du CSV change
+MAGIC_CACHE = b'GBCOLONS'
+FORMAT_CACHE = 1
+ALIGNEMENT = 8
+
+# Hyperparamètres du notebook d'origine
+PARAMETRES_FORET = {'n_estimators': 200, 'max_depth': 10, 'class_weight': 'balanced', 'random_state': 42}
+
+
+class Colonnes:
+    """Jeu de données en colonnes : tableaux numériques typés, codes catégoriels et leur dictionnaire"""
+
+    def __init__(self, numeriques: Dict[str, np.ndarray], codes: Dict[str, np.ndarray],
+                 categories: Dict[str, List[str]], cible: np.ndarray):
+        self.numeriques = numeriques
+        self.codes = codes
+        self.categories = categories
+        self.cible = cible
+
+    def __len__(self) -> int:
+        return len(self.cible)
+
+    @property
+    def mappings(self) -> Dict[str, Dict[str, int]]:
+        return {colonne: {valeur: code for code, valeur in enumerate(valeurs)}
+                for colonne, valeurs in self.categories.items()}
+
+    def matrice(self) -> np.ndarray:
+        """Matrice des caractéristiques dans FEATURE_ORDER"""
+        return np.column_stack([
+            self.numeriques[colonne] if colonne in self.numeriques else self.codes[colonne]
+            for colonne in FEATURE_ORDER
+        ]).astype(np.float64)
+
+
+def lire_csv_colonnes(chemin) -> Colonnes:
+    """Lit le CSV colonne par colonne, sans pandas ; catégories codées dans l'ordre trié (LabelEncoder)"""
+    with open(chemin, newline='', encoding='utf-8') as fichier:
+        lecteur = csv.reader(fichier)
+        entete = next(lecteur)
+        valeurs = list(zip(*lecteur))
+
+    if not valeurs:
+        raise ValueError(f"Aucune ligne dans {chemin}")
+
+    colonnes = dict(zip(entete, valeurs))
+    manquantes = [c for c in FEATURE_ORDER + [CIBLE] if c not in colonnes]
+    if manquantes:
+        raise ValueError(f"Colonnes manquantes dans {chemin} : {', '.join(manquantes)}")
+
+    numeriques = {colonne: np.asarray(colonnes[colonne], dtype=np.float64).astype(dtype)
+                  for colonne, dtype in COLONNES_NUMERIQUES.items()}
+
+    codes = {}
+    categories = {}
+    for colonne in COLONNES_CATEGORIELLES:
+        vocabulaire, code = np.unique(np.asarray(colonnes[colonne]), return_inverse=True)
+        categories[colonne] = vocabulaire.tolist()
+        codes[colonne] = code.astype(np.uint8 if len(vocabulaire) <= 256 else np.int32)
+
+    return Colonnes(numeriques, codes, categories, np.asarray(colonnes[CIBLE]))
+
+
+def chemin_cache(chemin) -> Path:
+    return Path(chemin).with_suffix('.colonnes')
+
+
+def empreinte_fichier(chemin) -> str:
+    sha = hashlib.sha256()
+    with open(chemin, 'rb') as fichier:
+        for morceau in iter(lambda: fichier.read(1 << 20), b''):
+            sha.update(morceau)
+    return sha.hexdigest()
+
+
+def ecrire_cache(colonnes: Colonnes, chemin, empreinte: str):
+    """Sérialise les colonnes : en-tête JSON puis tableaux de largeur fixe alignés sur 8 octets"""
+    vocabulaire_cible, codes_cible = np.unique(colonnes.cible, return_inverse=True)
+    tableaux = [(nom, tableau, None) for nom, tableau in colonnes.numeriques.items()]
+    tableaux += [(nom, colonnes.codes[nom], colonnes.categories[nom]) for nom in COLONNES_CATEGORIELLES]
+    tableaux.append((CIBLE, codes_cible.astype(np.uint8), vocabulaire_cible.tolist()))
+
+    descriptions = []
+    position = 0
+    for nom, tableau, categories in tableaux:
+        descriptions.append({'name': nom, 'dtype': tableau.dtype.newbyteorder('<').str, 'offset': position,
+                             'length': len(tableau), 'categories': categories})
+        position += -(-tableau.nbytes // ALIGNEMENT) * ALIGNEMENT
+
+    entete = json.dumps({
+        'format': FORMAT_CACHE,
+        'source_sha256': empreinte,
+        'n_rows': len(colonnes),
+        'columns': descriptions,
+    }, ensure_ascii=False).encode('utf-8')
+    debut = len(MAGIC_CACHE) + 4 + len(entete)
+    entete += b' ' * (-debut % ALIGNEMENT)
+
+    morceaux = [MAGIC_CACHE, struct.pack('<I', len(entete)), entete]
+    for (_, tableau, _), description in zip(tableaux, descriptions):
+        donnees = tableau.astype(description['dtype'], copy=False).tobytes()
+        morceaux.append(donnees + b'\0' * (-len(donnees) % ALIGNEMENT))
+
+    publier(Path(chemin), b''.join(morceaux))
+
+
+def lire_cache(chemin, empreinte: str) -> Optional[Colonnes]:
+    """Projette le cache en mémoire (memmap, sans copie) ; None s'il est absent, illisible ou périmé"""
+    try:
+        donnees = np.memmap(chemin, dtype=np.uint8, mode='r')
+    except (OSError, ValueError):
+        return None
+
+    # Fichier tronqué ou corrompu (écriture interrompue avant publier, copie partielle...) : reconstruit
+    try:
+        if bytes(donnees[:len(MAGIC_CACHE)]) != MAGIC_CACHE:
+            return None
+        position = len(MAGIC_CACHE)
+        (taille_entete,) = struct.unpack('<I', bytes(donnees[position:position + 4]))
+        position += 4
+        entete = json.loads(bytes(donnees[position:position + taille_entete]).decode('utf-8'))
+        position += taille_entete
+
+        if entete['format'] != FORMAT_CACHE or entete['source_sha256'] != empreinte:
+            return None
+
+        tableaux = {}
+        for description in entete['columns']:
+            tableau = np.frombuffer(donnees, dtype=np.dtype(description['dtype']), count=description['length'],
+                                    offset=position + description['offset'])
+            tableaux[description['name']] = (tableau, description['categories'])
+
+        cible, classes = tableaux[CIBLE]
+        return Colonnes(
+            numeriques={nom: tableaux[nom][0] for nom in COLONNES_NUMERIQUES},
+            codes={nom: tableaux[nom][0] for nom in COLONNES_CATEGORIELLES},
+            categories={nom: tableaux[nom][1] for nom in COLONNES_CATEGORIELLES},
+            cible=np.asarray(classes)[cible],
+        )
+    except (struct.error, ValueError, KeyError, TypeError, IndexError):
+        return None
+
+
+def charger_colonnes(chemin, cache: bool = True) -> Colonnes:
+    """Charge le CSV via son cache en colonnes (.colonnes à côté), reconstruit si le CSV a changé"""
+    if not cache:
+        return lire_csv_colonnes(chemin)
+
+    empreinte = empreinte_fichier(chemin)
+    colonnes = lire_cache(chemin_cache(chemin), empreinte)
+    if colonnes is not None:
+        return colonnes
+
+    colonnes = lire_csv_colonnes(chemin)
+    try:
+        ecrire_cache(colonnes, chemin_cache(chemin), empreinte)
+    except OSError as e:
+        # Répertoire en lecture seule (Vercel...) : on garde la lecture du CSV
+        print(f"⚠️ Cache en colonnes non écrit : {e}")
+    return colonnes
+
+
+def dedoublonner(X: np.ndarray, y: np.ndarray):
+    """Équivalent de DataFrame.drop_duplicates() : première occurrence conservée, ordre préservé"""
+    _, cibles = np.unique(y, return_inverse=True)
+    _, premiers = np.unique(np.column_stack([X, cibles]), axis=0, return_index=True)
+    premiers.sort()
+    return X[premiers], y[premiers]
+
+
+def decouper(colonnes: Colonnes):
+    """Découpage entraînement / test du notebook : 20 % de test, random_state=42, après dédoublonnage"""
+    from sklearn.model_selection import train_test_split
+
+    X, y = dedoublonner(colonnes.matrice(), colonnes.cible)
+    return train_test_split(X, y, test_size=0.2, random_state=42)
+
+
+def mesurer_latence(model: Any, X: np.ndarray, n: int = 200) -> Dict[str, float]:
+    """Latence d'une prédiction unitaire (p50/p99, ms) et coût par ligne d'un lot"""
+    echantillon = X[:n]
+    durees = []
+    for ligne in echantillon:
+        debut = time.perf_counter()
+        model.predict(ligne.reshape(1, -1))
+        durees.append(time.perf_counter() - debut)
+    durees.sort()
+
+    debut = time.perf_counter()
+    model.predict(echantillon)
+    par_ligne_lot = (time.perf_counter() - debut) / len(echantillon)
+
+    return {
+        'p50_ms': round(durees[len(durees) // 2] * 1000, 3),
+        'p99_ms': round(durees[min(len(durees) - 1, int(0.99 * len(durees)))] * 1000, 3),
+        'batch_per_row_ms': round(par_ligne_lot * 1000, 4),
+    }
+
+
+def entrainer(colonnes: Colonnes, n_jobs: int = -1, **parametres) -> Dict[str, Any]:
+    """Entraîne la forêt ; retourne le modèle et ses métadonnées (sans les écrire)"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score
+
+    X_train, X_test, y_train, y_test = decouper(colonnes)
+
+    parametres = {**PARAMETRES_FORET, **parametres}
+    model = RandomForestClassifier(n_jobs=n_jobs, **parametres)
+
+    debut = time.perf_counter()
+    model.fit(X_train, y_train)
+    duree = time.perf_counter() - debut
+
+    accuracy = accuracy_score(y_test, model.predict(X_test))
+
+    # En service, une prédiction unitaire ne doit pas répartir 200 arbres sur un pool de threads
+    model.n_jobs = None
+
+    return {
+        'model': model,
+        'metadata': {
+            'feature_order': FEATURE_ORDER,
+            'mappings': colonnes.mappings,
+            'classes': [str(classe) for classe in model.classes_],
+            'parameters': parametres,
+            'n_rows': len(colonnes),
+            'n_rows_deduplicated': len(X_train) + len(X_test),
+            'accuracy': round(float(accuracy), 4),
+            'training_time_s': round(duree, 3),
+            'latency': mesurer_latence(model, X_test),
+        },
+    }
+
+
+def encodeurs(mappings: Dict[str, Dict[str, int]]) -> Dict[str, Any]:
+    """LabelEncoder par colonne catégorielle, comme label_encoders.pkl du notebook"""
+    from sklearn.preprocessing import LabelEncoder
+
+    resultat = {}
+    for colonne, mapping in mappings.items():
+        encodeur = LabelEncoder()
+        encodeur.classes_ = np.asarray(sorted(mapping, key=mapping.get), dtype=object)
+        resultat[colonne] = encodeur
+    return resultat
+
+
+def generer_module_mappings(metadata: Dict[str, Any], source: str) -> str:
+    """Code source de chatbot/mappings.py à partir des métadonnées d'entraînement"""
+    noms = {'activité': 'MAPPING_ACTIVITE', 'régime': 'MAPPING_REGIME',
+            'antécédents': 'MAPPING_ANTECEDENT', 'symptôme': 'MAPPING_SYMPTOME'}
+
+    lignes = [
+        '"""',
+        'Encodage des caractéristiques attendu par le modèle de risque',
+        f'Généré par `python manage.py train_model` à partir de {source} : ne pas modifier',
+        '"""',
+        '',
+        f"FEATURE_ORDER = {metadata['feature_order']!r}",
+        '',
+    ]
+    for colonne, nom in noms.items():
+        lignes.append(f'{nom} = {{')
+        lignes.extend(f'    {valeur!r}: {code},' for valeur, code in metadata['mappings'][colonne].items())
+        lignes.append('}')
+        lignes.append('')
+
+    lignes.append('# Variables catégorielles par nom de colonne')
+    lignes.append('MAPPINGS = {')
+    lignes.extend(f'    {colonne!r}: {nom},' for colonne, nom in noms.items())
+    lignes.append('}')
+    return '\n'.join(lignes) + '\n'
+
+
+def publier(chemin: Path, contenu: bytes):
+    """Écrit à côté puis renomme : le registre ne lit jamais un fichier à moitié écrit"""
+    temporaire = chemin.with_name(chemin.name + '.tmp')
+    temporaire.write_bytes(contenu)
+    temporaire.replace(chemin)
@@ -0,0 +1,183 @@
+"""
+Index de trigrammes pour la recherche approximative (clés de FAQ, mots-clés, sujets)
+Chaque mot des clés est découpé en trigrammes de caractères (mot bordé d'espaces). Un index
+inversé trigramme -> mots donne, en un seul comptage numpy, la similarité (Dice) de chaque mot
+du message avec chaque mot indexé. Une clé est notée par la moyenne, sur ses mots, de la
+meilleure similarité trouvée dans le message. Seules les quelques meilleures candidates sont
+vérifiées avec difflib, sur les fenêtres de mots du message de même longueur que la clé.
+Un mot mal orthographié au milieu d'un long message est ainsi retrouvé, et le coût ne dépend
+presque plus du nombre de clés.
+Les textes sont attendus en minuscules et sans accents (NormalizedMessage.folded).
+"""
+
+import re
+import threading
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+MOT = re.compile(r"\w+")
+
+
+class CorrespondanceApprochee(NamedTuple):
+    etiquette: str
+    cle: str
+    score: float
+
+
+@lru_cache(maxsize=65536)
+def trigrammes(mot: str) -> FrozenSet[str]:
+    """Trigrammes d'un mot bordé d'espaces : 'cafe' -> {' ca', 'caf', 'afe', 'fe '} (mots fréquents en cache)"""
+    borde = f' {mot} '
+    return frozenset(borde[i:i + 3] for i in range(len(borde) - 2))
+
+
+class IndexTrigrammes:
+    """Index inversé trigramme -> mots des clés ; construire() une fois les clés ajoutées, sinon au premier rechercher()
+
+    seuil : ratio difflib minimal entre la clé et une fenêtre du message (comme le cutoff de
+    get_close_matches, mais mot à mot) ; candidats : clés vérifiées au plus par message ;
+    similarite_min : note minimale d'une clé (et part de ses trigrammes dans une fenêtre) pour
+    être vérifiée ; longueur_min : les clés plus courtes ne sont trouvées que par correspondance exacte.
+    """
+
+    def __init__(self, seuil: float = 0.75, candidats: int = 5, similarite_min: float = 0.25, longueur_min: int = 4):
+        self.seuil = seuil
+        self.candidats = candidats
+        self.similarite_min = similarite_min
+        self.longueur_min = longueur_min
+
+        self._cles: List[str] = []
+        self._mots: List[List[str]] = []
+        self._etiquettes: List[str] = []
+        self._trigrammes: List[FrozenSet[str]] = []
+        self._construit = False
+        self._verrou = threading.Lock()
+
+    def __len__(self):
+        return len(self._cles)
+
+    def ajouter(self, cle: str, etiquette: str):
+        """Indexe une clé (minuscules, sans accents) sous une étiquette"""
+        mots = MOT.findall(cle)
+        if len(' '.join(mots)) < self.longueur_min:
+            return
+        self._cles.append(' '.join(mots))
+        self._mots.append(mots)
+        self._etiquettes.append(etiquette)
+        self._trigrammes.append(frozenset().union(*(trigrammes(mot) for mot in mots)))
+        self._construit = False
+
+    def ajouter_table(self, table: Dict[str, Iterable[str]]):
+        """Table {étiquette: [clés]} : chaque clé est rapportée sous son étiquette"""
+        for etiquette, cles in table.items():
+            for cle in cles:
+                self.ajouter(cle, etiquette)
+
+    def ajouter_liste(self, cles: Iterable[str]):
+        """Liste de clés : chaque clé est sa propre étiquette"""
+        for cle in cles:
+            self.ajouter(cle, cle)
+
+    def construire(self):
+        """Calcule les tableaux de l'index ; sûr entre threads, un seul les calcule"""
+        with self._verrou:
+            if not self._construit:
+                self._construire()
+
+    def _construire(self):
+        # Vocabulaire des mots des clés, chacun une seule fois
+        vocabulaire: Dict[str, int] = {}
+        mots_des_cles = [[vocabulaire.setdefault(mot, len(vocabulaire)) for mot in mots] for mots in self._mots]
+
+        listes: Dict[str, List[int]] = {}
+        for mot, numero in vocabulaire.items():
+            for trigramme in trigrammes(mot):
+                listes.setdefault(trigramme, []).append(numero)
+        self._listes = {trigramme: np.asarray(numeros, dtype=np.int64) for trigramme, numeros in listes.items()}
+        self._tailles_mots = np.asarray([len(trigrammes(mot)) for mot in vocabulaire], dtype=np.float64)
+
+        # Mots de toutes les clés à la suite, avec leur clé : un bincount pondéré somme les notes par clé
+        self._mots_a_plat = np.asarray([numero for numeros in mots_des_cles for numero in numeros], dtype=np.int64)
+        self._cle_des_mots = np.asarray([cle for cle, numeros in enumerate(mots_des_cles) for _ in numeros], dtype=np.int64)
+        self._nombres_mots = np.asarray([len(numeros) for numeros in mots_des_cles], dtype=np.float64)
+        self._construit = True
+
+    def rechercher(self, texte: str, n: int = 1) -> List[CorrespondanceApprochee]:
+        """Au plus n clés proches d'une fenêtre du message, par score décroissant"""
+        if not self._construit:
+            self.construire()
+        mots = MOT.findall(texte)
+        if not mots or not self._cles:
+            return []
+        par_mot = [trigrammes(mot) for mot in mots]
+
+        # Trigrammes partagés par (mot distinct du message, mot indexé), en un seul bincount
+        distincts = list(dict.fromkeys(mots))
+        n_vocabulaire = len(self._tailles_mots)
+        listes, lignes = [], []
+        for i, mot in enumerate(distincts):
+            for trigramme in trigrammes(mot):
+                liste = self._listes.get(trigramme)
+                if liste is not None:
+                    listes.append(liste)
+                    lignes.append(i * n_vocabulaire)
+        if not listes:
+            return []
+        codes = np.concatenate(listes) + np.repeat(lignes, [len(liste) for liste in listes])
+        partages = np.bincount(codes, minlength=len(distincts) * n_vocabulaire)
+        partages = partages.reshape(len(distincts), n_vocabulaire)
+        tailles_message = np.asarray([len(trigrammes(mot)) for mot in distincts], dtype=np.float64)
+        dice = 2 * partages / (tailles_message[:, None] + self._tailles_mots[None, :])
+
+        # Note d'une clé : moyenne, sur ses mots, du mot du message le plus proche
+        meilleurs = dice.max(axis=0)
+        notes = np.bincount(self._cle_des_mots, weights=meilleurs[self._mots_a_plat],
+                            minlength=len(self._cles)) / self._nombres_mots
+
+        k = min(self.candidats, len(self._cles))
+        candidates = np.argpartition(-notes, k - 1)[:k]
+        # Ordre stable : à note égale, la première clé indexée d'abord
+        candidates = sorted((int(c) for c in candidates if notes[c] >= self.similarite_min),
+                            key=lambda c: (-notes[c], c))
+
+        verifiees = [(self._verifier(numero, mots, par_mot), numero) for numero in candidates]
+        verifiees = sorted((v for v in verifiees if v[0] >= self.seuil), key=lambda v: (-v[0], v[1]))
+        return [
+            CorrespondanceApprochee(self._etiquettes[numero], self._cles[numero], round(score, 3))
+            for score, numero in verifiees[:n]
+        ]
+
+    def meilleure(self, texte: str) -> Optional[CorrespondanceApprochee]:
+        correspondances = self.rechercher(texte, 1)
+        return correspondances[0] if correspondances else None
+
+    def _verifier(self, numero: int, mots: List[str], par_mot: List[FrozenSet[str]]) -> float:
+        """Meilleur ratio difflib entre la clé et les fenêtres de même nombre de mots (ou un de plus)"""
+        cle, trigrammes_cle = self._cles[numero], self._trigrammes[numero]
+        largeur = len(self._mots[numero])
+        partages_min = self.similarite_min * len(trigrammes_cle)
+        comparateur = None
+        meilleur = 0.0
+        # Un mot de plus pour une clé de plusieurs mots : 'test de grossesse' pour 'test grossesse'
+        for largeur_fenetre in (largeur, largeur + 1) if largeur > 1 else (largeur,):
+            for debut in range(max(1, len(mots) - largeur_fenetre + 1)):
+                # Fenêtres filtrées avant difflib : même première lettre (les fautes de frappe la
+                # respectent presque toujours) et assez de trigrammes partagés avec la clé
+                if mots[debut][0] != cle[0]:
+                    continue
+                fenetre = par_mot[debut] if largeur_fenetre == 1 else frozenset().union(*par_mot[debut:debut + largeur_fenetre])
+                if len(trigrammes_cle & fenetre) < partages_min:
+                    continue
+                if comparateur is None:
+                    comparateur = SequenceMatcher()
+                    comparateur.set_seq2(cle)
+                comparateur.set_seq1(' '.join(mots[debut:debut + largeur_fenetre]))
+                plancher = max(meilleur, self.seuil)
+                if comparateur.real_quick_ratio() >= plancher and comparateur.quick_ratio() >= plancher:
+                    meilleur = max(meilleur, comparateur.ratio())
+                    if meilleur == 1.0:
+                        return meilleur
+        return meilleur
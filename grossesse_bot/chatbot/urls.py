@@ -1,10 +1,15 @@
 from django.urls import path
-from .views import predire_risque,chatbot,chatbot_page
+from .views import predire_risque,predire_risque_lot,recharger_modele,sante,exporter_evaluations,statistiques_risque,chatbot,chatbot_page
 from . import views
 
 
 urlpatterns = [
     path('api/predire/', predire_risque),
+    path('api/predire/batch/', predire_risque_lot, name='predire_risque_lot'),
+    path('api/modele/recharger/', recharger_modele, name='recharger_modele'),
+    path('health/', sante, name='sante'),
+    path('api/statistiques/', statistiques_risque, name='statistiques_risque'),
+    path('api/evaluations/export/', exporter_evaluations, name='exporter_evaluations'),
     path('chatbot/api/', chatbot, name='chatbot'),
     path('chatbot/', chatbot_page, name='chatbot_page'),  # Page HTML
   
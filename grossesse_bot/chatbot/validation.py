@@ -0,0 +1,167 @@
+"""
+Validation rapide des entrées de /api/predire/
+Équivalent précompilé de GrossesseInputSerializer : mêmes conversions, mêmes bornes et mêmes
+messages d'erreur (lus sur les champs du serializer), sans instancier de serializer ni de
+Response DRF à chaque requête. Les variables catégorielles sont encodées au passage, via des
+tables indexées par la valeur normalisée une seule fois (casse et accents ignorés).
+"""
+
+import math
+import re
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from rest_framework import serializers
+from rest_framework.fields import empty
+
+from .mappings import FEATURE_ORDER, MAPPINGS
+from .serializers import GrossesseInputSerializer
+
+# Comme IntegerField : '30.0' est un entier valide, pas '30.5'
+_DECIMALE_NULLE = re.compile(r'\.0*\s*$')
+
+
+def normaliser(valeur: str) -> str:
+    """Minuscules, sans accents ni espaces autour : 'Modérée ' -> 'moderee'"""
+    decomposee = unicodedata.normalize('NFKD', valeur.strip().lower())
+    return ''.join(c for c in decomposee if not unicodedata.combining(c))
+
+
+def _tables(mappings: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+    tables = {}
+    for colonne, mapping in mappings.items():
+        table = {}
+        for valeur, code in mapping.items():
+            cle = normaliser(valeur)
+            if table.get(cle, code) != code:
+                raise ValueError(f"Modalités confondues une fois normalisées dans {colonne} : {cle}")
+            table[cle] = code
+        tables[colonne] = table
+    return tables
+
+
+# Encodage des variables catégorielles, par valeur normalisée
+TABLES = _tables(MAPPINGS)
+
+# Modalité canonique (clé de MAPPINGS) de chaque valeur normalisée : 'MODEREE ' -> 'modérée'
+CANONIQUES = {
+    colonne: {normaliser(valeur): valeur for valeur in mapping}
+    for colonne, mapping in MAPPINGS.items()
+}
+
+
+class ErreurCategorie(ValueError):
+    """Modalité inconnue pour une variable catégorielle"""
+
+
+def encoder_categorie(colonne: str, valeur: str) -> int:
+    try:
+        return TABLES[colonne][normaliser(valeur)]
+    except KeyError:
+        raise ErreurCategorie(f"Valeur invalide pour une variable catégorielle : {valeur.lower()!r}")
+
+
+def valeur_canonique(colonne: str, valeur: str) -> str:
+    """Orthographe de MAPPINGS pour une modalité acceptée par encoder_categorie ; inchangée si inconnue"""
+    return CANONIQUES[colonne].get(normaliser(valeur), valeur)
+
+
+def _message(champ, cle: str, **parametres) -> str:
+    return str(champ.error_messages[cle]).format(**parametres)
+
+
+def _compiler_champ(champ) -> Callable[[Any], Any]:
+    """Convertisseur d'une valeur brute ; lève ValueError(message) comme le champ DRF"""
+
+    def bornes(valeur):
+        if champ.min_value is not None and valeur < champ.min_value:
+            raise ValueError(_message(champ, 'min_value', min_value=champ.min_value))
+        if champ.max_value is not None and valeur > champ.max_value:
+            raise ValueError(_message(champ, 'max_value', max_value=champ.max_value))
+        return valeur
+
+    if isinstance(champ, serializers.IntegerField):
+        limite = champ.MAX_STRING_LENGTH
+
+        def convertir(valeur):
+            if isinstance(valeur, str) and len(valeur) > limite:
+                raise ValueError(_message(champ, 'max_string_length'))
+            try:
+                valeur = int(_DECIMALE_NULLE.sub('', str(valeur)))
+            except (ValueError, TypeError):
+                raise ValueError(_message(champ, 'invalid'))
+            return bornes(valeur)
+
+    elif isinstance(champ, serializers.FloatField):
+        limite = champ.MAX_STRING_LENGTH
+
+        def convertir(valeur):
+            if isinstance(valeur, str) and len(valeur) > limite:
+                raise ValueError(_message(champ, 'max_string_length'))
+            try:
+                valeur = float(valeur)
+            except (TypeError, ValueError):
+                raise ValueError(_message(champ, 'invalid'))
+            except OverflowError:
+                raise ValueError(_message(champ, 'overflow'))
+            if not math.isfinite(valeur):
+                raise ValueError(_message(champ, 'invalid'))
+            return bornes(valeur)
+
+    elif isinstance(champ, serializers.CharField):
+
+        def convertir(valeur):
+            if valeur == '' or str(valeur).strip() == '':
+                raise ValueError(_message(champ, 'blank'))
+            if isinstance(valeur, bool) or not isinstance(valeur, (str, int, float)):
+                raise ValueError(_message(champ, 'invalid'))
+            return str(valeur).strip()
+
+    else:
+        raise TypeError(f"Champ non pris en charge par la validation rapide : {type(champ).__name__}")
+
+    return convertir
+
+
+class ValidateurRapide:
+    """Valide et encode un enregistrement en un seul passage"""
+
+    def __init__(self, serializer_class=GrossesseInputSerializer):
+        self._serializer = serializer_class()
+        self.champs = [(nom, champ, _compiler_champ(champ)) for nom, champ in self._serializer.fields.items()]
+        if {nom for nom, _, _ in self.champs} != set(FEATURE_ORDER):
+            raise ValueError("Les champs du serializer ne correspondent pas à FEATURE_ORDER")
+
+    def valider(self, donnees: Any) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, List[str]]]]:
+        """Retourne (données validées, None) ou (None, erreurs par champ au format DRF)"""
+        if donnees is None:
+            # Cas particulier de Serializer.errors pour un corps null : message fixe de DRF
+            return None, {'non_field_errors': ['No data provided']}
+        if not isinstance(donnees, dict):
+            message = _message(self._serializer, 'invalid', datatype=type(donnees).__name__)
+            return None, {'non_field_errors': [message]}
+
+        valides = {}
+        erreurs = {}
+        for nom, champ, convertir in self.champs:
+            valeur = donnees.get(nom, empty)
+            if valeur is empty:
+                erreurs[nom] = [_message(champ, 'required')]
+            elif valeur is None:
+                erreurs[nom] = [_message(champ, 'null')]
+            else:
+                try:
+                    valides[nom] = convertir(valeur)
+                except ValueError as e:
+                    erreurs[nom] = [str(e)]
+
+        if erreurs:
+            return None, erreurs
+        return valides, None
+
+    def encoder(self, valides: Dict[str, Any]) -> List[float]:
+        """Vecteur dans l'ordre de FEATURE_ORDER ; lève ErreurCategorie pour une modalité inconnue"""
+        return [
+            encoder_categorie(colonne, valides[colonne]) if colonne in TABLES else valides[colonne]
+            for colonne in FEATURE_ORDER
+        ]
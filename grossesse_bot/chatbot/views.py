@@ -1,83 +1,160 @@
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
-from rest_framework.decorators import api_view
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
-import joblib
+import json
 import numpy as np
+from .evaluation_writer import EvaluationWriter
+from .inference_server import InferenceClient, InferenceError
+from .mappings import FEATURE_ORDER, MAPPINGS
+from .micro_batcher import MicroBatcher
+from .model_registry import risk_model
+from .prediction_cache import PredictionCache
 from .serializers import GrossesseInputSerializer
+from .validation import TABLES, ValidateurRapide, encoder_categorie
+from . import archive, export, statistiques
 
-# Charger le modèle
-model = joblib.load('grossesse_bot/model_risque_grossesse.pkl')
+# Cache des prédictions pour les profils répétés (vidé à chaque changement de version du modèle)
+prediction_cache = PredictionCache(max_size=settings.PREDICTION_CACHE_SIZE, ttl=settings.PREDICTION_CACHE_TTL)
 
-# Mappings manuels basés sur les encodages observés
-mapping_activite = {
-    'modérée': 1,
-    'élevée': 2,
-    'faible': 0
-}
+# Regroupement des prédictions concurrentes (utile avec des workers multi-threads)
+micro_batcher = None
+if settings.PREDICTION_MICROBATCH:
+    micro_batcher = MicroBatcher(
+        risk_model,
+        max_batch_size=settings.PREDICTION_MICROBATCH_MAX_SIZE,
+        max_wait=settings.PREDICTION_MICROBATCH_MAX_WAIT_MS / 1000,
+    )
 
-mapping_regime = {
-    'omnivore': 0,
-    'végétarien': 1,
-    'autre': 2
-}
+# Serveur d'inférence partagé (python manage.py runinference) ; désactivé si INFERENCE_SOCKET est vide
+inference_client = None
+if settings.INFERENCE_SOCKET:
+    inference_client = InferenceClient(
+        settings.INFERENCE_SOCKET,
+        pool_size=settings.INFERENCE_POOL_SIZE,
+        timeout=settings.INFERENCE_TIMEOUT_MS / 1000,
+    )
 
-mapping_antecedent = {
-    'hypertension': 4,
-    'diabète': 3,
-    'asthme': 0,
-    'aucun': 1,
-    'autre': 2
-}
+# Journalisation différée des évaluations (EVALUATION_LOGGING) : aucune écriture sur le chemin de la requête
+evaluation_writer = None
+if settings.EVALUATION_LOGGING:
+    evaluation_writer = EvaluationWriter(
+        batch_size=settings.EVALUATION_BATCH_SIZE,
+        flush_interval=settings.EVALUATION_FLUSH_MS / 1000,
+        max_queue=settings.EVALUATION_QUEUE_SIZE,
+        overflow=settings.EVALUATION_OVERFLOW,
+        block_timeout=settings.EVALUATION_BLOCK_MS / 1000,
+    )
+
+# Validation précompilée de /api/predire/ (mêmes règles et messages que GrossesseInputSerializer)
+validateur = ValidateurRapide()
 
-mapping_symptome = {
-    'douleur': 1,
-    'fatigue': 2,
-    'aucun': 0,
-    'nausée': 3
+# Même rendu que le JSONRenderer de DRF : UTF-8 lisible, sans espaces superflus
+JSON_COMPACT = {"ensure_ascii": False, "separators": (",", ":")}
+
+# Conseil associé à chaque niveau de risque
+conseils = {
+    "normal": "Votre grossesse est normale. Continuez une bonne alimentation et restez hydratée.",
+    "modéré": "Votre grossesse est à risque modéré. Consultez un médecin deux fois par mois.",
+    "élevé": "Votre grossesse est à risque élevé. Suivi médical renforcé requis.",
 }
 
-def effectuer_prediction(data):
+def encoder_entree(data):
+    """Encode un enregistrement validé en vecteur de 8 caractéristiques (ordre et mappings générés par train_model)"""
     try:
-        # Encoder manuellement les variables catégorielles
-        activite = mapping_activite[data['activité'].lower()]
-        regime = mapping_regime[data['régime'].lower()]
-        antecedent = mapping_antecedent[data['antécédents'].lower()]
-        symptome = mapping_symptome[data['symptôme'].lower()]
-
-        # Créer l’entrée du modèle
-        inputs = [
-            data['age'],
-            data['mois_grossesse'],
-            data['poids_kg'],
-            data['taille_cm'],
-            activite,
-            regime,
-            antecedent,
-            symptome,
+        return [
+            encoder_categorie(colonne, data[colonne]) if colonne in TABLES else data[colonne]
+            for colonne in FEATURE_ORDER
         ]
 
-        # Prédire le risque
-        prediction = model.predict([inputs])[0]
+    except KeyError as e:
+        raise ValueError(f"Valeur invalide pour une variable catégorielle : {e}")
+
+def formater_resultat(prediction, version):
+    """Associe le conseil et la version du modèle au niveau de risque prédit"""
+    return {
+        "profil_risque": prediction,
+        "conseil": conseils.get(prediction, "Aucun conseil disponible."),
+        "version_modele": version,
+    }
 
-        # Conseil associé
-        conseils = {
-            "normal": "Votre grossesse est normale. Continuez une bonne alimentation et restez hydratée.",
-            "modéré": "Votre grossesse est à risque modéré. Consultez un médecin deux fois par mois.",
-            "élevé": "Votre grossesse est à risque élevé. Suivi médical renforcé requis.",
-        }
+def evaluer_lignes(lignes, snapshot=None):
+    """Évalue des vecteurs encodés : serveur d'inférence, sinon micro-batcher, sinon modèle local"""
+    if inference_client is not None:
+        try:
+            return inference_client.predict(lignes)
+        except InferenceError as e:
+            # Repli sur le modèle en mémoire du worker
+            print(f"⚠️ {e} ; prédiction en local")
+            snapshot = None
 
-        return {
-            "profil_risque": prediction,
-            "conseil": conseils.get(prediction, "Aucun conseil disponible.")
-        }
+    if micro_batcher is not None and len(lignes) == 1:
+        try:
+            prediction, version = micro_batcher.predict(lignes[0])
+            return [prediction], version
+        except TimeoutError as e:
+            # File du micro-batcher bloquée : le modèle local répond quand même
+            print(f"⚠️ {e} ; prédiction en local")
 
-    except KeyError as e:
-        raise ValueError(f"Valeur invalide pour une variable catégorielle : {e}")
+    # Capturer le modèle une seule fois : un rechargement en cours n'affecte pas cette requête
+    model, version = snapshot or risk_model.snapshot()
+
+    # Évaluateurs en Python pur (code généré, forêt compilée) : une ligne sans passer par numpy
+    if len(lignes) == 1 and hasattr(model, 'predict_row'):
+        return [model.predict_row(lignes[0])], version
 
+    return list(model.predict(np.asarray(lignes, dtype=np.float64))), version
+
+def predire_lignes(lignes):
+    """Prédit des vecteurs encodés en servant d'abord les profils en cache ; retourne (prédictions, version)"""
+    if inference_client is not None:
+        # Le modèle vit dans le serveur d'inférence, qui peut le recharger à tout moment : sans
+        # aller-retour, le worker ne connaît pas sa version, le cache local servirait l'ancienne
+        return evaluer_lignes(lignes)
+
+    snapshot = risk_model.snapshot()
+    version = snapshot[1]
+
+    cles = [prediction_cache.cle(ligne) for ligne in lignes]
+    predictions = [prediction_cache.get(version, cle) for cle in cles]
+    manquants = [i for i, prediction in enumerate(predictions) if prediction is None]
+
+    if manquants:
+        nouvelles, version = evaluer_lignes([lignes[i] for i in manquants], snapshot)
+        for i, prediction in zip(manquants, nouvelles):
+            predictions[i] = prediction
+            prediction_cache.set(version, cles[i], prediction)
+
+    return predictions, version
+
+def effectuer_prediction(data):
+    # Créer l’entrée du modèle
+    inputs = encoder_entree(data)
+
+    # Prédire le risque, sauf si ce profil encodé est déjà en cache
+    predictions, version = predire_lignes([inputs])
+
+    return formater_resultat(predictions[0], version)
+
+def effectuer_prediction_lot(lignes):
+    """Prédit le risque de plusieurs vecteurs encodés en un seul appel au modèle"""
+    if not lignes:
+        return []
+
+    predictions, version = predire_lignes(lignes)
+
+    return [formater_resultat(prediction, version) for prediction in predictions]
 
 
 @api_view(['POST'])
-def predire_risque(request):
+def predire_risque_drf(request):
+    """Chemin DRF complet : formulaires, multipart, API navigable"""
     serializer = GrossesseInputSerializer(data=request.data)
     
     if serializer.is_valid():
@@ -85,12 +162,150 @@ def predire_risque(request):
 
         try:
             resultat = effectuer_prediction(data)
+            if evaluation_writer is not None:
+                evaluation_writer.enregistrer(data, resultat["profil_risque"])
             return Response(resultat)
         except ValueError as e:
             return Response({"error": str(e)}, status=400)
 
     return Response(serializer.errors, status=400)
 
+@csrf_exempt
+@require_POST
+def predire_risque(request):
+    """Prédiction unitaire ; un corps JSON passe par la validation rapide et une JsonResponse"""
+    if not settings.PREDICTION_FAST_PATH or request.content_type != 'application/json':
+        return predire_risque_drf(request)
+
+    try:
+        donnees = json.loads(request.body)
+    except ValueError as e:
+        return JsonResponse({"detail": f"JSON parse error - {e}"}, status=400)
+
+    data, erreurs = validateur.valider(donnees)
+    if erreurs:
+        return JsonResponse(erreurs, status=400, json_dumps_params=JSON_COMPACT)
+
+    try:
+        predictions, version = predire_lignes([validateur.encoder(data)])
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400, json_dumps_params=JSON_COMPACT)
+
+    resultat = formater_resultat(predictions[0], version)
+    if evaluation_writer is not None:
+        evaluation_writer.enregistrer(data, resultat["profil_risque"])
+    return JsonResponse(resultat, json_dumps_params=JSON_COMPACT)
+
+@api_view(['POST'])
+def predire_risque_lot(request):
+    """Évalue un lot d'enregistrements ; une ligne invalide n'interrompt pas le lot"""
+    enregistrements = request.data
+
+    if not isinstance(enregistrements, list):
+        return Response({"error": "Le corps doit être une liste d'enregistrements."}, status=400)
+
+    taille_max = settings.PREDICTION_BATCH_MAX_SIZE
+    if len(enregistrements) > taille_max:
+        return Response({"error": f"Lot trop volumineux : {taille_max} enregistrements maximum."}, status=400)
+
+    resultats = [None] * len(enregistrements)
+    indices_valides = []
+    lignes = []
+    donnees = []
+
+    # Valider et encoder chaque ligne séparément pour rapporter les erreurs par index
+    for index, enregistrement in enumerate(enregistrements):
+        serializer = GrossesseInputSerializer(data=enregistrement)
+        if not serializer.is_valid():
+            resultats[index] = {"index": index, "erreurs": serializer.errors}
+            continue
+
+        try:
+            lignes.append(encoder_entree(serializer.validated_data))
+            indices_valides.append(index)
+            donnees.append(serializer.validated_data)
+        except ValueError as e:
+            resultats[index] = {"index": index, "erreurs": {"non_field_errors": [str(e)]}}
+
+    # Un seul appel vectorisé au modèle pour toutes les lignes valides
+    for index, data, resultat in zip(indices_valides, donnees, effectuer_prediction_lot(lignes)):
+        resultats[index] = {"index": index, **resultat}
+        if evaluation_writer is not None:
+            evaluation_writer.enregistrer(data, resultat["profil_risque"])
+
+    return Response({
+        "resultats": resultats,
+        "nombre_valides": len(indices_valides),
+        "nombre_erreurs": len(enregistrements) - len(indices_valides),
+    })
+
+@api_view(['GET'])
+def sante(request):
+    """État du service et version du modèle de risque actif"""
+    return Response({
+        "status": "healthy",
+        "service": "Chatbot Grossesse API",
+        "model": risk_model.info(),
+        "cache": prediction_cache.stats(),
+        "micro_batch": micro_batcher.stats() if micro_batcher is not None else None,
+        "inference_server": inference_client.stats() if inference_client is not None else None,
+        "evaluations": evaluation_writer.stats() if evaluation_writer is not None else None,
+        "chatbot": intelligent_bot.stats(),
+    })
+
+def lire_date(texte):
+    """Date ISO 8601 d'un paramètre de requête ; sans fuseau, elle est lue dans TIME_ZONE"""
+    if not texte:
+        return None
+    date = parse_datetime(texte) or parse_datetime(f"{texte}T00:00:00")
+    if date is None:
+        raise ValueError(f"Date invalide : {texte}")
+    return timezone.make_aware(date) if timezone.is_naive(date) else date
+
+@api_view(['GET'])
+def statistiques_risque(request):
+    """Séries d'évaluations par heure ou par jour, servies depuis les compteurs pré-agrégés"""
+    granularite = request.query_params.get('granularite', 'jour')
+    par = [dimension for dimension in request.query_params.get('par', 'profil_risque').split(',') if dimension]
+
+    try:
+        debut = lire_date(request.query_params.get('debut'))
+        fin = lire_date(request.query_params.get('fin'))
+        series = statistiques.series(granularite, debut, fin, par)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    return Response({"granularite": granularite, "par": par, "series": series})
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def exporter_evaluations(request):
+    """Historique des évaluations en flux (CSV ou NDJSON), sans charger la période en mémoire"""
+    # `type` plutôt que `format`, réservé par DRF à la négociation du rendu
+    format_ = request.query_params.get('type', 'csv')
+    if format_ not in export.FORMATS:
+        return Response({"error": f"Type d'export inconnu : {format_} (attendu : {', '.join(export.FORMATS)})"}, status=400)
+
+    try:
+        debut = lire_date(request.query_params.get('debut'))
+        fin = lire_date(request.query_params.get('fin'))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    # archives=true : inclut les évaluations déjà déplacées par archiver_evaluations
+    source = archive if request.query_params.get('archives', '').lower() in ('1', 'true') else export
+    blocs = source.parcourir(debut, fin, taille_bloc=settings.EXPORT_CHUNK_SIZE)
+    response = StreamingHttpResponse(export.generer(format_, blocs), content_type=export.FORMATS[format_])
+    response['Content-Disposition'] = f'attachment; filename="evaluations.{format_}"'
+    return response
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def recharger_modele(request):
+    """Recharge le modèle en arrière-plan ; les requêtes continuent sur l'ancien jusqu'à la bascule"""
+    risk_model.reload(background=True)
+    return Response({"status": "rechargement lancé", "model": risk_model.info()}, status=202)
+
 import re
 from .intelligent_chatbot import IntelligentGrossesseChatbot
 
@@ -163,8 +378,3 @@ def chatbot(request):
         }, status=500)
 def chatbot_page(request):
     return render(request, 'index.html')
-
-
-inputs = [40, 8, 85, 155, 1, 0, 3, 0]  # Exemple pour le cas avec diabète
-prediction = model.predict([inputs])[0]
-print(f"Prédiction pour les inputs {inputs} : {prediction}")
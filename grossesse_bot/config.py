@@ -30,33 +30,13 @@ MODEL_CONFIG = {
     'data_path': str(DATA_PATH)
 }
 
-# Configuration des mappings
-MAPPING_ACTIVITE = {
-    'modérée': 1,
-    'élevée': 2,
-    'faible': 0
-}
-
-MAPPING_REGIME = {
-    'omnivore': 0,
-    'végétarien': 1,
-    'autre': 2
-}
-
-MAPPING_ANTECEDENT = {
-    'hypertension': 4,
-    'diabète': 3,
-    'asthme': 0,
-    'aucun': 1,
-    'autre': 2
-}
-
-MAPPING_SYMPTOME = {
-    'douleur': 1,
-    'fatigue': 2,
-    'aucun': 0,
-    'nausée': 3
-}
+# Configuration des mappings (générés par `python manage.py train_model`)
+from chatbot.mappings import (  # noqa: E402
+    MAPPING_ACTIVITE,
+    MAPPING_ANTECEDENT,
+    MAPPING_REGIME,
+    MAPPING_SYMPTOME,
+)
 
 # Conseils par niveau de risque
 CONSEILS_RISQUE = {
@@ -83,6 +83,17 @@ def test_vercel_app():
         print(f"❌ Erreur d'import : {e}")
         return False
 
+def build_forest_artifact():
+    """Génère la forêt compilée embarquée par les handlers légers (non versionnée)"""
+    if os.environ.get("FOREST_URL"):
+        print("ℹ️ FOREST_URL défini : la forêt sera téléchargée, pas d'artefact embarqué")
+        return True
+    if not Path("model_risque_grossesse.pkl").exists():
+        print("❌ model_risque_grossesse.pkl non trouvé : impossible de générer la forêt compilée")
+        return False
+    return run_command("python manage.py export_forest --compress --compact",
+                       "Génération de model_risque_grossesse.forest.gz") is not None
+
 def deploy_to_vercel():
     """Déploie sur Vercel"""
     print("🚀 Déploiement sur Vercel...")
@@ -179,6 +190,11 @@ def main():
         print("❌ Échec du test de l'application.")
         sys.exit(1)
     
+    # Générer la forêt compilée des handlers légers
+    if not build_forest_artifact():
+        print("❌ Échec de la génération de la forêt compilée.")
+        sys.exit(1)
+    
     # Déployer
     if not deploy_to_vercel():
         print("❌ Échec du déploiement.")
@@ -139,6 +139,54 @@ STATICFILES_DIRS = [
 # Configuration WhiteNoise pour les fichiers statiques
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Prédiction de risque
+# Nombre maximal d'enregistrements acceptés par POST /api/predire/batch/
+PREDICTION_BATCH_MAX_SIZE = int(os.environ.get('PREDICTION_BATCH_MAX_SIZE', 10000))
+
+# Chemin rapide de POST /api/predire/ pour les corps JSON : validation précompilée et JsonResponse
+# au lieu du serializer et de la négociation de contenu DRF (False pour toujours passer par DRF)
+PREDICTION_FAST_PATH = os.environ.get('PREDICTION_FAST_PATH', 'True').lower() == 'true'
+
+# Cache LRU des prédictions (0 pour le désactiver) et durée de vie des entrées en secondes
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 4096))
+PREDICTION_CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', 3600))
+
+# Micro-batching des prédictions concurrentes : à activer avec des workers multi-threads
+# (gunicorn --threads), inutile avec un seul thread par worker
+PREDICTION_MICROBATCH = os.environ.get('PREDICTION_MICROBATCH', 'False').lower() == 'true'
+PREDICTION_MICROBATCH_MAX_SIZE = int(os.environ.get('PREDICTION_MICROBATCH_MAX_SIZE', 64))
+PREDICTION_MICROBATCH_MAX_WAIT_MS = float(os.environ.get('PREDICTION_MICROBATCH_MAX_WAIT_MS', 2))
+
+# Serveur d'inférence partagé par les workers (python manage.py runinference) :
+# chemin de la socket Unix, vide pour garder le modèle dans chaque worker
+INFERENCE_SOCKET = os.environ.get('INFERENCE_SOCKET', '')
+INFERENCE_POOL_SIZE = int(os.environ.get('INFERENCE_POOL_SIZE', 4))
+INFERENCE_TIMEOUT_MS = float(os.environ.get('INFERENCE_TIMEOUT_MS', 500))
+
+# Budget de latence d'une prédiction unitaire (p50, ms) : train_model refuse de publier au-delà
+MODEL_LATENCY_BUDGET_MS = float(os.environ.get('MODEL_LATENCY_BUDGET_MS', 50))
+
+# Taille maximale (Ko) de l'artefact compressé embarqué dans les déploiements légers (export_forest --compress)
+FOREST_SIZE_BUDGET_KB = float(os.environ.get('FOREST_SIZE_BUDGET_KB', 5120))
+
+# Journalisation des évaluations de /api/predire/ dans EvaluationGrossesse, insérées par lots
+# depuis un thread de fond : toutes les EVALUATION_BATCH_SIZE lignes ou EVALUATION_FLUSH_MS ms.
+# File pleine (EVALUATION_QUEUE_SIZE) : 'drop' abandonne la ligne, 'block' attend au plus EVALUATION_BLOCK_MS
+EVALUATION_LOGGING = os.environ.get('EVALUATION_LOGGING', 'False').lower() == 'true'
+EVALUATION_BATCH_SIZE = int(os.environ.get('EVALUATION_BATCH_SIZE', 200))
+EVALUATION_FLUSH_MS = float(os.environ.get('EVALUATION_FLUSH_MS', 1000))
+EVALUATION_QUEUE_SIZE = int(os.environ.get('EVALUATION_QUEUE_SIZE', 10000))
+EVALUATION_OVERFLOW = os.environ.get('EVALUATION_OVERFLOW', 'drop')
+EVALUATION_BLOCK_MS = float(os.environ.get('EVALUATION_BLOCK_MS', 50))
+
+# Évaluations lues par requête SQL lors des exports en flux (GET /api/evaluations/export/, export_evaluations)
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+
+# Rétention des évaluations (python manage.py archiver_evaluations) : au-delà de
+# EVALUATION_RETENTION_DAYS jours, elles passent dans des archives mensuelles compressées
+EVALUATION_RETENTION_DAYS = int(os.environ.get('EVALUATION_RETENTION_DAYS', 365))
+EVALUATION_ARCHIVE_DIR = os.environ.get('EVALUATION_ARCHIVE_DIR', str(BASE_DIR / 'archives'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'grossesse_bot.settings')
 
 application = get_wsgi_application()
+
+# Précharger le modèle de risque au démarrage du worker plutôt qu'à la première requête
+# (MODEL_WARMUP=False pour le charger à la demande ; inutile si un serveur d'inférence le possède)
+if os.environ.get('MODEL_WARMUP', 'True').lower() == 'true' and not os.environ.get('INFERENCE_SOCKET'):
+    from chatbot.model_registry import risk_model
+    risk_model.warm_up()
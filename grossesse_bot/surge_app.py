@@ -4,10 +4,19 @@ Version statique - génère des fichiers HTML/CSS/JS pour déploiement sur Surge
 """
 
 import os
+import sys
+import csv
 import json
+import base64
+import random
 import shutil
+from array import array
 from pathlib import Path
 
+# Ajouter le répertoire du projet au path (forêt compilée et mappings dans chatbot/)
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
 def create_surge_app():
     """Crée l'application statique pour Surge"""
     
@@ -23,6 +32,9 @@ def create_surge_app():
     # Créer le fichier CSS
     create_styles_css(output_dir)
     
+    # Exporter le modèle de risque pour une évaluation dans le navigateur
+    create_model_js(output_dir)
+
     # Créer le fichier JavaScript
     create_app_js(output_dir)
     
@@ -114,7 +126,7 @@ def create_index_html(output_dir):
                                 <option value="">Choisir...</option>
                                 <option value="omnivore">Omnivore</option>
                                 <option value="végétarien">Végétarien</option>
-                                <option value="autre">Autre</option>
+                                <option value="végétalien">Végétalien</option>
                             </select>
                         </div>
                     </div>
@@ -179,7 +191,7 @@ def create_index_html(output_dir):
         </footer>
     </div>
     
-    <script src="app.js"></script>
+    <script src="app.js" defer></script>
 </body>
 </html>"""
     
@@ -494,6 +506,187 @@ body {
     with open(output_dir / "styles.css", "w", encoding="utf-8") as f:
         f.write(css_content)
 
+# Tableaux de la forêt exportés vers JavaScript (petit-boutiste, base64).
+# Les nœuds sont en ordre préfixe (compacter_foret) : le fils gauche de n est n + 1,
+# et une feuille a feature = -1 et right = sa ligne dans value.
+TABLEAUX_JS = (('roots', 'i'), ('feature', 'h'), ('threshold', 'f'), ('right', 'i'), ('value', 'd'))
+
+# Classe CSS du résultat pour chaque profil
+NIVEAUX_JS = {'normal': 'success', 'modéré': 'warning', 'élevé': 'error'}
+
+MODEL_JS_EVALUATOR = """
+// Évaluateur de la forêt : mêmes comparaisons float32 et même cumul que scikit-learn
+function decodeArray(b64, Type) {
+    const bytes = Uint8Array.from(atob(b64), (c) => c.charCodeAt(0));
+    return new Type(bytes.buffer);
+}
+
+class RiskModel {
+    constructor(blob) {
+        this.classes = blob.classes;
+        this.featureOrder = blob.feature_order;
+        this.mappings = blob.mappings;
+        this.conseils = blob.conseils;
+        this.niveaux = blob.niveaux;
+        this.nClasses = blob.classes.length;
+        this.roots = decodeArray(blob.arrays.roots, Int32Array);
+        this.feature = decodeArray(blob.arrays.feature, Int16Array);
+        this.threshold = decodeArray(blob.arrays.threshold, Float32Array);
+        this.right = decodeArray(blob.arrays.right, Int32Array);
+        this.value = decodeArray(blob.arrays.value, Float64Array);
+    }
+
+    encode(data) {
+        return this.featureOrder.map((col) => {
+            const mapping = this.mappings[col];
+            if (!mapping) return Number(data[col]);
+            const code = mapping[String(data[col]).toLowerCase()];
+            if (code === undefined) throw new Error(`Valeur invalide pour ${col} : ${data[col]}`);
+            return code;
+        });
+    }
+
+    predictProba(row) {
+        const x = Float32Array.from(row);
+        const totals = new Array(this.nClasses).fill(0);
+        for (let t = 0; t < this.roots.length; t++) {
+            let node = this.roots[t];
+            while (this.feature[node] !== -1) {
+                node = x[this.feature[node]] <= this.threshold[node] ? node + 1 : this.right[node];
+            }
+            const offset = this.right[node] * this.nClasses;
+            for (let k = 0; k < this.nClasses; k++) totals[k] += this.value[offset + k];
+        }
+        return totals.map((total) => total / this.roots.length);
+    }
+}
+"""
+
+
+def exporter_modele_js(foret, mappings, conseils):
+    """Blob JSON de la forêt (seuils float32, feuilles dédoublonnées, tableaux typés en base64)"""
+    from chatbot.flat_forest import compacter_foret
+
+    compacte = compacter_foret(foret, float32=True, dedup_leaves=True)
+    for noeud, gauche in enumerate(compacte.left):
+        if gauche != -1 and gauche != noeud + 1:
+            raise ValueError("Forêt compactée hors ordre préfixe")
+
+    tableaux = {
+        'roots': compacte.roots,
+        'feature': compacte.feature,
+        'threshold': compacte.threshold,
+        'right': compacte.right,
+        'value': array('d', [p for proba in compacte._proba for p in proba]),
+    }
+    encodes = {}
+    for nom, code in TABLEAUX_JS:
+        tableau = array(code, tableaux[nom])
+        if sys.byteorder != 'little':
+            tableau.byteswap()
+        encodes[nom] = base64.b64encode(tableau.tobytes()).decode('ascii')
+
+    return {
+        'classes': compacte.classes,
+        'feature_order': list(mappings['feature_order']),
+        'mappings': mappings['categories'],
+        'conseils': conseils,
+        'niveaux': NIVEAUX_JS,
+        'n_estimators': compacte.n_estimators,
+        'arrays': encodes,
+    }
+
+
+class EvaluateurBlob:
+    """Portage Python ligne à ligne de RiskModel (model.js) : contrôle de parité sans Node"""
+
+    def __init__(self, blob):
+        self.classes = blob['classes']
+        self.n_classes = len(self.classes)
+        for nom, code in TABLEAUX_JS:
+            tableau = array(code, base64.b64decode(blob['arrays'][nom]))
+            if sys.byteorder != 'little':
+                tableau.byteswap()
+            setattr(self, nom, tableau)
+
+    def predict_proba_row(self, row):
+        # Float32Array.from(row)
+        x = array('f', row).tolist()
+        totaux = [0.0] * self.n_classes
+        for racine in self.roots:
+            noeud = racine
+            while self.feature[noeud] != -1:
+                noeud = noeud + 1 if x[self.feature[noeud]] <= self.threshold[noeud] else self.right[noeud]
+            decalage = self.right[noeud] * self.n_classes
+            for k in range(self.n_classes):
+                totaux[k] += self.value[decalage + k]
+        return [total / len(self.roots) for total in totaux]
+
+    def predict_row(self, row):
+        probas = self.predict_proba_row(row)
+        return self.classes[max(range(len(probas)), key=lambda k: (probas[k], -k))]
+
+
+def echantillon_lignes(mappings, n=500, seed=42):
+    """Lignes encodées tirées de donnees_grossesse.csv, ou aléatoires si le fichier est absent"""
+    generateur = random.Random(seed)
+    chemin = project_root / 'donnees_grossesse.csv'
+    if chemin.exists():
+        with open(chemin, newline='', encoding='utf-8') as fichier:
+            enregistrements = list(csv.DictReader(fichier))
+        lignes = []
+        for enregistrement in generateur.sample(enregistrements, min(n, len(enregistrements))):
+            try:
+                lignes.append([
+                    mappings['categories'][col][enregistrement[col]] if col in mappings['categories']
+                    else float(enregistrement[col])
+                    for col in mappings['feature_order']
+                ])
+            except (KeyError, ValueError):
+                continue
+        return lignes
+
+    return [[generateur.randint(16, 45), generateur.randint(1, 9), generateur.randint(45, 110),
+             generateur.randint(145, 180)] + [generateur.randint(0, 4) for _ in range(4)] for _ in range(n)]
+
+
+def verifier_parite(blob, foret, lignes):
+    """Compare l'évaluateur exporté à la forêt Python : mêmes probabilités sur chaque ligne"""
+    evaluateur = EvaluateurBlob(blob)
+    ecarts = [ligne for ligne in lignes if evaluateur.predict_proba_row(ligne) != foret.predict_proba_row(ligne)]
+    if ecarts:
+        raise ValueError(f"Parité rompue sur {len(ecarts)} lignes, par exemple {ecarts[0]}")
+    return len(lignes)
+
+
+def create_model_js(output_dir):
+    """Exporte la forêt compilée dans model.js (rien si aucune forêt n'est disponible)"""
+    from chatbot.flat_forest import registre_foret
+    from chatbot.mappings import FEATURE_ORDER, MAPPINGS
+    from config import CONSEILS_RISQUE
+
+    registre = registre_foret()
+    try:
+        foret = registre.get_model()
+    except OSError as e:
+        print(f"⚠️ Forêt compilée introuvable ({e}) : l'évaluation restera à base de règles")
+        print("   Générez-la avec : python manage.py export_forest --compress --compact")
+        return False
+
+    mappings = {'feature_order': FEATURE_ORDER, 'categories': MAPPINGS}
+    blob = exporter_modele_js(foret, mappings, CONSEILS_RISQUE)
+    n_lignes = verifier_parite(blob, foret, echantillon_lignes(mappings))
+
+    contenu = ("// Modèle de risque généré par surge_app.py (version " + str(registre.version) + ") : ne pas modifier\n"
+               + "const RISK_MODEL_BLOB = " + json.dumps(blob, ensure_ascii=False) + ";\n"
+               + MODEL_JS_EVALUATOR
+               + "\nconst RISK_MODEL = new RiskModel(RISK_MODEL_BLOB);\n")
+    with open(output_dir / "model.js", "w", encoding="utf-8") as f:
+        f.write(contenu)
+
+    print(f"🤖 Modèle exporté dans model.js ({len(contenu) / 1024:.0f} Ko), parité vérifiée sur {n_lignes} lignes")
+    return True
+
 def create_app_js(output_dir):
     """Crée le fichier JavaScript"""
     js_content = """// Application JavaScript pour l'Assistant Grossesse IA
@@ -519,6 +712,8 @@ class GrossesseAssistant {
             if (e.key === 'Enter') this.sendMessage();
         });
         this.predictionForm.addEventListener('submit', (e) => this.handlePrediction(e));
+        // Télécharger le modèle pendant que la patiente remplit le formulaire
+        this.predictionForm.addEventListener('focusin', chargerModele, { once: true });
     }
     
     async sendMessage() {
@@ -603,13 +798,28 @@ class GrossesseAssistant {
         } catch (error) {
             this.showPredictionResult({
                 niveau: 'error',
-                message: 'Erreur lors de l\'évaluation. Veuillez réessayer.'
+                message: 'Erreur lors de l\\'évaluation. Veuillez réessayer.'
             });
         }
     }
     
     async predictRisk(data) {
-        // Simulation de prédiction basée sur des règles simples
+        // Même forêt que /api/predire/, évaluée dans le navigateur (model.js)
+        await chargerModele();
+        if (typeof RISK_MODEL !== 'undefined') {
+            const row = RISK_MODEL.encode(data);
+            const probas = RISK_MODEL.predictProba(row);
+            const profil = RISK_MODEL.classes[argmax(probas)];
+            return {
+                niveau: RISK_MODEL.niveaux[profil] || 'warning',
+                message: RISK_MODEL.conseils[profil] || 'Aucun conseil disponible.',
+                profil,
+                probabilite: Math.max(...probas)
+            };
+        }
+
+        // Repli sans model.js : règles simples
+        console.warn('model.js absent : évaluation par règles simples');
         let riskScore = 0;
         
         // Facteurs de risque
@@ -641,6 +851,7 @@ class GrossesseAssistant {
         this.predictionResult.innerHTML = `
             <h3>Résultat de l'évaluation</h3>
             <p>${result.message}</p>
+            ${result.profil ? `<p><strong>Profil de risque : ${result.profil} (${Math.round(result.probabilite * 100)} %)</strong></p>` : ''}
             ${result.score ? `<p><strong>Score de risque : ${result.score}/10</strong></p>` : ''}
         `;
         this.predictionResult.classList.remove('hidden');
@@ -650,6 +861,30 @@ class GrossesseAssistant {
     }
 }
 
+// model.js (forêt compilée, ~4,4 Mo) : chargé une seule fois, au premier usage du formulaire de risque
+let chargementModele = null;
+function chargerModele() {
+    if (!chargementModele) {
+        chargementModele = new Promise((resolve) => {
+            const script = document.createElement('script');
+            script.src = 'model.js';
+            script.onload = () => resolve(true);
+            script.onerror = () => resolve(false);
+            document.head.appendChild(script);
+        });
+    }
+    return chargementModele;
+}
+
+// Indice du premier maximum, comme numpy.argmax
+function argmax(values) {
+    let best = 0;
+    for (let k = 1; k < values.length; k++) {
+        if (values[k] > values[best]) best = k;
+    }
+    return best;
+}
+
 // Initialisation de l'application
 document.addEventListener('DOMContentLoaded', () => {
     new GrossesseAssistant();
@@ -53,6 +53,8 @@ class GrossesseAssistant {
                 console.log('📋 Formulaire soumis');
                 this.handlePrediction(e);
             });
+            // Télécharger le modèle pendant que la patiente remplit le formulaire
+            this.predictionForm.addEventListener('focusin', chargerModele, { once: true });
             console.log('✅ Événement submit ajouté au formulaire');
         }
         
@@ -156,7 +158,31 @@ class GrossesseAssistant {
     }
     
     async predictRisk(data) {
-        // Simulation de prédiction basée sur des règles simples
+        // Même forêt que /api/predire/, évaluée dans le navigateur (model.js)
+        await chargerModele();
+        if (typeof RISK_MODEL !== 'undefined') {
+            const row = RISK_MODEL.encode({
+                age: data.age,
+                mois_grossesse: data.mois_grossesse,
+                poids_kg: data.poids_kg,
+                taille_cm: data.taille_cm,
+                'activité': data.activite,
+                'régime': data.regime,
+                'antécédents': data.antecedents,
+                'symptôme': data.symptome
+            });
+            const probas = RISK_MODEL.predictProba(row);
+            const profil = RISK_MODEL.classes[argmax(probas)];
+            return {
+                niveau: RISK_MODEL.niveaux[profil] || 'warning',
+                message: RISK_MODEL.conseils[profil] || 'Aucun conseil disponible.',
+                profil,
+                probabilite: Math.max(...probas)
+            };
+        }
+
+        // Repli sans model.js : règles simples
+        console.warn('model.js absent : évaluation par règles simples');
         let riskScore = 0;
         
         // Facteurs de risque
@@ -188,6 +214,7 @@ class GrossesseAssistant {
         this.predictionResult.innerHTML = `
             <h3>Resultat de l'evaluation</h3>
             <p>${result.message}</p>
+            ${result.profil ? `<p><strong>Profil de risque : ${result.profil} (${Math.round(result.probabilite * 100)} %)</strong></p>` : ''}
             ${result.score ? `<p><strong>Score de risque : ${result.score}/10</strong></p>` : ''}
         `;
         this.predictionResult.classList.remove('hidden');
@@ -197,6 +224,30 @@ class GrossesseAssistant {
     }
 }
 
+// model.js (forêt compilée, ~4,4 Mo) : chargé une seule fois, au premier usage du formulaire de risque
+let chargementModele = null;
+function chargerModele() {
+    if (!chargementModele) {
+        chargementModele = new Promise((resolve) => {
+            const script = document.createElement('script');
+            script.src = 'model.js';
+            script.onload = () => resolve(true);
+            script.onerror = () => resolve(false);
+            document.head.appendChild(script);
+        });
+    }
+    return chargementModele;
+}
+
+// Indice du premier maximum, comme numpy.argmax
+function argmax(values) {
+    let best = 0;
+    for (let k = 1; k < values.length; k++) {
+        if (values[k] > values[best]) best = k;
+    }
+    return best;
+}
+
 // Initialisation de l'application
 document.addEventListener('DOMContentLoaded', () => {
     console.log('🚀 DOM chargé, initialisation de l\'application...');
@@ -28,7 +28,8 @@ django.setup()
 
 # Imports de notre application
 from chatbot.intelligent_chatbot import IntelligentGrossesseChatbot
-from chatbot.views import effectuer_prediction
+from chatbot.model_registry import risk_model
+from chatbot.views import effectuer_prediction, inference_client
 
 # Instance globale du chatbot
 chatbot = IntelligentGrossesseChatbot()
@@ -123,7 +124,8 @@ def predire_risque_api(request):
         
         return JsonResponse({
             "profil_risque": resultat['profil_risque'],
-            "conseil": resultat['conseil']
+            "conseil": resultat['conseil'],
+            "version_modele": resultat['version_modele']
         })
         
     except Exception as e:
@@ -136,7 +138,9 @@ def health_check(request):
     return JsonResponse({
         "status": "healthy",
         "service": "Chatbot Grossesse API",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "model": risk_model.info(),
+        "inference_server": inference_client.stats() if inference_client is not None else None
     })
 
 def home(request):
@@ -4,53 +4,40 @@ Version sans AUCUNE dépendance externe - juste du Python pur
 """
 
 import os
+import sys
 import json
-import urllib.request
 import urllib.parse
-from io import BytesIO
+from pathlib import Path
+
+# Ajouter le répertoire du projet au path (registre de modèle partagé dans chatbot/)
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from chatbot.flat_forest import registre_foret
+from chatbot.mappings import MAPPING_ACTIVITE, MAPPING_ANTECEDENT, MAPPING_REGIME, MAPPING_SYMPTOME
 
 # Variables d'environnement pour les modèles externes
-MODEL_URL = os.getenv('MODEL_URL', 'https://drive.google.com/uc?export=download&id=VOTRE_ID_GOOGLE_DRIVE')
 LABEL_ENCODERS_URL = os.getenv('LABEL_ENCODERS_URL', 'https://drive.google.com/uc?export=download&id=VOTRE_ID_GOOGLE_DRIVE')
 
-# Cache global pour les modèles
-_model_cache = None
-_label_encoders_cache = None
+# Forêt compilée (FOREST_URL, sinon artefact compressé embarqué model_risque_grossesse.forest.gz) :
+# décompressée à la première prédiction puis gardée par le registre, sans scikit-learn ni joblib
+# ni téléchargement au démarrage à froid
+risk_model = registre_foret()
 
 def load_model_from_url():
-    """Charge le modèle depuis une URL externe avec urllib (pas de requests)"""
-    global _model_cache
-    
-    if _model_cache is not None:
-        return _model_cache
+    """Charge la forêt compilée via le registre partagé"""
+    if risk_model.is_loaded:
+        return risk_model.get_model()
     
     try:
-        print("📥 Chargement du modèle depuis l'URL externe...")
-        
-        # Utiliser urllib au lieu de requests
-        with urllib.request.urlopen(MODEL_URL, timeout=30) as response:
-            content = response.read()
-        
-        # Charger le modèle avec joblib (sera installé par Vercel)
-        import joblib
-        _model_cache = joblib.load(BytesIO(content))
+        print(f"📥 Chargement du modèle compilé depuis {risk_model.source}...")
+        model = risk_model.get_model()
         print("✅ Modèle chargé avec succès")
-        return _model_cache
+        return model
         
     except Exception as e:
         print(f"❌ Erreur lors du chargement du modèle : {e}")
-        # Retourner un modèle factice pour éviter les erreurs
-        return create_dummy_model()
-
-def create_dummy_model():
-    """Crée un modèle factice pour éviter les erreurs"""
-    class DummyModel:
-        def predict(self, X):
-            # Retourner des prédictions aléatoires
-            import random
-            return [random.choice(['normal', 'modéré', 'élevé'])]
-    
-    return DummyModel()
+        raise
 
 def effectuer_prediction_light(data):
     """Version légère de la prédiction"""
@@ -58,39 +45,11 @@ def effectuer_prediction_light(data):
         # Charger le modèle
         model = load_model_from_url()
         
-        # Mappings manuels basés sur les encodages observés
-        mapping_activite = {
-            'modérée': 1,
-            'élevée': 2,
-            'faible': 0
-        }
-
-        mapping_regime = {
-            'omnivore': 0,
-            'végétarien': 1,
-            'autre': 2
-        }
-
-        mapping_antecedent = {
-            'hypertension': 4,
-            'diabète': 3,
-            'asthme': 0,
-            'aucun': 1,
-            'autre': 2
-        }
-
-        mapping_symptome = {
-            'douleur': 1,
-            'fatigue': 2,
-            'aucun': 0,
-            'nausée': 3
-        }
-
-        # Encoder manuellement les variables catégorielles
-        activite = mapping_activite.get(data['activité'].lower(), 1)
-        regime = mapping_regime.get(data['régime'].lower(), 0)
-        antecedent = mapping_antecedent.get(data['antécédents'].lower(), 1)
-        symptome = mapping_symptome.get(data['symptôme'].lower(), 0)
+        # Encoder les variables catégorielles (mappings générés par train_model)
+        activite = MAPPING_ACTIVITE.get(data['activité'].lower(), MAPPING_ACTIVITE['modérée'])
+        regime = MAPPING_REGIME.get(data['régime'].lower(), MAPPING_REGIME['omnivore'])
+        antecedent = MAPPING_ANTECEDENT.get(data['antécédents'].lower(), MAPPING_ANTECEDENT['aucun'])
+        symptome = MAPPING_SYMPTOME.get(data['symptôme'].lower(), MAPPING_SYMPTOME['aucun'])
 
         # Créer l'entrée du modèle
         inputs = [
@@ -278,7 +237,8 @@ def handler(request, context):
                 "status": "healthy",
                 "service": "Chatbot Grossesse API (Version Mega-Ultra-Légère)",
                 "version": "4.0.0",
-                "note": "Sans Django - Sans requests - Modèles chargés depuis URLs externes"
+                "note": "Sans Django - Sans requests - Modèles chargés depuis URLs externes",
+                "model": risk_model.info()
             })
             
         elif path == '/' and method == 'GET':
@@ -337,7 +297,7 @@ def handler(request, context):
                     <h2>🔧 Configuration requise</h2>
                     <p>Configurez ces variables d'environnement dans Vercel :</p>
                     <ul>
-                        <li><code>MODEL_URL</code> : URL de votre modèle .pkl</li>
+                        <li><code>FOREST_URL</code> (optionnel) : URL de la forêt compilée, sinon <code>model_risque_grossesse.forest</code> embarqué</li>
                         <li><code>LABEL_ENCODERS_URL</code> : URL de vos encodeurs .pkl</li>
                     </ul>
                     